@@ -0,0 +1,60 @@
+"""
+Measure how many lines per second makerbot_driver can tokenize with
+Gcode.parse_line, and execute with a GcodeParser writing to a file.
+"""
+
+import os
+import sys
+lib_path = os.path.abspath('../')
+sys.path.append(lib_path)
+
+import makerbot_driver
+import optparse
+import tempfile
+import time
+
+parser = optparse.OptionParser()
+parser.add_option("-i", "--inputfile", dest="input_file",
+                  help="gcode file to read in",
+                  default="../doc/gcode_samples/skeinforge_single_extrusion_snake.gcode")
+parser.add_option("-m", "--machine_type", dest="machine",
+                  help="machine type", default="ReplicatorSingle")
+parser.add_option("-r", "--repeat", dest="repeat", type="int",
+                  help="number of times to run each test", default=3)
+(options, args) = parser.parse_args()
+
+with open(options.input_file) as f:
+  lines = list(f)
+
+
+def best_rate(test):
+  best = None
+  for i in range(options.repeat):
+    start = time.time()
+    test()
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return len(lines) / best
+
+
+def tokenize():
+  parse_line = makerbot_driver.Gcode.parse_line
+  for line in lines:
+    parse_line(line)
+
+
+def compile():
+  processor = makerbot_driver.GcodeProcessors.Skeinforge50Processor()
+  processor.do_progress = False
+  output = tempfile.TemporaryFile()
+  try:
+    makerbot_driver.compile_file(
+        lines, output, options.machine, processors=[processor],
+        start_gcode=['G92 X0 Y0 Z0 A0 B0', 'M135 T0'])
+  finally:
+    output.close()
+
+print '%i lines from %s' % (len(lines), options.input_file)
+print 'parse_line:   %10.0f lines/sec' % best_rate(tokenize)
+print 'compile_file: %10.0f lines/sec' % best_rate(compile)
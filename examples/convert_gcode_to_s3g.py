@@ -10,8 +10,6 @@ sys.path.append(lib_path)
 
 import makerbot_driver
 import optparse
-import tempfile
-import threading
 
 parser = optparse.OptionParser()
 parser.add_option("-i", "--inputfile", dest="input_file",
@@ -23,41 +21,38 @@ parser.add_option("-m", "--machine_type", dest="machine",
 parser.add_option("-s", "--sequences", dest="sequences",
                   help="Flag to not use makerbot_driver's start/end sequences",
                   default=True, action="store_false")
+parser.add_option("-j", "--processes", dest="processes", type="int",
+                  help="compile layers in parallel with this many processes",
+                  default=1)
+parser.add_option("-e", "--estimate", dest="estimate",
+                  help="write a build estimate to the output file's name + .json",
+                  default=False, action="store_true")
 (options, args) = parser.parse_args()
 
-condition = threading.Condition()
-s = makerbot_driver.s3g()
-s.writer = makerbot_driver.Writer.FileWriter(open(options.output_file, 'wb'), condition)
-
 profile = makerbot_driver.Profile(options.machine)
 
-filename = os.path.basename(options.input_file)
-filename = os.path.splitext(filename)[0]
-
-parser = makerbot_driver.Gcode.GcodeParser()
-parser.state.values["build_name"] = filename
-parser.state.profile = profile
-parser.s3g = s
-
 ga = makerbot_driver.GcodeAssembler(profile)
 start, end, variables = ga.assemble_recipe(tool_0=True, tool_1=True, material='PLA')
-start_gcode = ga.assemble_start_sequence(start)
-end_gcode = ga.assemble_end_sequence(end)
-parser.environment.update(variables)
-
+start_gcode = end_gcode = None
 if options.sequences:
-  for line in start_gcode:
-    parser.execute_line(line)
-
-with open(options.input_file) as f:
-  for line in f:
-    parser.execute_line(line)
-
-if options.sequences:
-  for line in end_gcode:
-    parser.execute_line(line)
-
-s.writer.file.close()
-
-finito = makerbot_driver.Gcode.FileComplete()
-finito.finish(options.output_file)
+  start_gcode = ga.assemble_start_sequence(start)
+  end_gcode = ga.assemble_end_sequence(end)
+
+estimator = None
+if options.estimate:
+  estimator = makerbot_driver.Gcode.BuildEstimator()
+
+if options.processes > 1:
+  makerbot_driver.compile_file_parallel(
+      options.input_file, options.output_file, profile,
+      start_gcode=start_gcode, end_gcode=end_gcode, environment=variables,
+      print_to_file_type='s3g', processes=options.processes,
+      estimator=estimator)
+else:
+  makerbot_driver.compile_file(options.input_file, options.output_file, profile,
+                               start_gcode=start_gcode, end_gcode=end_gcode,
+                               environment=variables, print_to_file_type='s3g',
+                               estimator=estimator)
+
+if estimator is not None:
+  estimator.write_json(options.output_file + '.json')
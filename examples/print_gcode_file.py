@@ -45,20 +45,12 @@ parser = getattr(obj, 'gcodeparser')
 parser.environment.update(variables)
 parser.state.values["build_name"] = filename[:15]
 
-def exec_line(line):
-    while True:
-        try:
-            parser.execute_line(line)
-            break
-        except makerbot_driver.BufferOverflowError as e:
-            parser.s3g.writer._condition.wait(.2)
+streamer = makerbot_driver.BuildStreamer(parser)
 
 if options.sequences:
-    for line in start_gcode:
-        exec_line(line)
+    streamer.execute_lines(start_gcode)
 with open(options.filename) as f:
-    for line in f:
-        exec_line(line)
+    streamer.execute_lines(f)
 if options.sequences:
-    for line in end_gcode:
-        exec_line(line)
+    streamer.execute_lines(end_gcode)
+print "Spent %.1f seconds waiting on a full buffer" % (streamer.blocked_seconds)
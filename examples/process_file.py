@@ -27,7 +27,7 @@ if options.list:
   sys.exit(0)
 prepro = prepro_fact.create_processor_from_name(options.processor)
 
-output = prepro.process_gcode(list(open(options.input_file)))
-with open(options.output_file, 'w') as f:
-  for o in output:
-    f.write(o)
+with open(options.input_file) as input_file:
+  with open(options.output_file, 'w') as f:
+    for o in prepro.iter_process(input_file):
+      f.write(o)
@@ -0,0 +1,176 @@
+"""
+An s3g interface whose queries return PendingResponses, so many machines
+can be supervised from a single thread with a SelectLoop.
+"""
+
+from __future__ import absolute_import
+
+import serial
+
+import makerbot_driver
+
+
+class _PayloadCaptured(Exception):
+    def __init__(self, payload, is_query):
+        self.payload = payload
+        self.is_query = is_query
+
+
+class _CapturingWriter(object):
+    """ Stands in for a writer to catch the payload an s3g method builds """
+
+    def send_query_payload(self, payload):
+        raise _PayloadCaptured(payload, True)
+
+    def send_action_payload(self, payload):
+        raise _PayloadCaptured(payload, False)
+
+    def send_action_from_builder(self, builder):
+        raise _PayloadCaptured(builder.payload(), False)
+
+
+class _ReplayingWriter(object):
+    """ Stands in for a writer to hand a received response to an s3g method """
+
+    def __init__(self, response):
+        self.response = response
+
+    def send_query_payload(self, payload):
+        return self.response
+
+    def send_action_payload(self, payload):
+        return self.response
+
+    def send_action_from_builder(self, builder):
+        return self.response
+
+
+class AsyncS3g(object):
+    """
+    Wraps an AsyncStreamWriter with the same commands as s3g.  Each command
+    is packed and its response unpacked by the matching s3g method, so the
+    two can't drift apart; only the wait for the machine is different.
+    Only commands that send a single packet can be used this way.
+
+    Usage:
+        loop = makerbot_driver.Writer.SelectLoop()
+        bots = [makerbot_driver.AsyncS3g.from_filename(port) for port in ports]
+        for bot in bots:
+            loop.add(bot.writer)
+        temps = loop.run_until_complete(
+            [bot.get_toolhead_temperature(0) for bot in bots])
+    """
+
+    @classmethod
+    def from_filename(cls, port, baudrate=115200):
+        """
+        Constructs an AsyncS3g connected to the serial port named port
+
+        @param str port: Serial port name, i.e. '/dev/ttyACM0'
+        @param int baudrate: Baud rate to connect at
+        @return AsyncS3g with an AsyncStreamWriter directed at port
+        """
+        s = serial.Serial(port, baudrate=baudrate, timeout=0)
+        # Same baud rate hack as s3g.from_filename
+        s.baudrate = 9600
+        s.baudrate = baudrate
+        return cls(makerbot_driver.Writer.AsyncStreamWriter(s))
+
+    def __init__(self, writer=None):
+        """
+        @param AsyncStreamWriter writer: Writer connected to the machine
+        """
+        self.writer = writer
+        self._s3g = makerbot_driver.s3g()
+
+    @property
+    def tool_query_code(self):
+        return self._s3g.tool_query_code
+
+    @tool_query_code.setter
+    def tool_query_code(self, value):
+        self._s3g.tool_query_code = value
+
+    def send(self, command, *args, **kwargs):
+        """
+        Send any single packet s3g command
+
+        @param str command: Name of the s3g method, i.e. 'get_toolhead_temperature'
+        @return PendingResponse for what the s3g method would return
+        """
+        method = getattr(self._s3g, command)
+        self._s3g.writer = _CapturingWriter()
+        try:
+            method(*args, **kwargs)
+            # The command was handled without talking to the machine
+            raise makerbot_driver.ParameterError(command)
+        except _PayloadCaptured as captured:
+            payload, is_query = captured.payload, captured.is_query
+        finally:
+            self._s3g.writer = None
+        if is_query:
+            pending = self.writer.send_query_payload(payload)
+        else:
+            pending = self.writer.send_action_payload(payload)
+
+        def unpack(response):
+            self._s3g.writer = _ReplayingWriter(response)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._s3g.writer = None
+        return pending.map(unpack)
+
+    def get_version(self):
+        return self.send('get_version')
+
+    def get_advanced_version(self):
+        return self.send('get_advanced_version')
+
+    def get_available_buffer_size(self):
+        return self.send('get_available_buffer_size')
+
+    def is_finished(self):
+        return self.send('is_finished')
+
+    def get_build_stats(self):
+        return self.send('get_build_stats')
+
+    def get_build_name(self):
+        return self.send('get_build_name')
+
+    def get_communication_stats(self):
+        return self.send('get_communication_stats')
+
+    def get_motherboard_status(self):
+        return self.send('get_motherboard_status')
+
+    def get_extended_position(self):
+        return self.send('get_extended_position')
+
+    def get_toolhead_version(self, tool_index):
+        return self.send('get_toolhead_version', tool_index)
+
+    def get_toolhead_temperature(self, tool_index):
+        return self.send('get_toolhead_temperature', tool_index)
+
+    def get_toolhead_target_temperature(self, tool_index):
+        return self.send('get_toolhead_target_temperature', tool_index)
+
+    def is_tool_ready(self, tool_index):
+        return self.send('is_tool_ready', tool_index)
+
+    def get_tool_status(self, tool_index):
+        return self.send('get_tool_status', tool_index)
+
+    def get_platform_temperature(self, tool_index):
+        return self.send('get_platform_temperature', tool_index)
+
+    def get_platform_target_temperature(self, tool_index):
+        return self.send('get_platform_target_temperature', tool_index)
+
+    def is_platform_ready(self, tool_index):
+        return self.send('is_platform_ready', tool_index)
+
+    def abort_immediately(self):
+        return self.send('abort_immediately')
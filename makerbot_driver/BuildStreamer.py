@@ -0,0 +1,128 @@
+"""
+Streams gcode to a machine through a GcodeParser, waiting out buffer
+overflows with a backoff that follows how fast the machine is getting
+through its queued moves.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import logging
+import time
+
+import makerbot_driver
+
+
+class BuildStreamer(object):
+    """
+    Executes gcode lines against a parser connected to a machine.  When the
+    machine reports a full command buffer, the line is retried after a delay
+    based on the duration of recently queued moves: a buffer full of short
+    moves drains quickly, one full of long moves drains slowly.  Consecutive
+    overflows double the delay, up to max_backoff.
+    """
+
+    def __init__(self, parser, min_backoff=0.005, max_backoff=1.0, default_backoff=0.2, window=16):
+        """
+        @param GcodeParser parser: Parser with its s3g object set up
+        @param float min_backoff: Shortest wait after an overflow, in seconds
+        @param float max_backoff: Longest wait after an overflow, in seconds
+        @param float default_backoff: Wait used before any moves have been queued
+        @param int window: Number of recent moves used to estimate the drain rate
+        """
+        self.parser = parser
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.default_backoff = default_backoff
+        self.blocked_seconds = 0.0
+        self.total_overflows = 0
+        self._move_seconds = collections.deque(maxlen=window)
+        self._log = logging.getLogger(self.__class__.__name__)
+
+    def get_backoff(self, overflow_count=1):
+        """
+        Calculate how long to wait before retrying a line
+
+        @param int overflow_count: Number of overflows in a row for this line
+        @return float: Seconds to wait
+        """
+        if len(self._move_seconds) > 0:
+            backoff = sum(self._move_seconds) / len(self._move_seconds)
+        else:
+            backoff = self.default_backoff
+        backoff *= 2 ** (overflow_count - 1)
+        return min(max(backoff, self.min_backoff), self.max_backoff)
+
+    def execute_line(self, line):
+        """
+        Execute a single line of gcode, waiting and retrying for as
+        long as the machine's buffer is full.
+
+        @param str line: Line of gcode to execute
+        """
+        overflow_count = 0
+        while True:
+            self.parser.last_move_minutes = 0
+            try:
+                self.parser.execute_line(line)
+                break
+            except makerbot_driver.BufferOverflowError:
+                overflow_count += 1
+                self.total_overflows += 1
+                backoff = self.get_backoff(overflow_count)
+                self._log.debug('{"event":"buffer_overflow", "overflow_count":%i, "backoff":%f}', overflow_count, backoff)
+                start = time.time()
+                time.sleep(backoff)
+                self.blocked_seconds += time.time() - start
+        if self.parser.last_move_minutes > 0:
+            self._move_seconds.append(self.parser.last_move_minutes * 60.0)
+
+    def execute_lines(self, lines):
+        """
+        Execute every line of an iterable of gcode
+
+        @param iterable lines: Lines of gcode, i.e. a list or an open file
+        """
+        for line in lines:
+            self.execute_line(line)
+
+    def execute_file(self, gcode_file, checkpoint_lines=None, on_checkpoint=None):
+        """
+        Execute the rest of an open gcode file, from where it is now.  Every
+        checkpoint_lines lines, on_checkpoint is given a checkpoint of the
+        parser that resume can carry on from, i.e. to save to disk.
+
+        @param file gcode_file: Open gcode file
+        @param int checkpoint_lines: Lines between checkpoints, or None for none
+        @param on_checkpoint: Function taking a ParserCheckpoint
+        """
+        count = 0
+        # readline, unlike iterating over the file, keeps tell() usable
+        line = gcode_file.readline()
+        while line:
+            self.execute_line(line)
+            count += 1
+            if checkpoint_lines and count % checkpoint_lines == 0:
+                # The file's own offset, since a text mode file can read
+                # lines shorter than their bytes, i.e. with \r\n endings
+                on_checkpoint(self.parser.checkpoint(gcode_file.tell()))
+            line = gcode_file.readline()
+
+    def resume(self, gcode_file, checkpoint, checkpoint_lines=None, on_checkpoint=None):
+        """
+        Carry on a build from a checkpoint made by execute_file, without
+        running the lines before it.  The parser is put back in the
+        checkpoint's state and the file is read from the checkpoint's
+        offset.  Getting the machine itself back to the checkpoint's
+        position, i.e. by homing and G92, is up to the caller.
+
+        @param file gcode_file: The same gcode file the checkpoint was made from
+        @param ParserCheckpoint checkpoint: Checkpoint to carry on from
+        @param int checkpoint_lines: Lines between new checkpoints, or None for none
+        @param on_checkpoint: Function taking a ParserCheckpoint
+        """
+        if checkpoint.offset is None:
+            raise makerbot_driver.ParameterError('checkpoint has no file offset')
+        self.parser.restore(checkpoint)
+        gcode_file.seek(checkpoint.offset)
+        self.execute_file(gcode_file, checkpoint_lines, on_checkpoint)
@@ -0,0 +1,304 @@
+"""
+Compiles gcode files into s3g/x3g files in a single streaming pass, so
+memory use doesn't grow with the size of the file, or split into layers
+compiled in parallel by several processes.
+"""
+
+from __future__ import absolute_import
+
+import io
+import multiprocessing
+import os
+import re
+import threading
+
+import makerbot_driver
+from .Gcode import GcodeParser
+
+
+def _open_output(dst):
+    if isinstance(dst, basestring):
+        return open(dst, 'wb'), True
+    return dst, False
+
+
+def _open_input(src):
+    if isinstance(src, basestring):
+        return open(src, 'r'), True
+    return src, False
+
+
+def _create_parser(parser_class, profile, legacy, build_name, environment):
+    parser = parser_class()
+    if legacy:
+        parser.state = makerbot_driver.Gcode.LegacyGcodeStates()
+    parser.state.profile = profile
+    if build_name is not None:
+        parser.state.values['build_name'] = build_name
+    if environment is not None:
+        parser.environment.update(environment)
+    return parser
+
+
+def chain_processors(gcodes, processors, profile=None):
+    """
+    Lazily run gcode through a series of processors
+
+    @param gcodes: Iterable of gcode lines
+    @param processors: Processor objects, or processor names as taken by
+        ProcessorFactory.get_processors
+    @param Profile profile: Profile given to processors created by name
+    @return iterator over the processed lines
+    """
+    if isinstance(processors, str):
+        processors = makerbot_driver.GcodeProcessors.ProcessorFactory(
+        ).get_processors(processors, profile)
+    chain = makerbot_driver.GcodeProcessors.ProcessorChain()
+    for processor in processors:
+        if isinstance(processor, str):
+            processor = makerbot_driver.GcodeProcessors.ProcessorFactory(
+            ).create_processor_from_name(processor, profile)
+        chain.append(processor)
+    return chain.iter_process(gcodes)
+
+
+def compile_file(src, dst, profile, processors=None, start_gcode=None, end_gcode=None,
+                 environment=None, build_name=None, print_to_file_type='x3g',
+                 legacy=False, checksum=True, buffer_size=65536, estimator=None,
+                 sinks=None):
+    """
+    Compile a gcode file into an s3g/x3g file.  Lines are read, run through
+    the processors, executed and written as they go: payloads are gathered
+    by a BufferedFileWriter into large writes, and the checksum is summed
+    from those writes, so the output is never read back.
+
+    @param src: Name of the gcode file, or any iterable of gcode lines
+    @param dst: Name of the file to write, or a file object opened in binary mode
+    @param profile: Profile object, or the name of a machine profile
+    @param processors: Processors to run the gcode through first, as taken by
+        chain_processors
+    @param list start_gcode: Lines executed before the file, i.e. from GcodeAssembler
+    @param list end_gcode: Lines executed after the file
+    @param dict environment: Variables to substitute into the gcode
+    @param str build_name: Build name, defaults to the name of src
+    @param str print_to_file_type: 'x3g' or 's3g'
+    @param bool legacy: Use LegacyGcodeStates
+    @param bool checksum: End the file with its checksum, as FileComplete does
+    @param int buffer_size: Bytes gathered before each write
+    @param BuildEstimator estimator: Estimator told about every move
+    @param list sinks: GcodeSinks sent every command as well as the output
+    @return GcodeParser: The parser, with its state at the end of the build
+    """
+    if isinstance(profile, basestring):
+        profile = makerbot_driver.Profile(profile)
+    if build_name is None and isinstance(src, basestring):
+        build_name = os.path.splitext(os.path.basename(src))[0]
+
+    parser = _create_parser(
+        makerbot_driver.Gcode.GcodeParser, profile, legacy, build_name, environment)
+    parser.estimator = estimator
+    # The input is opened first, so a missing one doesn't leave an empty output
+    gcode_file, close_input = _open_input(src)
+    try:
+        output, close_output = _open_output(dst)
+        writer = makerbot_driver.Writer.BufferedFileWriter(
+            output, threading.Condition(), buffer_size)
+        try:
+            parser.s3g = makerbot_driver.s3g(writer)
+            parser.s3g.set_print_to_file_type(print_to_file_type)
+            if sinks is not None:
+                for sink in sinks:
+                    parser.add_sink(sink)
+            gcodes = gcode_file
+            if processors:
+                gcodes = chain_processors(gcodes, processors, profile)
+            for sequence in (start_gcode, gcodes, end_gcode):
+                if sequence is not None:
+                    for line in sequence:
+                        parser.execute_line(line)
+            if checksum:
+                writer.write_checksum()
+            writer.flush()
+        finally:
+            if close_output:
+                writer.close()
+    finally:
+        if close_input:
+            gcode_file.close()
+    return parser
+
+
+# The layer markers EmptyLayerProcessor recognises
+_layer_start = re.compile("^\((Slice|<layer>) [0-9.]+.*\)")
+
+
+class _ScanningParser(GcodeParser):
+    """
+    Runs gcode only for its effect on the parser's state, to find the state
+    each shard of a parallel compile starts in.  Moves update the position
+    and feedrate as linear_interpolation does, and fail in the same cases,
+    without working out what would be sent.
+    """
+
+    def __init__(self):
+        super(_ScanningParser, self).__init__()
+        self.s3g = makerbot_driver.Gcode.GcodeSink()
+
+    def linear_interpolation(self, codes, flags, comment):
+        if 'F' in codes:
+            new_feedrate = codes['F']
+        elif 'feedrate' in self.state.values:
+            new_feedrate = self.state.values['feedrate']
+        else:
+            raise makerbot_driver.Gcode.NoFeedrateSpecifiedError
+        if len(makerbot_driver.Gcode.parse_out_axes(codes)) > 0 or 'E' in codes:
+            self.state.check_position()
+            target = self._target
+            target.copy_from(self.state.position)
+            target.SetPoint(codes)
+            displacement = makerbot_driver.Gcode.calculate_vector_difference(
+                target.values, self.state.position.values)
+            if makerbot_driver.Gcode.calculate_vector_magnitude(displacement) == 0:
+                raise makerbot_driver.Gcode.VectorLengthZeroError
+            if new_feedrate <= 0:
+                raise makerbot_driver.Gcode.InvalidFeedrateError
+        self.state.values['feedrate'] = new_feedrate
+        self.state.set_position(codes)
+
+
+def _split_shards(scanner, lines, shard_lines):
+    """
+    Runs the scanner over the lines, cutting them at the first layer start
+    after every shard_lines lines
+
+    @return list: (start, end, checkpoint) of each shard
+    """
+    shards = []
+    start = 0
+    checkpoint = scanner.checkpoint()
+    for index, line in enumerate(lines):
+        if index - start >= shard_lines and line.startswith('(') and \
+                _layer_start.match(line):
+            shards.append((start, index, checkpoint))
+            start = index
+            checkpoint = scanner.checkpoint()
+        scanner.execute_line(line)
+    shards.append((start, len(lines), checkpoint))
+    return shards
+
+
+class _ShardOutput(io.BytesIO):
+    """ Collects a shard's compiled output in memory """
+    # FileWriter only writes to files opened in binary mode
+    mode = 'wb'
+
+
+def _compile_shard(shard):
+    """
+    Compiles one shard, starting from the checkpoint the scan made for it.
+    Run by the worker processes, so it takes a single picklable tuple.
+
+    @return tuple: The shard's payloads, as they are stored in the file, and
+        the shard's BuildEstimator if asked for one
+    """
+    lines, checkpoint, profile, legacy, print_to_file_type, buffer_size, \
+        estimate = shard
+    parser = _create_parser(
+        makerbot_driver.Gcode.GcodeParser, profile, legacy, None, None)
+    parser.restore(checkpoint)
+    if estimate:
+        parser.estimator = makerbot_driver.Gcode.BuildEstimator()
+    output = _ShardOutput()
+    writer = makerbot_driver.Writer.BufferedFileWriter(
+        output, threading.Condition(), buffer_size)
+    parser.s3g = makerbot_driver.s3g(writer)
+    parser.s3g.set_print_to_file_type(print_to_file_type)
+    for line in lines:
+        parser.execute_line(line)
+    writer.flush()
+    return output.getvalue(), parser.estimator
+
+
+def _write_shards(writer, results, estimator):
+    for data, shard_estimator in results:
+        writer.write_data(data)
+        if estimator is not None:
+            estimator.merge(shard_estimator)
+
+
+def compile_file_parallel(src, dst, profile, processors=None, start_gcode=None,
+                          end_gcode=None, environment=None, build_name=None,
+                          print_to_file_type='x3g', legacy=False, checksum=True,
+                          buffer_size=65536, processes=None, shard_lines=20000,
+                          estimator=None):
+    """
+    Compile a gcode file into an s3g/x3g file using several processes.  The
+    file is read and run through the processors, then split into shards at
+    layer starts.  A quick scan over every line, which keeps track of the
+    parser's state but works nothing out for moves, finds the position,
+    feedrate, tool and other state each shard starts in.  The shards are
+    compiled in a multiprocessing pool, and their output written in order
+    with a single checksum at the end, giving the same file as compile_file.
+
+    The whole file is held in memory while it is compiled.
+
+    @param processes: Number of worker processes, defaults to the number of CPUs.
+        With one process, or only one shard, everything is compiled in this process.
+    @param int shard_lines: Fewest lines in a shard; shards are made larger
+        for big files so there are about four for each process
+    @param BuildEstimator estimator: Estimator the estimates of the shards
+        are merged into
+    @return GcodeParser: The parser used for the scan, with its state at the
+        end of the build
+
+    The other parameters are the same as compile_file's.
+    """
+    if isinstance(profile, basestring):
+        profile = makerbot_driver.Profile(profile)
+    if build_name is None and isinstance(src, basestring):
+        build_name = os.path.splitext(os.path.basename(src))[0]
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    gcode_file, close_input = _open_input(src)
+    try:
+        gcodes = gcode_file
+        if processors:
+            gcodes = chain_processors(gcodes, processors, profile)
+        lines = []
+        for sequence in (start_gcode, gcodes, end_gcode):
+            if sequence is not None:
+                lines.extend(sequence)
+    finally:
+        if close_input:
+            gcode_file.close()
+
+    scanner = _create_parser(
+        _ScanningParser, profile, legacy, build_name, environment)
+    shards = _split_shards(
+        scanner, lines, max(shard_lines, len(lines) // (processes * 4)))
+    jobs = ((lines[start:end], checkpoint, profile, legacy, print_to_file_type,
+             buffer_size, estimator is not None)
+            for start, end, checkpoint in shards)
+
+    output, close_output = _open_output(dst)
+    writer = makerbot_driver.Writer.BufferedFileWriter(
+        output, threading.Condition(), buffer_size)
+    try:
+        if processes > 1 and len(shards) > 1:
+            pool = multiprocessing.Pool(min(processes, len(shards)))
+            try:
+                results = pool.imap(_compile_shard, jobs)
+                _write_shards(writer, results, estimator)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            _write_shards(writer, (_compile_shard(job) for job in jobs), estimator)
+        if checksum:
+            writer.write_checksum()
+        writer.flush()
+    finally:
+        if close_output:
+            writer.close()
+    return scanner
@@ -1,32 +1,114 @@
+"""
+iButton/Maxim CRC8 used to protect s3g packet payloads.
+
+The lookup table is built once at import time.  If the optional crcmod
+package is installed its C implementation is used to fold large buffers,
+otherwise a pure python table walk is used.
+"""
+
+# CRC table from http://forum.sparkfun.com/viewtopic.php?p=51145
+crctab = (
+    0, 94, 188, 226, 97, 63, 221, 131, 194, 156, 126, 32, 163, 253, 31, 65,
+    157, 195, 33, 127, 252, 162, 64, 30, 95, 1, 227, 189, 62, 96, 130, 220,
+    35, 125, 159, 193, 66, 28, 254, 160, 225, 191, 93, 3, 128, 222, 60, 98,
+    190, 224, 2, 92, 223, 129, 99, 61, 124, 34, 192, 158, 29, 67, 161, 255,
+    70, 24, 250, 164, 39, 121, 155, 197, 132, 218, 56, 102, 229, 187, 89, 7,
+    219, 133, 103, 57, 186, 228, 6, 88, 25, 71, 165, 251, 120, 38, 196, 154,
+    101, 59, 217, 135, 4, 90, 184, 230, 167, 249, 27, 69, 198, 152, 122, 36,
+    248, 166, 68, 26, 153, 199, 37, 123, 58, 100, 134, 216, 91, 5, 231, 185,
+    140, 210, 48, 110, 237, 179, 81, 15, 78, 16, 242, 172, 47, 113, 147, 205,
+    17, 79, 173, 243, 112, 46, 204, 146, 211, 141, 111, 49, 178, 236, 14, 80,
+    175, 241, 19, 77, 206, 144, 114, 44, 109, 51, 209, 143, 12, 82, 176, 238,
+    50, 108, 142, 208, 83, 13, 239, 177, 240, 174, 76, 18, 145, 207, 45, 115,
+    202, 148, 118, 40, 171, 245, 23, 73, 8, 86, 180, 234, 105, 55, 213, 139,
+    87, 9, 235, 181, 54, 104, 138, 212, 149, 203, 41, 119, 244, 170, 72, 22,
+    233, 183, 85, 11, 136, 214, 52, 106, 43, 117, 151, 201, 74, 20, 246, 168,
+    116, 42, 200, 150, 21, 75, 169, 247, 182, 232, 10, 84, 215, 137, 107, 53,
+)
+
+
+def _py_crc_update(data, val=0, table=crctab):
+    """
+    Fold a buffer into a running crc using the lookup table
+    @param data bytearray of data to fold in
+    @param val Running crc value to start from
+    @return Updated crc value
+    """
+    if not isinstance(data, bytearray):
+        data = bytearray(data)
+    for x in data:
+        val = table[val ^ x]
+    return val
+
+try:
+    import crcmod
+    _crcmod_fun = crcmod.mkCrcFun(0x131, initCrc=0, rev=True, xorOut=0)
+
+    def _crcmod_update(data, val=0):
+        if not isinstance(data, str):
+            data = str(bytearray(data))
+        return _crcmod_fun(data, val)
+
+    crc_update = _crcmod_update
+except ImportError:
+    # No accelerated crc available; fall back to the lookup table.
+    crc_update = _py_crc_update
+
+
 def CalculateCRC(data):
     """
     Calculate the iButton/Maxim crc for a give bytearray
     @param data bytearray of data to calculate a CRC for
     @return Single byte CRC calculated from the data.
     """
-    # CRC table from http://forum.sparkfun.com/viewtopic.php?p=51145
-    crctab = [
-        0, 94, 188, 226, 97, 63, 221, 131, 194, 156, 126, 32, 163, 253, 31, 65,
-        157, 195, 33, 127, 252, 162, 64, 30, 95, 1, 227, 189, 62, 96, 130, 220,
-        35, 125, 159, 193, 66, 28, 254, 160, 225, 191, 93, 3, 128, 222, 60, 98,
-        190, 224, 2, 92, 223, 129, 99, 61, 124, 34, 192, 158, 29, 67, 161, 255,
-        70, 24, 250, 164, 39, 121, 155, 197, 132, 218, 56, 102, 229, 187, 89, 7,
-        219, 133, 103, 57, 186, 228, 6, 88, 25, 71, 165, 251, 120, 38, 196, 154,
-        101, 59, 217, 135, 4, 90, 184, 230, 167, 249, 27, 69, 198, 152, 122, 36,
-        248, 166, 68, 26, 153, 199, 37, 123, 58, 100, 134, 216, 91, 5, 231, 185,
-        140, 210, 48, 110, 237, 179, 81, 15, 78, 16, 242, 172, 47, 113, 147, 205,
-        17, 79, 173, 243, 112, 46, 204, 146, 211, 141, 111, 49, 178, 236, 14, 80,
-        175, 241, 19, 77, 206, 144, 114, 44, 109, 51, 209, 143, 12, 82, 176, 238,
-        50, 108, 142, 208, 83, 13, 239, 177, 240, 174, 76, 18, 145, 207, 45, 115,
-        202, 148, 118, 40, 171, 245, 23, 73, 8, 86, 180, 234, 105, 55, 213, 139,
-        87, 9, 235, 181, 54, 104, 138, 212, 149, 203, 41, 119, 244, 170, 72, 22,
-        233, 183, 85, 11, 136, 214, 52, 106, 43, 117, 151, 201, 74, 20, 246, 168,
-        116, 42, 200, 150, 21, 75, 169, 247, 182, 232, 10, 84, 215, 137, 107, 53
-    ]
-
-    data_bytes = bytearray(data)
-
-    val = 0
-    for x in data_bytes:
-        val = crctab[val ^ x]
-    return val
+    return crc_update(data)
+
+
+class Crc8(object):
+    """
+    An incremental iButton/Maxim crc.  Bytes can be folded in as they
+    arrive, and the crc of everything seen so far read back at any time.
+    """
+
+    def __init__(self, data=None):
+        """
+        Initialize the crc
+        @param data Optional initial data to fold in
+        """
+        self.value = 0
+        if data is not None:
+            self.update(data)
+
+    def update(self, data):
+        """
+        Fold more data into the crc
+        @param data bytearray, str or buffer of data to add
+        @return self, so calls can be chained
+        """
+        self.value = crc_update(data, self.value)
+        return self
+
+    def update_byte(self, byte):
+        """
+        Fold a single byte into the crc
+        @param int byte: Byte value to add
+        """
+        self.value = crctab[self.value ^ byte]
+
+    def digest(self):
+        """
+        @return Single byte CRC of all data added so far
+        """
+        return self.value
+
+    def reset(self):
+        """ Reset the crc to its initial state """
+        self.value = 0
+
+    def copy(self):
+        """
+        @return A new Crc8 with the same running value
+        """
+        other = Crc8()
+        other.value = self.value
+        return other
@@ -40,8 +40,9 @@ def decode_packet(packet):
     if packet[1] != len(packet) - 3:
         raise makerbot_driver.errors.PacketLengthFieldError(packet[1], len(packet) - 3)
 
-    if packet[len(packet) - 1] != makerbot_driver.Encoder.CalculateCRC(packet[2:(len(packet) - 1)]):
-        raise makerbot_driver.errors.PacketCRCError(packet[len(packet) - 1], makerbot_driver.Encoder.CalculateCRC(packet[2:(len(packet) - 1)]))
+    crc = makerbot_driver.Encoder.CalculateCRC(buffer(packet, 2, len(packet) - 3))
+    if packet[len(packet) - 1] != crc:
+        raise makerbot_driver.errors.PacketCRCError(packet[len(packet) - 1], crc)
 
     return packet[2:(len(packet) - 1)]
 
@@ -88,14 +89,27 @@ class PacketStreamDecoder(object):
     """
     A state machine that accepts bytes from an s3g packet stream, checks the validity of
     each packet, then extracts and returns the payload.
+
+    Bytes can either be given one at a time with parse_byte, or in whole
+    reads with feed, which returns every payload completed by the read.
     """
+
+    WAIT_FOR_HEADER = 0
+    WAIT_FOR_LENGTH = 1
+    WAIT_FOR_DATA = 2
+    WAIT_FOR_CRC = 3
+    PAYLOAD_READY = 4
+
     def __init__(self):
         """
         Initialize the packet decoder
         """
-        self.state = 'WAIT_FOR_HEADER'
+        self.state = self.WAIT_FOR_HEADER
         self.payload = bytearray()
         self.expected_length = 0
+        self.noise_bytes = 0
+        self._buffer = bytearray()
+        self._ready = []
 
     def parse_byte(self, byte):
         """
@@ -103,29 +117,121 @@ class PacketStreamDecoder(object):
         @param byte Byte to add to the stream
         """
 
-        if self.state == 'WAIT_FOR_HEADER':
+        if self.state == self.WAIT_FOR_HEADER:
             if byte != makerbot_driver.constants.header:
                 raise makerbot_driver.errors.PacketHeaderError(byte, makerbot_driver.constants.header)
 
-            self.state = 'WAIT_FOR_LENGTH'
+            self.state = self.WAIT_FOR_LENGTH
 
-        elif self.state == 'WAIT_FOR_LENGTH':
+        elif self.state == self.WAIT_FOR_LENGTH:
             if byte > makerbot_driver.constants.maximum_payload_length:
                 raise makerbot_driver.errors.PacketLengthFieldError(byte, makerbot_driver.constants.maximum_payload_length)
 
             self.expected_length = byte
-            self.state = 'WAIT_FOR_DATA'
+            self.state = self.WAIT_FOR_DATA
 
-        elif self.state == 'WAIT_FOR_DATA':
+        elif self.state == self.WAIT_FOR_DATA:
             self.payload.append(byte)
             if len(self.payload) == self.expected_length:
-                self.state = 'WAIT_FOR_CRC'
+                self.state = self.WAIT_FOR_CRC
 
-        elif self.state == 'WAIT_FOR_CRC':
-            if makerbot_driver.Encoder.CalculateCRC(self.payload) != byte:
-                raise makerbot_driver.errors.PacketCRCError(byte, makerbot_driver.Encoder.CalculateCRC(self.payload))
+        elif self.state == self.WAIT_FOR_CRC:
+            crc = makerbot_driver.Encoder.CalculateCRC(self.payload)
+            if crc != byte:
+                raise makerbot_driver.errors.PacketCRCError(byte, crc)
 
-            self.state = 'PAYLOAD_READY'
+            self.state = self.PAYLOAD_READY
 
         else:
             raise Exception('Parser in bad state: too much data provided?')
+
+    def parse_bytes(self, data):
+        """
+        Run a chunk of bytes through the state machine.  Equivalent to
+        calling parse_byte for each byte, but the payload is copied in
+        a single slice.
+        @param data bytearray or str of bytes to add to the stream
+        """
+        if not isinstance(data, bytearray):
+            data = bytearray(data)
+        pos = 0
+        end = len(data)
+        while pos < end:
+            needed = self.expected_length - len(self.payload)
+            if self.state == self.WAIT_FOR_DATA and needed > 0:
+                chunk = data[pos:pos + needed]
+                self.payload.extend(chunk)
+                pos += len(chunk)
+                if len(self.payload) == self.expected_length:
+                    self.state = self.WAIT_FOR_CRC
+            else:
+                self.parse_byte(data[pos])
+                pos += 1
+
+    def feed(self, data):
+        """
+        Add a chunk of the stream, and extract every packet it completes.
+        Bytes before a header are skipped and counted in noise_bytes.  Bytes
+        of an incomplete packet are kept until the next call.  If a bad
+        packet is found its error is raised; payloads completed before it
+        are returned by the next call.
+
+        @param data bytearray, str or memoryview of stream data
+        @return list of payloads (bytearrays) completed by this data
+        """
+        buf = self._buffer
+        buf += data
+        header = chr(makerbot_driver.constants.header)
+        max_length = makerbot_driver.constants.maximum_payload_length
+        end = len(buf)
+        pos = 0
+        try:
+            while True:
+                start = buf.find(header, pos)
+                if start < 0:
+                    self.noise_bytes += end - pos
+                    pos = end
+                    self.state = self.WAIT_FOR_HEADER
+                    break
+                self.noise_bytes += start - pos
+                pos = start
+                if end - pos < 2:
+                    self.state = self.WAIT_FOR_LENGTH
+                    break
+                length = buf[pos + 1]
+                if length > max_length:
+                    # Drop this header so the next call resynchronizes
+                    pos += 1
+                    self.state = self.WAIT_FOR_HEADER
+                    raise makerbot_driver.errors.PacketLengthFieldError(length, max_length)
+                if end - pos < length + 3:
+                    self.expected_length = length
+                    if end - pos < length + 2:
+                        self.state = self.WAIT_FOR_DATA
+                    else:
+                        self.state = self.WAIT_FOR_CRC
+                    break
+                payload = buf[pos + 2:pos + 2 + length]
+                actual_crc = buf[pos + 2 + length]
+                crc = makerbot_driver.Encoder.CalculateCRC(payload)
+                if crc != actual_crc:
+                    pos += 1
+                    self.state = self.WAIT_FOR_HEADER
+                    raise makerbot_driver.errors.PacketCRCError(actual_crc, crc)
+                self._ready.append(payload)
+                pos += length + 3
+        finally:
+            del buf[:pos]
+        ready = self._ready
+        self._ready = []
+        return ready
+
+    def reset(self):
+        """
+        Discard any partially received packet and return to waiting for a header
+        """
+        self.state = self.WAIT_FOR_HEADER
+        self.payload = bytearray()
+        self.expected_length = 0
+        del self._buffer[:]
+        self._ready = []
@@ -0,0 +1,88 @@
+from __future__ import absolute_import
+
+import struct
+
+import makerbot_driver
+
+
+class PacketBuilder(object):
+    """
+    Packs one kind of fixed length command with a precompiled struct.
+
+    pack() keeps the payload of a single command; packet() frames it in a
+    preallocated packet buffer, so the crc is only calculated by writers
+    that send packets, not by ones that store bare payloads (i.e.
+    FileWriter).  The buffer is overwritten by the next call to packet(),
+    so anything that keeps a packet around has to copy it.
+
+    pack_payload_into() and pack_packet_into() write straight into a
+    caller's buffer, for packing many commands into one write.
+    """
+
+    def __init__(self, code, command):
+        """
+        @param str code: struct format of the whole payload, command byte included
+        @param int command: Command code written as the first payload byte
+        """
+        self.command = command
+        self.struct = struct.Struct(code)
+        self.payload_length = self.struct.size
+        self.packet_length = self.payload_length + 3
+        if self.payload_length > makerbot_driver.constants.maximum_payload_length:
+            raise makerbot_driver.errors.PacketLengthError(
+                self.payload_length, makerbot_driver.constants.maximum_payload_length)
+        self.buffer = bytearray(self.packet_length)
+        self.buffer[0] = makerbot_driver.constants.header
+        self.buffer[1] = self.payload_length
+        self._pack = self.struct.pack
+        self._pack_into = self.struct.pack_into
+        self._payload = None
+
+    def pack(self, *args):
+        """
+        Pack the arguments of a command
+        @param args: Values for the format, after the command byte
+        """
+        self._payload = self._pack(self.command, *args)
+
+    def payload(self):
+        """
+        @return str: The payload last packed
+        """
+        return self._payload
+
+    def packet(self):
+        """
+        @return bytearray: The payload last packed, framed as a packet
+        """
+        packet = self.buffer
+        packet[2:-1] = self._payload
+        packet[-1] = makerbot_driver.Encoder.crc_update(self._payload)
+        return packet
+
+    def pack_payload_into(self, buf, offset, *args):
+        """
+        Pack a command's payload into a buffer
+        @param bytearray buf: Buffer to write to
+        @param int offset: Position in buf to write at
+        @param args: Values for the format, after the command byte
+        @return int: Position in buf after the payload
+        """
+        self._pack_into(buf, offset, self.command, *args)
+        return offset + self.payload_length
+
+    def pack_packet_into(self, buf, offset, *args):
+        """
+        Pack a command into a buffer as a complete packet
+        @param bytearray buf: Buffer to write to
+        @param int offset: Position in buf to write at
+        @param args: Values for the format, after the command byte
+        @return int: Position in buf after the packet
+        """
+        length = self.payload_length
+        buf[offset] = makerbot_driver.constants.header
+        buf[offset + 1] = length
+        self._pack_into(buf, offset + 2, self.command, *args)
+        buf[offset + 2 + length] = makerbot_driver.Encoder.crc_update(
+            buffer(buf, offset + 2, length))
+        return offset + length + 3
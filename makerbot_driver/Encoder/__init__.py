@@ -1,5 +1,6 @@
-__all__ = ['Coding', 'Crc', 'Packet']
+__all__ = ['Coding', 'Crc', 'Packet', 'PacketBuilder']
 
 from Coding import *
 from Crc import *
 from Packet import *
+from PacketBuilder import *
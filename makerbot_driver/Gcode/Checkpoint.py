@@ -0,0 +1,86 @@
+"""
+Checkpoints of a GcodeParser's state, so a build can carry on from the
+middle of a file without running the lines before it again.
+"""
+
+from __future__ import absolute_import
+
+import json
+
+__all__ = ['ParserCheckpoint']
+
+
+class ParserCheckpoint(object):
+    """
+    Everything a GcodeParser keeps between lines of gcode: the position
+    (and which axes are lost), the state's values (feedrate, tool indexes,
+    build name), the build percentage, the line number and the variables
+    in its environment.  offset is the file's tell() at the next line to
+    execute, if the checkpoint was taken while running a file.
+
+    Made with GcodeParser.checkpoint and put back with GcodeParser.restore.
+    Checkpoints can be pickled, or saved as json with write_json.
+    """
+
+    def __init__(self, position, lost, values, percentage, line_number,
+                 environment, offset=None):
+        """
+        @param list position: 5D position, in mm
+        @param int lost: Bitmask of the axes whose position is lost, as Point.lost
+        @param dict values: GcodeStates.values
+        @param int percentage: Last build percentage set
+        @param int line_number: Number of the next line to execute
+        @param dict environment: Variables substituted into the gcode
+        @param int offset: Offset of the next line to execute, as tell() gives it
+        """
+        self.position = position
+        self.lost = lost
+        self.values = values
+        self.percentage = percentage
+        self.line_number = line_number
+        self.environment = environment
+        self.offset = offset
+
+    def to_dict(self):
+        return {
+            'position': self.position,
+            'lost': self.lost,
+            'values': self.values,
+            'percentage': self.percentage,
+            'line_number': self.line_number,
+            'environment': self.environment,
+            'offset': self.offset,
+        }
+
+    @classmethod
+    def from_dict(cls, checkpoint):
+        """
+        @param dict checkpoint: Checkpoint as made by to_dict
+        @return ParserCheckpoint
+        """
+        values = dict((str(key), value) for key, value in checkpoint['values'].items())
+        # json gives back unicode strings, gcode is handled as str
+        if isinstance(values.get('build_name'), unicode):
+            values['build_name'] = values['build_name'].encode('utf8')
+        environment = dict(
+            (str(key), value) for key, value in checkpoint['environment'].items())
+        return cls(
+            checkpoint['position'], checkpoint['lost'], values,
+            checkpoint['percentage'], checkpoint['line_number'], environment,
+            checkpoint['offset'])
+
+    def write_json(self, path):
+        """
+        @param str path: Path to save the checkpoint to
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def read_json(cls, path):
+        """
+        @param str path: Path of a checkpoint saved by write_json
+        @return ParserCheckpoint
+        """
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,145 @@
+"""
+Estimates how long a build takes and how much it extrudes from the moves
+a GcodeParser makes while it compiles, so no separate pass over the file
+is needed.
+"""
+
+from __future__ import absolute_import
+
+import json
+
+__all__ = ['BuildEstimator']
+
+
+class BuildEstimator(object):
+    """
+    Accumulates an estimate of a build from the moves a GcodeParser makes.
+    Every move adds the time the parser worked out for it, its A and B
+    extrusion, and its target to the bounding box.  A new layer starts
+    whenever the build extrudes at a different Z height; moves that don't
+    extrude, i.e. travel and Z hops, count towards the layer they are in.
+
+    Usage:
+        parser.estimator = makerbot_driver.Gcode.BuildEstimator()
+        for line in gcodes:
+            parser.execute_line(line)
+        summary = parser.estimator.summary()
+    """
+
+    def __init__(self):
+        # Estimated minutes for the whole build
+        self.minutes = 0.0
+        self.moves = 0
+        # [z, minutes] of each layer in order; z is None for moves made
+        # before anything is extruded
+        self.layers = []
+        # mm of filament pushed by the A and B axes (tools 0 and 1)
+        self.extruded = [0.0, 0.0]
+        # Corners of the box around every move's X, Y and Z
+        self.minimums = None
+        self.maximums = None
+        self._layer = None
+
+    def add_move(self, start, end, distance, minutes):
+        """
+        @param list start: 5D position the move starts from, in mm
+        @param list end: 5D position the move ends at, in mm
+        @param float distance: Distance the move covers, in mm
+        @param float minutes: Time the move takes
+        """
+        self.minutes += minutes
+        self.moves += 1
+        a = end[3] - start[3]
+        b = end[4] - start[4]
+        self.extruded[0] += a
+        self.extruded[1] += b
+
+        x, y, z = end[0], end[1], end[2]
+        layer = self._layer
+        if layer is None or ((a > 0 or b > 0) and z != layer[0]):
+            layer = self._layer = [z if a > 0 or b > 0 else None, 0.0]
+            self.layers.append(layer)
+        layer[1] += minutes
+
+        minimums = self.minimums
+        if minimums is None:
+            self.minimums = [x, y, z]
+            self.maximums = [x, y, z]
+            return
+        maximums = self.maximums
+        if x < minimums[0]:
+            minimums[0] = x
+        elif x > maximums[0]:
+            maximums[0] = x
+        if y < minimums[1]:
+            minimums[1] = y
+        elif y > maximums[1]:
+            maximums[1] = y
+        if z < minimums[2]:
+            minimums[2] = z
+        elif z > maximums[2]:
+            maximums[2] = z
+
+    def add_dwell(self, minutes):
+        """
+        @param float minutes: Time the build pauses for
+        """
+        self.minutes += minutes
+        if self._layer is None:
+            self._layer = [None, 0.0]
+            self.layers.append(self._layer)
+        self._layer[1] += minutes
+
+    def merge(self, following):
+        """
+        Adds on the estimate of the moves that came after this one's, i.e.
+        from the next shard of a parallel compile
+
+        @param BuildEstimator following: Estimate of the following moves
+        """
+        self.minutes += following.minutes
+        self.moves += following.moves
+        self.extruded[0] += following.extruded[0]
+        self.extruded[1] += following.extruded[1]
+
+        layers = [list(layer) for layer in following.layers]
+        # Layers that carry on the one this estimate ended in
+        while layers and self._layer is not None and \
+                layers[0][0] in (None, self._layer[0]):
+            self._layer[1] += layers.pop(0)[1]
+        self.layers.extend(layers)
+        if self.layers:
+            self._layer = self.layers[-1]
+
+        if following.minimums is not None:
+            if self.minimums is None:
+                self.minimums = list(following.minimums)
+                self.maximums = list(following.maximums)
+            else:
+                self.minimums = map(min, self.minimums, following.minimums)
+                self.maximums = map(max, self.maximums, following.maximums)
+
+    def summary(self):
+        """
+        @return dict: The estimate, made only of values json can encode:
+            minutes, moves, layers ([z, minutes] of each), extruded (mm by
+            the A and B axes), minimums and maximums (X, Y and Z corners of
+            the bounding box, None when there were no moves)
+        """
+        return {
+            'minutes': self.minutes,
+            'moves': self.moves,
+            'layers': [list(layer) for layer in self.layers],
+            'extruded': list(self.extruded),
+            'minimums': self.minimums and list(self.minimums),
+            'maximums': self.maximums and list(self.maximums),
+        }
+
+    def write_json(self, path):
+        """
+        Writes the summary to a json file
+
+        @param str path: Path to write to
+        """
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f)
@@ -0,0 +1,196 @@
+"""
+Motion math for whole runs of moves at once.  The functions in Utils work
+out one move at a time from Python lists; these take the positions of N
+moves as an Nx5 array and work out every move's stepped point, DDA speed,
+distance and safe feedrate together, the same way linear_interpolation
+does for a single move.  This lets a batch of moves, i.e. a layer, be
+computed and then queued with s3g.queue_extended_points.  GcodeParser
+still queues one move per G1, since every move also updates its state,
+estimator and sinks in order with the commands around it.
+
+NumPy is used when it is installed; otherwise the same results are
+worked out move by move in pure Python.
+"""
+
+from __future__ import absolute_import
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    # Moves are worked out one at a time instead
+    numpy = None
+
+import makerbot_driver
+
+__all__ = ['calculate_moves', 'queue_moves']
+
+# Microseconds in a minute, for converting mm/min into us/step
+_MICROSECONDS_PER_MINUTE = 60 * 1000000
+
+
+def _move_error(error, index):
+    error.values['MoveIndex'] = index
+    return error
+
+
+def _check_vector(vector):
+    if len(vector) != 5:
+        raise makerbot_driver.PointLengthError(
+            "Expected list of length 5, got length %i" % (len(vector)))
+
+
+def calculate_moves(start, targets, feedrates, max_feedrates, steps_per_mm):
+    """
+    Given a starting position and the targets of a run of moves, works out
+    what linear_interpolation would queue for each move.
+
+    @param list start: 5D position the first move starts from, in mm
+    @param targets: Nx5 target positions, in mm, as a numpy array or a list
+        of 5D lists.  Each move starts from the previous move's target.
+    @param feedrates: Requested feedrate of each move in mm/min, or a single
+        feedrate for all of them
+    @param list max_feedrates: 5D vector of maximum feedrates, in mm/min
+    @param list steps_per_mm: 5D vector of steps per mm
+    @return tuple: (stepped_points, dda_speeds, distances, safe_feedrates),
+        numpy arrays when numpy is installed, lists otherwise.  Safe
+        feedrates are in mm/min, as get_safe_feedrate returns them.
+    """
+    _check_vector(start)
+    _check_vector(max_feedrates)
+    _check_vector(steps_per_mm)
+    if numpy is not None:
+        return _calculate_moves_numpy(
+            start, targets, feedrates, max_feedrates, steps_per_mm)
+    return _calculate_moves_python(
+        start, targets, feedrates, max_feedrates, steps_per_mm)
+
+
+def queue_moves(s3g, start, targets, feedrates, max_feedrates, steps_per_mm):
+    """
+    Works out a run of moves with calculate_moves and queues them all with
+    a single s3g.queue_extended_points.  Stepped points are rounded to the
+    nearest whole step before they are packed.
+
+    @param s3g s3g: s3g object to queue the moves with
+    @return The safe feedrates of the moves, in mm/min
+    """
+    stepped_points, dda_speeds, distances, safe_feedrates = calculate_moves(
+        start, targets, feedrates, max_feedrates, steps_per_mm)
+    # The x3g points take steps per second, as queue_extended_point makes
+    # them, not the DDA speeds in microseconds per step
+    if numpy is not None:
+        stepped_points = numpy.rint(stepped_points).astype(numpy.int64)
+        dda_rates = 1000000.0 / dda_speeds
+        feedrates_mm_sec = safe_feedrates / 60.0
+    else:
+        stepped_points = [[int(round(value)) for value in point]
+                          for point in stepped_points]
+        dda_rates = [1000000.0 / dda_speed for dda_speed in dda_speeds]
+        feedrates_mm_sec = [feedrate / 60.0 for feedrate in safe_feedrates]
+    s3g.queue_extended_points(
+        stepped_points, dda_rates, distances, feedrates_mm_sec)
+    return safe_feedrates
+
+
+def _calculate_moves_numpy(start, targets, feedrates, max_feedrates, steps_per_mm):
+    targets = numpy.asarray(targets, dtype=float)
+    if targets.size == 0:
+        targets = targets.reshape(0, 5)
+    if targets.ndim != 2 or targets.shape[1] != 5:
+        raise makerbot_driver.PointLengthError(
+            "Expected Nx5 targets, got shape %r" % (targets.shape,))
+    count = len(targets)
+    feedrates = numpy.asarray(feedrates, dtype=float)
+    if feedrates.ndim == 0:
+        feedrates = numpy.repeat(feedrates, count)
+    elif len(feedrates) != count:
+        raise makerbot_driver.ParameterError(
+            "Expected %i feedrates, got %i" % (count, len(feedrates)))
+    max_feedrates = numpy.asarray(max_feedrates, dtype=float)
+    steps_per_mm = numpy.asarray(steps_per_mm, dtype=float)
+
+    displacements = numpy.empty_like(targets)
+    if count:
+        displacements[0] = targets[0] - numpy.asarray(start, dtype=float)
+        displacements[1:] = targets[1:] - targets[:-1]
+    squares = displacements * displacements
+    magnitudes = numpy.sqrt(squares.sum(axis=1))
+    still = numpy.flatnonzero(magnitudes == 0)
+    if len(still):
+        raise _move_error(makerbot_driver.Gcode.VectorLengthZeroError(), int(still[0]))
+    slow = numpy.flatnonzero(feedrates <= 0)
+    if len(slow):
+        raise _move_error(makerbot_driver.Gcode.InvalidFeedrateError(), int(slow[0]))
+
+    rows = numpy.arange(count)
+    lengths = numpy.abs(displacements)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        # get_safe_feedrate caps the move by the last axis that is too fast
+        too_fast = (feedrates / magnitudes)[:, None] * lengths > max_feedrates
+        last_too_fast = 4 - numpy.argmax(too_fast[:, ::-1], axis=1)
+        capped = max_feedrates[last_too_fast] / lengths[rows, last_too_fast] * magnitudes
+    safe_feedrates = numpy.where(too_fast.any(axis=1), capped, feedrates)
+
+    # The axis with the most steps to move sets the DDA speed
+    longest = numpy.argmax(numpy.abs(displacements * steps_per_mm), axis=1)
+    fastest_feedrates = lengths[rows, longest] / magnitudes * safe_feedrates
+    dda_speeds = _MICROSECONDS_PER_MINUTE / (
+        fastest_feedrates * numpy.abs(steps_per_mm[longest]))
+
+    # Distance is along X, Y and Z, or the longer of A and B if those don't move
+    distances = numpy.sqrt(squares[:, :3].sum(axis=1))
+    distances = numpy.where(
+        distances == 0, numpy.maximum(lengths[:, 3], lengths[:, 4]), distances)
+
+    stepped_points = targets * steps_per_mm
+    return stepped_points, dda_speeds, distances, safe_feedrates
+
+
+def _calculate_moves_python(start, targets, feedrates, max_feedrates, steps_per_mm):
+    targets = list(targets)
+    for target in targets:
+        _check_vector(target)
+    if isinstance(feedrates, (int, long, float)):
+        feedrates = [feedrates] * len(targets)
+    elif len(feedrates) != len(targets):
+        raise makerbot_driver.ParameterError(
+            "Expected %i feedrates, got %i" % (len(targets), len(feedrates)))
+    axes = range(5)
+
+    stepped_points = []
+    dda_speeds = []
+    distances = []
+    safe_feedrates = []
+    current = start
+    for index, (target, feedrate) in enumerate(zip(targets, feedrates)):
+        displacement = [target[i] - current[i] for i in axes]
+        squares = [d * d for d in displacement]
+        magnitude = math.sqrt(sum(squares))
+        if magnitude == 0:
+            raise _move_error(makerbot_driver.Gcode.VectorLengthZeroError(), index)
+        if feedrate <= 0:
+            raise _move_error(makerbot_driver.Gcode.InvalidFeedrateError(), index)
+
+        safe_feedrate = feedrate
+        per_mm = float(feedrate) / magnitude
+        for d, max_feedrate in zip(displacement, max_feedrates):
+            if per_mm * abs(d) > max_feedrate:
+                safe_feedrate = float(max_feedrate) / abs(d) * magnitude
+
+        steps = [abs(displacement[i] * steps_per_mm[i]) for i in axes]
+        longest = steps.index(max(steps))
+        fastest_feedrate = abs(displacement[longest]) / magnitude * safe_feedrate
+        dda_speeds.append(_MICROSECONDS_PER_MINUTE / (
+            fastest_feedrate * abs(steps_per_mm[longest])))
+
+        distance = math.sqrt(squares[0] + squares[1] + squares[2])
+        if distance == 0:
+            distance = max(abs(displacement[3]), abs(displacement[4]))
+        distances.append(distance)
+
+        stepped_points.append([target[i] * steps_per_mm[i] for i in axes])
+        safe_feedrates.append(safe_feedrate)
+        current = target
+    return stepped_points, dda_speeds, distances, safe_feedrates
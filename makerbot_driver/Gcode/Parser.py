@@ -7,6 +7,45 @@ import time
 import makerbot_driver
 
 
+class _Environment(dict):
+    """
+    A GcodeParser's variables: a dict that counts the changes made to it,
+    so the parser only compiles it again after one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_Environment, self).__init__(*args, **kwargs)
+        self.changes = 0
+
+    def __setitem__(self, key, value):
+        self.changes += 1
+        super(_Environment, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.changes += 1
+        super(_Environment, self).__delitem__(key)
+
+    def clear(self):
+        self.changes += 1
+        super(_Environment, self).clear()
+
+    def pop(self, *args):
+        self.changes += 1
+        return super(_Environment, self).pop(*args)
+
+    def popitem(self):
+        self.changes += 1
+        return super(_Environment, self).popitem()
+
+    def setdefault(self, key, default=None):
+        self.changes += 1
+        return super(_Environment, self).setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self.changes += 1
+        super(_Environment, self).update(*args, **kwargs)
+
+
 class GcodeParser(object):
     """
     Read in gcode line by line, tracking some state variables and running known
@@ -17,6 +56,11 @@ class GcodeParser(object):
         self.s3g = None
         self.environment = {}
         self.line_number = 1
+        self.last_move_minutes = 0
+        # Optional BuildEstimator told about every move
+        self.estimator = None
+        # Reused by every move to hold where it's going
+        self._target = makerbot_driver.Gcode.Point()
         self._log = logging.getLogger(self.__class__.__name__)
 
         # Note: The datastructure looks like this:
@@ -49,6 +93,104 @@ class GcodeParser(object):
             136: [self.build_start_notification, '', ''],
             137: [self.build_end_notification, '', ''],
         }
+        self.compile_instructions()
+
+    @property
+    def environment(self):
+        """
+        Variables substituted into the gcode.  A dict assigned here is
+        copied, so later changes to it must be made through the parser.
+        """
+        return self._environment
+
+    @environment.setter
+    def environment(self, environment):
+        self._environment = _Environment(environment)
+        # CompiledEnvironment for the environment, remade when it changes
+        self._compiled_environment = None
+        self._compiled_environment_changes = None
+
+    def add_sink(self, sink):
+        """
+        Send every command to sink as well as to the s3g object.  The
+        first sink added puts a FanOutSink in front of self.s3g.
+
+        @param sink: GcodeSink, or anything with the same commands
+        """
+        if not isinstance(self.s3g, makerbot_driver.Gcode.FanOutSink):
+            sinks = []
+            if self.s3g is not None:
+                sinks.append(self.s3g)
+            self.s3g = makerbot_driver.Gcode.FanOutSink(sinks)
+        self.s3g.add_sink(sink)
+
+    def checkpoint(self, offset=None):
+        """
+        Save the parser's state between lines
+
+        @param int offset: Byte offset in the file of the next line to execute
+        @return ParserCheckpoint: Copy of the state, to give to restore
+        """
+        return makerbot_driver.Gcode.ParserCheckpoint(
+            list(self.state.position.values),
+            self.state.position.lost,
+            dict(self.state.values),
+            self.state.percentage,
+            self.line_number,
+            dict(self.environment),
+            offset,
+        )
+
+    def restore(self, checkpoint):
+        """
+        Put the parser back in the state it was in when a checkpoint was
+        made, so execution carries on from the line after it.  The profile
+        and s3g object are kept.
+
+        @param ParserCheckpoint checkpoint: The state to go back to
+        """
+        self.state.position.values[:] = checkpoint.position
+        self.state.position.lost = checkpoint.lost
+        self.state.values = dict(checkpoint.values)
+        self.state.percentage = checkpoint.percentage
+        self.line_number = checkpoint.line_number
+        self.environment = dict(checkpoint.environment)
+
+    def compile_instructions(self):
+        """
+        Build the dispatch tables execute_line uses out of GCODE_INSTRUCTIONS
+        and MCODE_INSTRUCTIONS.  Must be called again if either is changed.
+        """
+        self._gcode_table = self._compile_table(self.GCODE_INSTRUCTIONS)
+        self._mcode_table = self._compile_table(self.MCODE_INSTRUCTIONS)
+        # Plain G1 moves are nearly every line of a file
+        self._move_instruction = self._gcode_table.get(1)
+
+    @staticmethod
+    def _compile_table(instructions):
+        """
+        @param dict instructions: Map of command numbers to [command, allowed codes, allowed flags]
+        @return dict: Map of command numbers to (command, allowed codes, allowed flags,
+            allowed code set, allowed flag set)
+        """
+        table = {}
+        for number, (command, allowed_codes, allowed_flags) in instructions.items():
+            table[number] = (
+                command, allowed_codes, allowed_flags,
+                frozenset(allowed_codes + 'GM'), frozenset(allowed_flags + 'GM'),
+            )
+        return table
+
+    @staticmethod
+    def _execute_instruction(instruction, codes, flags, comment):
+        command, allowed_codes, allowed_flags, code_set, flag_set = instruction
+        if not code_set.issuperset(codes):
+            makerbot_driver.Gcode.check_for_extraneous_codes(
+                codes.keys(), allowed_codes)
+        if flags and not flag_set.issuperset(flags):
+            makerbot_driver.Gcode.check_for_extraneous_codes(
+                flags, allowed_flags)
+        command(codes, flags, comment)
 
     def execute_line(self, command):
         """
@@ -64,18 +206,28 @@ class GcodeParser(object):
             raise makerbot_driver.Gcode.ImproperGcodeEncodingError
 
         try:
-            command = makerbot_driver.Gcode.variable_substitute(command, self.environment)
+            # Every variable starts with a '#'
+            if '#' in command:
+                environment = self._environment
+                if self._compiled_environment_changes != environment.changes:
+                    self._compiled_environment = \
+                        makerbot_driver.Gcode.compile_environment(environment)
+                    self._compiled_environment_changes = environment.changes
+                command = self._compiled_environment.substitute(command)
 
             codes, flags, comment = makerbot_driver.Gcode.parse_line(command)
 
-            if 'G' in codes:
-                if codes['G'] in self.GCODE_INSTRUCTIONS:
-                    makerbot_driver.Gcode.check_for_extraneous_codes(
-                        codes.keys(), self.GCODE_INSTRUCTIONS[codes['G']][1])
-                    makerbot_driver.Gcode.check_for_extraneous_codes(
-                        flags, self.GCODE_INSTRUCTIONS[codes['G']][2])
-                    self.GCODE_INSTRUCTIONS[codes['G']
-                                            ][0](codes, flags, comment)
+            move = self._move_instruction
+            # A valid plain move skips the generic lookup and checks; anything
+            # else about it goes the long way round for its error
+            if move is not None and codes.get('G') == 1 and not flags and \
+                    move[3].issuperset(codes):
+                move[0](codes, flags, comment)
+
+            elif 'G' in codes:
+                instruction = self._gcode_table.get(codes['G'])
+                if instruction is not None:
+                    self._execute_instruction(instruction, codes, flags, comment)
 
                 else:
                     self._log.error('{"event":"unrecognized_command", "command":%s}', codes['G'])
@@ -84,13 +236,9 @@ class GcodeParser(object):
                     raise gcode_error
 
             elif 'M' in codes:
-                if codes['M'] in self.MCODE_INSTRUCTIONS:
-                    makerbot_driver.Gcode.check_for_extraneous_codes(
-                        codes.keys(), self.MCODE_INSTRUCTIONS[codes['M']][1])
-                    makerbot_driver.Gcode.check_for_extraneous_codes(
-                        flags, self.MCODE_INSTRUCTIONS[codes['M']][2])
-                    self.MCODE_INSTRUCTIONS[codes['M']
-                                            ][0](codes, flags, comment)
+                instruction = self._mcode_table.get(codes['M'])
+                if instruction is not None:
+                    self._execute_instruction(instruction, codes, flags, comment)
 
                 else:
                     self._log.error('{"event":"unrecognized_command", "command":%s}', codes['M'])
@@ -202,7 +350,7 @@ class GcodeParser(object):
         stepped_position = makerbot_driver.Gcode.multiply_vector(
 #            self.state.get_position(),
             new_position,
-            self.state.get_axes_values('steps_per_mm')
+            self.state.steps_per_mm
         )
         try:
             self.s3g.set_extended_position(stepped_position)
@@ -307,20 +455,24 @@ class GcodeParser(object):
             else:
                 raise makerbot_driver.Gcode.NoFeedrateSpecifiedError
             if len(makerbot_driver.Gcode.parse_out_axes(codes)) > 0 or 'E' in codes:
-                current_position = self.state.get_position()
-                new_position = self.state.position.copy() 
-                new_position.SetPoint(codes)
-                new_position = new_position.ToList()
+                self.state.check_position()
+                current_position = self.state.position.values
+                target = self._target
+                target.copy_from(self.state.position)
+                target.SetPoint(codes)
+                new_position = target.values
                 dda_speed = makerbot_driver.Gcode.calculate_DDA_speed(
                     current_position,
                     new_position,
                     new_feedrate,
-                    self.state.get_axes_values('max_feedrate'),
-                    self.state.get_axes_values('steps_per_mm'),
+                    self.state.max_feedrates,
+                    self.state.steps_per_mm,
+                    self.state.min_per_mm,
+                    self.state.mm_per_step,
                 )
                 stepped_point = makerbot_driver.Gcode.multiply_vector(
                     new_position,
-                    self.state.get_axes_values('steps_per_mm')
+                    self.state.steps_per_mm
                 )
                 #Get euclidean distance for x,y,z axes
                 e_distance = makerbot_driver.Gcode.Utils.calculate_euclidean_distance(current_position[:3], new_position[:3])
@@ -336,12 +488,17 @@ class GcodeParser(object):
                 )
                 safe_feedrate_mm_min = makerbot_driver.Gcode.get_safe_feedrate(
                     displacement_vector,
-                    self.state.get_axes_values('max_feedrate'),
+                    self.state.max_feedrates,
                     new_feedrate,
+                    self.state.min_per_mm,
                 )
                 move_minutes = e_distance / safe_feedrate_mm_min
                 safe_feedrate_mm_sec = safe_feedrate_mm_min / 60.0
                 self.s3g.queue_extended_point(stepped_point, dda_speed, e_distance, safe_feedrate_mm_sec)
+                self.last_move_minutes = move_minutes
+                if self.estimator is not None:
+                    self.estimator.add_move(
+                        current_position, new_position, e_distance, move_minutes)
 
         except KeyError as e:
             if e[0] == 'feedrate':  # A key error would return 'feedrate' as the missing key,
@@ -365,6 +522,8 @@ class GcodeParser(object):
         miliConstant = 1000
         d = codes['P'] * microConstant / miliConstant
         self.s3g.delay(d)
+        if self.estimator is not None:
+            self.estimator.add_dwell(codes['P'] / 60000.0)
 
     def set_toolhead_temperature(self, codes, flags, comment):
         """Sets the toolhead temperature for a specific toolhead to
@@ -4,17 +4,53 @@ contained within GcodeState.  Since it is intended to only
 be used with the Gcode Module, it assumes that its axes values
 will only be set to integer values.  Gcode parser should only
 be settings these values to ints anyway.
+
+Positions are kept in a fixed list of values, with a bitmask of the
+axes whose position is unknown, so points can be updated in place
+without allocating.  Reading a lost axis gives None, and setting an
+axis to None loses it.
 """
 
+AXES = ('X', 'Y', 'Z', 'A', 'B')
+ALL_AXES_LOST = (1 << len(AXES)) - 1
+
+# (axis, index, mask clearing that axis' lost bit) for updating from codes
+_AXIS_UPDATES = tuple(
+    (axis, index, ALL_AXES_LOST & ~(1 << index)) for index, axis in enumerate(AXES))
+
+
+def _axis_property(index):
+    bit = 1 << index
+
+    def get_axis(self):
+        if self.lost & bit:
+            return None
+        return self.values[index]
+
+    def set_axis(self, value):
+        if value is None:
+            self.lost |= bit
+        else:
+            self.values[index] = value
+            self.lost &= ~bit
+
+    return property(get_axis, set_axis)
+
 
 class Point(object):
+    __slots__ = ('values', 'lost')
+
+    X = _axis_property(0)
+    Y = _axis_property(1)
+    Z = _axis_property(2)
+    A = _axis_property(3)
+    B = _axis_property(4)
 
     def __init__(self):
-        self.X = None
-        self.Y = None
-        self.Z = None
-        self.A = None
-        self.B = None
+        # Last known position of each axis; meaningless for lost axes
+        self.values = [0, 0, 0, 0, 0]
+        # Bit i is set when the position of AXES[i] is unknown
+        self.lost = ALL_AXES_LOST
 
     def ToList(self):
         return [self.X, self.Y, self.Z, self.A, self.B]
@@ -25,12 +61,33 @@ class Point(object):
 
         @param dict codes: The codes that may or may not contain axes values
         """
-        for axis in ['X', 'Y', 'Z', 'A', 'B']:
+        values = self.values
+        lost = self.lost
+        for axis, index, found in _AXIS_UPDATES:
             if axis in codes:
-                setattr(self, axis, codes[axis])
+                values[index] = codes[axis]
+                lost &= found
+        self.lost = lost
 
     def copy(self):
         copy_point = Point()
-        for axis in ['X', 'Y', 'Z', 'A', 'B']:
-            setattr(copy_point, axis, getattr(self, axis))
+        copy_point.copy_from(self)
         return copy_point
+
+    def copy_from(self, other):
+        """Make this point the same as another, in place.
+
+        @param Point other: The point to copy
+        """
+        self.values[:] = other.values
+        self.lost = other.lost
+
+    def first_lost_axis(self):
+        """
+        @return str: The first of X, Y, Z, A, B whose position is lost, or
+            None if every position is known
+        """
+        for index, axis in enumerate(AXES):
+            if self.lost & (1 << index):
+                return axis
+        return None
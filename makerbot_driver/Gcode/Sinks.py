@@ -0,0 +1,209 @@
+"""
+Sinks take the commands a GcodeParser sends to its s3g object.  An s3g
+object is one sink; others can check, record or draw the build, and a
+FanOutSink sends every command to several of them, so one parse of a
+file can feed them all.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['SINK_COMMANDS', 'GcodeSink', 'FanOutSink', 'ToolpathSink']
+
+# Every command a GcodeParser sends to its s3g object
+SINK_COMMANDS = (
+    'queue_extended_point',
+    'set_extended_position',
+    'find_axes_maximums',
+    'find_axes_minimums',
+    'recall_home_positions',
+    'toggle_axes',
+    'set_potentiometer_value',
+    'change_tool',
+    'set_toolhead_temperature',
+    'set_platform_temperature',
+    'wait_for_tool_ready',
+    'wait_for_platform_ready',
+    'toggle_extra_output',
+    'delay',
+    'display_message',
+    'queue_song',
+    'set_build_percent',
+    'build_start_notification',
+    'build_end_notification',
+)
+
+
+class GcodeSink(object):
+    """
+    Takes the commands a GcodeParser sends, with the same arguments as
+    the s3g methods of the same names.  Every command does nothing here,
+    so a sink only needs the commands it is interested in.
+    """
+
+    # Moves
+    def queue_extended_point(self, position, dda_speed, e_distance, feedrate_mm_sec, relative_axes=[]):
+        pass
+
+    def set_extended_position(self, position):
+        pass
+
+    def find_axes_maximums(self, axes, rate, timeout):
+        pass
+
+    def find_axes_minimums(self, axes, rate, timeout):
+        pass
+
+    def recall_home_positions(self, axes):
+        pass
+
+    def toggle_axes(self, axes, enable):
+        pass
+
+    def set_potentiometer_value(self, axis, value):
+        pass
+
+    # Tools and temperatures
+    def change_tool(self, tool_index):
+        pass
+
+    def set_toolhead_temperature(self, tool_index, temperature):
+        pass
+
+    def set_platform_temperature(self, tool_index, temperature):
+        pass
+
+    def wait_for_tool_ready(self, tool_index, delay, timeout):
+        pass
+
+    def wait_for_platform_ready(self, tool_index, delay, timeout):
+        pass
+
+    def toggle_extra_output(self, tool_index, state):
+        pass
+
+    # Delays and notifications
+    def delay(self, delay):
+        pass
+
+    def display_message(self, row, col, message, timeout, clear_existing, last_in_group, wait_for_button):
+        pass
+
+    def queue_song(self, song_id):
+        pass
+
+    def set_build_percent(self, percent):
+        pass
+
+    def build_start_notification(self, build_name):
+        pass
+
+    def build_end_notification(self):
+        pass
+
+
+def _fan_out(calls):
+    def fan_out(*args, **kwargs):
+        for call in calls:
+            call(*args, **kwargs)
+    return fan_out
+
+
+class FanOutSink(object):
+    """
+    Sends every command to each of a list of sinks, in order.  If a sink
+    raises an error, the sinks after it don't get the command.  Anything
+    else asked of a FanOutSink, i.e. set_print_to_file_type, goes to its
+    first sink, so an s3g object put first can still be used as one.
+
+    Usage:
+        parser.s3g = makerbot_driver.Gcode.FanOutSink([s3g, preview])
+    or
+        parser.add_sink(preview)
+    """
+
+    def __init__(self, sinks=None):
+        """
+        @param list sinks: Sinks to send commands to, i.e. an s3g object
+            and GcodeSinks
+        """
+        self.sinks = []
+        if sinks is not None:
+            for sink in sinks:
+                self.add_sink(sink)
+        else:
+            self._bind_commands()
+
+    def add_sink(self, sink):
+        """
+        @param sink: Sink to send commands to after the existing ones
+        """
+        self.sinks.append(sink)
+        self._bind_commands()
+
+    def _bind_commands(self):
+        # Each command gets the list of bound methods to call up front
+        for command in SINK_COMMANDS:
+            setattr(self, command, _fan_out(
+                [getattr(sink, command) for sink in self.sinks]))
+
+    def __getattr__(self, name):
+        if name == 'sinks' or not self.sinks:
+            raise AttributeError(name)
+        return getattr(self.sinks[0], name)
+
+
+class ToolpathSink(GcodeSink):
+    """
+    Records where the build moves, in mm, for drawing a preview of it.
+    Moves are split into paths, a new one starting wherever the position
+    is set or the tool changes.
+
+    paths is a list of (tool_index, points), where each point is
+    [x, y, z, extruding] and extruding is True if the A or B axis moved
+    forward on the way to it.  A path's first point is where it starts.
+    """
+
+    def __init__(self, mm_per_step):
+        """
+        @param list mm_per_step: 5D vector of mm per step, as kept in
+            GcodeStates.mm_per_step
+        """
+        self.mm_per_step = mm_per_step
+        self.paths = []
+        self.tool_index = None
+        self._points = None
+        self._last_point = None
+        self._extruders = None
+
+    def _add_point(self, position, extruding):
+        mm_per_step = self.mm_per_step
+        point = [
+            position[0] * mm_per_step[0],
+            position[1] * mm_per_step[1],
+            position[2] * mm_per_step[2],
+            extruding,
+        ]
+        if self._points is None:
+            self._points = []
+            self.paths.append((self.tool_index, self._points))
+        self._points.append(point)
+        self._last_point = point
+        self._extruders = (
+            position[3] * mm_per_step[3], position[4] * mm_per_step[4])
+
+    def queue_extended_point(self, position, dda_speed, e_distance, feedrate_mm_sec, relative_axes=[]):
+        extruders = self._extruders
+        extruding = extruders is not None and (
+            position[3] * self.mm_per_step[3] > extruders[0] or
+            position[4] * self.mm_per_step[4] > extruders[1])
+        self._add_point(position, extruding)
+
+    def set_extended_position(self, position):
+        self._points = None
+        self._add_point(position, False)
+
+    def change_tool(self, tool_index):
+        self.tool_index = tool_index
+        if self._last_point is not None:
+            self._points = [self._last_point[:3] + [False]]
+            self.paths.append((tool_index, self._points))
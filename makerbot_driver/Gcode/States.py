@@ -24,6 +24,35 @@ class GcodeStates(object):
         self.wait_for_ready_timeout = 600  # seconds
         self.percentage = 0
 
+    @property
+    def profile(self):
+        return self._profile
+
+    @profile.setter
+    def profile(self, profile):
+        self._profile = profile
+        self.update_axes_vectors()
+
+    def update_axes_vectors(self):
+        """
+        Caches the profile's per axis values that every move needs as tuples
+        ordered X, Y, Z, A, B:
+            steps_per_mm, max_feedrates and their reciprocals, mm_per_step
+            and min_per_mm (0 where the value is 0)
+        Called whenever a profile is assigned.  A profile whose axes are
+        edited in place needs this called again.
+        """
+        if self._profile is None:
+            self.steps_per_mm = self.max_feedrates = None
+            self.mm_per_step = self.min_per_mm = None
+            return
+        self.steps_per_mm = tuple(self.get_axes_values('steps_per_mm'))
+        self.max_feedrates = tuple(self.get_axes_values('max_feedrate'))
+        self.mm_per_step = tuple(
+            1.0 / value if value else 0 for value in self.steps_per_mm)
+        self.min_per_mm = tuple(
+            1.0 / value if value else 0 for value in self.max_feedrates)
+
     def lose_position(self, axes):
         """Given a set of axes, loses the position of
         those axes.
@@ -38,16 +67,17 @@ class GcodeStates(object):
         """Gets a usable position in steps to send to the machine
         @return list position: The current position of the machine in steps
         """
-        #Check each axis first, since we need to report a bad axis if needed
-        for axis in ['X', 'Y', 'Z', 'A', 'B']:
-            if getattr(self.position, axis) is None:
-                gcode_error = makerbot_driver.Gcode.UnspecifiedAxisLocationError()
-                gcode_error.values['UnspecifiedAxis'] = axis
-                raise gcode_error
+        self.check_position()
+        return self.position.ToList()
 
-        return_position = self.position.ToList()
-
-        return return_position
+    def check_position(self):
+        """Raises an UnspecifiedAxisLocationError naming the first axis
+        whose position is lost, if there is one.
+        """
+        if self.position.lost:
+            gcode_error = makerbot_driver.Gcode.UnspecifiedAxisLocationError()
+            gcode_error.values['UnspecifiedAxis'] = self.position.first_lost_axis()
+            raise gcode_error
 
     def set_build_name(self, build_name):
         if not isinstance(build_name, str):
@@ -1,10 +1,19 @@
 from __future__ import absolute_import
+import collections
 import exceptions
 import math
+import re
+import string
+import threading
 
 import makerbot_driver
 
 
+# Uppercase form of every ascii letter a code can start with.  Other
+# characters fall back to isalpha(), which is what decides a valid code.
+_CODE_LETTERS = dict((letter, letter.upper()) for letter in string.ascii_letters)
+
+
 def extract_comments(line):
     """
     Parse a line of gcode, stripping semicolon and parenthesis-separated comments from it.
@@ -13,13 +22,15 @@ def extract_comments(line):
     """
 
     # Anything after the first semicolon is a comment
-    semicolon_free_line, x, comment = line.partition(';')
+    command, x, comment = line.partition(';')
 
-    paren_count = 0
-    command, x, paren_comment = semicolon_free_line.partition('(')
-    unified_comment = '%s%s' % (paren_comment, comment)
+    # As is anything after the first open paren before it
+    paren = command.find('(')
+    if paren >= 0:
+        comment = command[paren + 1:] + comment
+        command = command[:paren]
 
-    return command, unified_comment
+    return command, comment
 
 
 def parse_command(command):
@@ -31,39 +42,46 @@ def parse_command(command):
     codes = {}
     flags = []
 
-    pairs = command.split()
-    for pair in pairs:
-        code = pair[0]
-
-        # If the code is not a letter, this is an error.
-        if not code.isalpha():
-            gcode_error = makerbot_driver.Gcode.InvalidCodeError()
-            gcode_error.values['InvalidCode'] = code
-            raise gcode_error
-
+    for pair in command.split():
         # Force the code to be uppercase.
-        code = code.upper()
+        code = _CODE_LETTERS.get(pair[0])
+        if code is None:
+            code = pair[0]
+            # If the code is not a letter, this is an error.
+            if not code.isalpha():
+                gcode_error = makerbot_driver.Gcode.InvalidCodeError()
+                gcode_error.values['InvalidCode'] = code
+                raise gcode_error
+            code = code.upper()
 
         # If the code already exists, this is an error.
-        if code in codes.keys():
+        if code in codes:
             gcode_error = makerbot_driver.Gcode.RepeatCodeError()
             gcode_error.values['RepeatedCode'] = code
             raise gcode_error
 
         # Don't allow both G and M codes in the same line
-        if (code == 'G' and 'M' in codes.keys()) or \
-           (code == 'M' and 'G' in codes.keys()):
-            raise makerbot_driver.Gcode.MultipleCommandCodeError()
-
+        if code == 'G':
+            if 'M' in codes:
+                raise makerbot_driver.Gcode.MultipleCommandCodeError()
+        elif code == 'M':
+            if 'G' in codes:
+                raise makerbot_driver.Gcode.MultipleCommandCodeError()
+
+        value = pair[1:]
         # If the code doesn't have a value, we consider it a flag, and set it to true.
-        if len(pair) == 1:
+        if not value:
             flags.append(code)
 
+        # int() never accepts a '.', so skip straight to float
+        elif '.' in value:
+            codes[code] = float(value)
+
         else:
             try:
-                codes[code] = int(pair[1:])
+                codes[code] = int(value)
             except exceptions.ValueError:
-                codes[code] = float(pair[1:])
+                codes[code] = float(value)
 
     return codes, flags
 
@@ -123,15 +141,86 @@ def variable_substitute(line, environment):
     @param dict environment: A set of variables and definitions that will
         be used to execute variable substitution.
     """
-    variableDelineator = '#'
-    for key in environment:
+    return compile_environment(environment).substitute(line)
+
+
+class CompiledEnvironment(object):
+    """
+    Substitutes the variables of an environment into lines of gcode.  The
+    variable names are compiled into a single regex, longest first so a
+    variable is never mistaken for the start of a longer one, and the
+    most recently substituted lines are cached, since the same start and
+    end sequences are substituted for every build.  The cache is locked,
+    as compile_environment shares one CompiledEnvironment between threads.
+    """
+
+    def __init__(self, environment, cache_size=1024):
+        """
+        @param dict environment: Variables and their definitions
+        @param int cache_size: Number of substituted lines to keep
+        """
         #Cast into strings to get rid of unicode
-        variable_key = str(variableDelineator + key)
-        variable_value = str(environment[key])
-        line = line.replace(variable_key, variable_value)
-    if '#' in line:
-        raise makerbot_driver.Gcode.UndefinedVariableError
-    return line
+        self._definitions = dict(
+            (str('#' + key), str(value)) for key, value in environment.items())
+        names = sorted(self._definitions, key=len, reverse=True)
+        if names:
+            self._variables = re.compile('|'.join(re.escape(name) for name in names))
+        else:
+            self._variables = None
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def substitute(self, line):
+        """
+        @param str line: Line to replace every variable in
+        @return str: The line with its variables replaced
+        """
+        cache = self._cache
+        with self._lock:
+            try:
+                # Taken out and put back so it's the most recently used
+                substituted = cache.pop(line)
+            except KeyError:
+                substituted = line
+                if self._variables is not None and '#' in line:
+                    definitions = self._definitions
+                    substituted = self._variables.sub(
+                        lambda match: definitions[match.group()], line)
+                if '#' in substituted:
+                    raise makerbot_driver.Gcode.UndefinedVariableError
+                if len(cache) >= self.cache_size:
+                    cache.popitem(last=False)
+            cache[line] = substituted
+        return substituted
+
+
+# Environments compiled by compile_environment, most recently used last
+_compiled_environments = collections.OrderedDict()
+_compiled_environments_lock = threading.Lock()
+_COMPILED_ENVIRONMENTS_SIZE = 16
+
+
+def compile_environment(environment):
+    """
+    Gets the CompiledEnvironment for an environment, reusing one compiled
+    earlier for the same variables and definitions, so its cache of
+    substituted lines carries over from one build to the next.
+
+    @param dict environment: Variables and their definitions
+    @return CompiledEnvironment
+    """
+    key = tuple(sorted(
+        (str(name), str(value)) for name, value in environment.items()))
+    with _compiled_environments_lock:
+        try:
+            compiled = _compiled_environments.pop(key)
+        except KeyError:
+            compiled = CompiledEnvironment(environment)
+            if len(_compiled_environments) >= _COMPILED_ENVIRONMENTS_SIZE:
+                _compiled_environments.popitem(last=False)
+        _compiled_environments[key] = compiled
+    return compiled
 
 
 def calculate_euclidean_distance(minuend, subtrahend):
@@ -231,12 +320,14 @@ def calculate_unit_vector(vector):
     return unitVector
 
 
-def get_safe_feedrate(displacement_vector, max_feedrates, target_feedrate):
+def get_safe_feedrate(displacement_vector, max_feedrates, target_feedrate, min_per_mm=None):
     """Given a displacement vector and target feedrate, calculates the fastest safe feedrate
 
     @param list displacement_vector: 5d Displacement vector to consider, in mm
     @param list max_feedrates: Maximum feedrates for each axis, in mm
     @param float target_feedrate: Target feedrate for the move, in mm/s
+    @param list min_per_mm: Optional reciprocals of max_feedrates, as kept in
+        GcodeStates.min_per_mm, used to check each axis without dividing
     @return float Achievable movement feedrate, in mm/s
     """
 
@@ -252,6 +343,20 @@ def get_safe_feedrate(displacement_vector, max_feedrates, target_feedrate):
 
     actual_feedrate = target_feedrate
 
+    if min_per_mm is not None:
+        # An axis is over its limit when target * |d| / magnitude > max,
+        # i.e. target * |d| * (1 / max) > magnitude
+        for axis_displacement, max_feedrate, reciprocal in zip(displacement_vector, max_feedrates, min_per_mm):
+            if reciprocal == 0:
+                # Axes without a max feedrate are checked the slow way
+                if max_feedrate < float(target_feedrate) / magnitude * abs(axis_displacement):
+                    actual_feedrate = float(
+                        max_feedrate) / abs(axis_displacement) * magnitude
+            elif target_feedrate * abs(axis_displacement) * reciprocal > magnitude:
+                actual_feedrate = float(
+                    max_feedrate) / abs(axis_displacement) * magnitude
+        return actual_feedrate
+
     # Iterate through each axis that has a displacement
     for axis_displacement, max_feedrate in zip(displacement_vector, max_feedrates):
 
@@ -283,7 +388,7 @@ def find_longest_axis(vector):
     return max_value_index
 
 
-def calculate_DDA_speed(initial_position, target_position, target_feedrate, max_feedrates, steps_per_mm):
+def calculate_DDA_speed(initial_position, target_position, target_feedrate, max_feedrates, steps_per_mm, min_per_mm=None, mm_per_step=None):
     """ Given an initial position, target position, and target feedrate, calculate an achievable
     travel speed.
 
@@ -292,6 +397,10 @@ def calculate_DDA_speed(initial_position, target_position, target_feedrate, max_
     @param target_feedrate: Requested feedrate, in mm/s (TODO: Is this correct)
     @param max_feedrates: 5D vector of maximum feedrates, in mm/s
     @param steps_per_mm: 5D vector of steps per milimeters conversion, in steps/mm
+    @param min_per_mm: Optional reciprocals of max_feedrates, as kept in
+        GcodeStates.min_per_mm
+    @param mm_per_step: Optional reciprocals of steps_per_mm, as kept in
+        GcodeStates.mm_per_step
     @return float ddaSpeed: The speed in us/step we move at
     """
 
@@ -306,7 +415,7 @@ def calculate_DDA_speed(initial_position, target_position, target_feedrate, max_
 
     # Now, correct the target speedrate to account for the maximum feedrate
     actual_feedrate = get_safe_feedrate(
-        displacement_vector, max_feedrates, target_feedrate)
+        displacement_vector, max_feedrates, target_feedrate, min_per_mm)
 
     # Find the magnitude of the longest displacement axis. this axis has the most steps to move
     displacement_vector_steps = multiply_vector(
@@ -315,6 +424,8 @@ def calculate_DDA_speed(initial_position, target_position, target_feedrate, max_
 
     fastest_feedrate = float(abs(displacement_vector[longest_axis])) / calculate_vector_magnitude(displacement_vector) * actual_feedrate
     # Now we know the feedrate of the fastest axis, in mm/min. Convert it to us/step.
+    if mm_per_step is not None and mm_per_step[longest_axis]:
+        return 60 * 1000000 * abs(mm_per_step[longest_axis]) / fastest_feedrate
     dda_speed = compute_DDA_speed(
         fastest_feedrate, abs(steps_per_mm[longest_axis]))
 
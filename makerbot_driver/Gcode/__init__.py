@@ -1,4 +1,4 @@
-__all__ = ['Parser', 'State', 'LegacyStates', 'Utils', 'Point', 'errors', 'FileComplete']
+__all__ = ['Parser', 'State', 'LegacyStates', 'Utils', 'Point', 'errors', 'FileComplete', 'Kinematics', 'Estimator', 'Sinks', 'Checkpoint']
 
 from Parser import *
 from States import *
@@ -7,3 +7,7 @@ from Utils import *
 from Point import *
 from errors import *
 from FileComplete import *
+from Kinematics import *
+from Estimator import *
+from Sinks import *
+from Checkpoint import *
@@ -144,33 +144,35 @@ class GcodeAssembler(object):
             end_recipe.update({'cool_platform': None})
         return start_recipe, end_recipe, variables
 
-    def assemble_start_sequence(self, recipe):
+    def assemble_start_sequence(self, recipe, variables=None):
         """
         Given a start recipe, assembles the correct sequence
 
         @param recipe: The recipe used to create the sequence
+        @param dict variables: Variables to substitute into the sequence, if any
         @return list gcodes: Sequence of gcodes derived from the recipe
         """
         order = self.start_order
         template_name = 'print_start_sequence'
         gcodes = self.assemble_sequence_from_recipe(
-            recipe, template_name, order)
+            recipe, template_name, order, variables)
         return gcodes
 
-    def assemble_end_sequence(self, recipe):
+    def assemble_end_sequence(self, recipe, variables=None):
         """
         Given an end recipe, assembles the correct sequence
 
         @param recipe: The recipe used to create the sequence
+        @param dict variables: Variables to substitute into the sequence, if any
         @return list gcodes: Sequence of gcodes derived from the recipe
         """
         order = self.end_order
         template_name = 'print_end_sequence'
         gcodes = self.assemble_sequence_from_recipe(
-            recipe, template_name, order)
+            recipe, template_name, order, variables)
         return gcodes
 
-    def assemble_sequence_from_recipe(self, recipe, template_name, order):
+    def assemble_sequence_from_recipe(self, recipe, template_name, order, variables=None):
         """
         Given a recipe, template_name and ordering creates the correct
         sequence.
@@ -178,6 +180,8 @@ class GcodeAssembler(object):
         @param recipe: The recipe used to create the sequence
         @param template_name: The name of the template we want to use (start/end)
         @param order: The correct ordering of routines
+        @param dict variables: Variables to substitute into the sequence, if any.
+            Substituted lines are cached for the next sequence with the same variables.
 
         @return list gcodes: Sequence of gcodes derived from the recipe.
         """
@@ -186,6 +190,9 @@ class GcodeAssembler(object):
         for routine in order:
             if recipe[routine] is not None:
                 gcodes.extend(template[routine][recipe[routine]])
+        if variables is not None:
+            environment = makerbot_driver.Gcode.compile_environment(variables)
+            gcodes = [environment.substitute(str(gcode)) for gcode in gcodes]
         return gcodes
 
     def get_recipes_and_variables(self, key):
@@ -15,6 +15,7 @@ class AbpProcessor(LineTransformProcessor):
             re.compile("[^;(]*[mM]106"): self._transform_m106,
             re.compile("[^;(]*[mM]107"): self._transform_m107,
         }
+        self.command_words = ['M106', 'M107']
 
     def _transform_m107(self, match):
         return ""
@@ -14,6 +14,7 @@ class AnchorProcessor(LineTransformProcessor):
         self.code_map = {
             re.compile('[^(;]*[gG]1 [XY]-?\d'): self._transform_anchor,
         }
+        self.command_words = ['G1']
         self.looking_for_first_move = True
         self.speed = 1000
         self.width_over_height = .8
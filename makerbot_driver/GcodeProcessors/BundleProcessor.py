@@ -21,38 +21,33 @@ class BundleProcessor(LineTransformProcessor):
         for processor in self.processors:
             if processor.is_bundleable:
                 self.code_map.update(processor.code_map)
+                for key in processor.code_map:
+                    self._code_map_command_words[key] = processor.command_words
 
     def process_gcode(self, gcodes, callback=None):
         self.collate_codemaps()
-        new_callback = None
-        progress_callback = None
-        if self.do_progress is False:
-            new_callback = callback
-        elif callback is not None:
-            self.callback = callback
-            new_callback = self.new_callback
-            progress_callback = self.progress_callback
-        output = self._super_process_gcode(gcodes, new_callback)
         if self.do_progress:
-            output = self.progress_processor.process_gcode(
-                output, progress_callback)
-        return output
+            # Progress goes in as each line is transformed, in one pass
+            return list(self.progress_processor.iter_process(
+                gcodes, self._transform_line, callback))
+        return self._super_process_gcode(gcodes, callback)
 
-    def set_external_stop(self, value=True):
-        super(BundleProcessor, self).set_external_stop(value)
-        with self._condition:
-            self.progress_processor.set_external_stop(value)
+    def iter_process(self, gcodes):
+        self.collate_codemaps()
+        if self.do_progress:
+            return self.progress_processor.iter_process(
+                gcodes, self._transform_line)
+        return super(BundleProcessor, self).iter_process(gcodes)
 
-    def new_callback(self, percent):
+    def _transform_line(self, code):
         """
-        Since we do two passes with percent, we only want the
-        first percent to go up to 50.
+        @param code gcode line
+        @return list of lines to output in its place
         """
-        self.callback(percent / 2)
+        self.test_for_external_stop()
+        return self._transform_code(code)
 
-    def progress_callback(self, percent):
-        """
-        Since we do two passes with percent, we want the
-        second percent to go up to 100
-        """
-        self.callback(50 + percent / 2)
+    def set_external_stop(self, value=True):
+        super(BundleProcessor, self).set_external_stop(value)
+        with self._condition:
+            self.progress_processor.set_external_stop(value)
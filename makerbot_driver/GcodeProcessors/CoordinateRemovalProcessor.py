@@ -27,6 +27,7 @@ class CoordinateRemovalProcessor(LineTransformProcessor):
             re.compile('[^(;]*[gG]21'): self._transform_g21,
             re.compile('[^(;]*[gG]90'): self._transform_g90,
         }
+        self.command_words = ['G10', 'G54', 'G55', 'G21', 'G90']
 
     def _transform_g10(self, match):
         """
@@ -1,5 +1,7 @@
 from __future__ import absolute_import
 
+import collections
+import mmap
 import re
 
 from . import Processor
@@ -14,7 +16,7 @@ class EmptyLayerProcessor(Processor):
         self.MG_nominal_comment = re.compile("^\(Slowing to 0\% of nominal speeds\)")
         self.move_gcode = re.compile("^G1 .*")
         self.SF_layer_end = re.compile("^\(</layer>\)")
-        self.empty_line = re.compile("^\\n")
+        self.empty_line = re.compile("^\\r?\\n")
 
 
     def process_gcode(self, gcode_in, outfile = None):
@@ -24,125 +26,124 @@ class EmptyLayerProcessor(Processor):
             return self.process_gcode_list(gcode_in)
 
 
-    def process_gcode_file(self, gcode_file_path, output_file_path,callback=None): 
-    #process gcode from a file, and output to a file     
-        self.code_index = 0
-        self.gcodes = self.index_file(gcode_file_path)
-
-        self.max_index = (len(self.gcodes)-1) 
-
-        self.gcode_fp = open(gcode_file_path, 'r')
-        self.output_fp = open(output_file_path, 'w')
-        print(str(self.output_fp))
-
-        while(self.code_index <= self.max_index):
-
-            self.gcode_fp.seek(self.gcodes[self.code_index])
-            current_code = self.gcode_fp.readline()
-            self.match = re.match(self.layer_start, current_code)
-            if self.match is not None:
-                print self.match.group()
-                if self.match.group(1) == '<layer>':
-                    self.is_empty, new_code_index = self._layer_test_if_empty(slicer='SF')
-                elif self.match.group(1) == 'Slice':
-                    self.is_empty, new_code_index = self._layer_test_if_empty(slicer='MG')
-                #layer_test_if_empty alters the seeked location so reseek current offset
-                self.gcode_fp.seek(self.gcodes[self.code_index])
-                if(self.is_empty ==  True):
-                    self.code_index = new_code_index
-                    continue #skip appending
-                elif((self.is_empty == -1) and (new_code_index == 'MG')):
-                #Hacky way to remove final empty slice for Miracle Grue 
-                    self.code_index += 7
-
-            if(self.code_index <= self.max_index):
-                self.gcode_fp.seek(self.gcodes[self.code_index])
-                current_code = self.gcode_fp.readline()
-                self.output_fp.write(current_code)
-                self.code_index += 1
-            else:
-                print ("CODE_INDEX GREATER THAN MAX_INDEX")
-                break
+    def process_gcode_file(self, gcode_file_path, output_file_path, callback=None):
+        """
+        Processes gcode from a file, and outputs it to a file, in one pass
+        through iter_process.  The input is read through an mmap where the
+        file can be mapped (i.e. it isn't empty or a pipe).  Both files are
+        binary, so lines keep the input's line endings.
+
+        @param gcode_file_path path of the gcode to process
+        @param output_file_path path to write the processed gcode to
+        @return True
+        """
+        with open(gcode_file_path, 'rb') as gcode_fp:
+            with open(output_file_path, 'wb') as output_fp:
+                output_fp.writelines(
+                    self.iter_process(self._iter_file_lines(gcode_fp)))
         return True
 
-
-    def process_gcode_list(self, gcodes, callback=None):
-    #This processes gcode in the form of a list of gcodes, and the processed gcode is returned
-        self.gcodes = gcodes  
-        self.max_index = (len(self.gcodes)-1)      
-        self.output = []
-        self.code_index = 0
-
-        while(self.code_index <= self.max_index):
-            self.match = re.match(self.layer_start, self.gcodes[self.code_index])
-            if self.match is not None:
-                if self.match.group(1) == '<layer>':
-                    self.is_empty, self.new_code_index = self._layer_test_if_empty(slicer='SF')
-                elif self.match.group(1) == 'Slice':
-                    self.is_empty, self.new_code_index = self._layer_test_if_empty(slicer='MG')
-                if(self.is_empty ==  True):
-                    self.code_index = self.new_code_index
-                    continue #skip appending
-                print(str(self.new_code_index))
-                if((self.is_empty == -1) and (self.new_code_index == 'MG')):
-                #Hacky way to remove final empty slice for Miracle Grue 
-                    self.code_index += 7
-
-            if(self.code_index <= self.max_index):
-                self.output.append(self.gcodes[self.code_index])
-                self.code_index += 1
+    @staticmethod
+    def _iter_file_lines(gcode_fp):
+        """
+        @param gcode_fp open gcode file
+        @return iterator over the lines of gcode_fp
+        """
+        try:
+            mapped = mmap.mmap(gcode_fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            for code in gcode_fp:
+                yield code
+            return
+        try:
+            for code in iter(mapped.readline, ''):
+                yield code
+        finally:
+            mapped.close()
+
+    def iter_process(self, gcodes):
+        """
+        Streaming version of process_gcode_list.  A layer's lines are held
+        back only until it has more moves than an empty layer can, so a
+        layer that is not empty is passed on as soon as that is known.  A
+        layer still open at the end of the gcode is checked as if it ended
+        there.
+
+        @param gcodes iterable of gcode lines
+        @return iterator over the lines without the empty layers
+        """
+        gcodes = iter(gcodes)
+        layer_start = self.layer_start.match
+        empty_line = self.empty_line.match
+        move_gcode = self.move_gcode.match
+        MG_nominal_comment = self.MG_nominal_comment.match
+        SF_layer_end = self.SF_layer_end.match
+        # Lines to look at again, after a layer turned out not to be empty
+        pending = collections.deque()
+        # Lines of the layer being checked, starting with its layer start
+        layer = None
+        while True:
+            if pending:
+                code = pending.popleft()
             else:
-                print ("CODE_INDEX GREATER THAN MAX_INDEX")
-                break
-        return self.output
-                
-      
-    def _layer_test_if_empty(self, slicer):
-        code_index = self.code_index+1
-        moves_in_layer = 0
-        comments_in_layer = 0
-
-        self.gcode_fp.seek(self.gcodes[code_index])
-        current_code = self.gcode_fp.readline()
-        while(code_index <= self.max_index):
-            #Checks for a specific comment or G1 commands
-            if(slicer == 'MG'):
-                if(re.match(self.empty_line, current_code)):
-                    break
-                if(re.match(self.move_gcode, current_code)):
-                    moves_in_layer += 1
-                if(re.match(self.MG_nominal_comment, current_code)):
-                    comments_in_layer += 1
-            elif(slicer == 'SF'):
-                if(re.match(self.SF_layer_end, current_code)):
-                    break
-                if(re.match(self.move_gcode, current_code)):
-                    moves_in_layer += 1
- 
-            code_index += 1
-            self.gcode_fp.seek(self.gcodes[code_index])
-            current_code = self.gcode_fp.readline()
-
-        if(slicer == 'MG'):
-            if((moves_in_layer <= 2) and (comments_in_layer >= 1)):
-                return (True, code_index)
+                code = next(gcodes, None)
+                if code is None:
+                    if layer is None:
+                        break
+                    # End of the gcode, check the layer so far
+                    empty = (slicer == 'MG' and moves <= 2 and comments >= 1) or \
+                        (slicer == 'SF' and moves <= 1)
+                    if not empty:
+                        yield layer[0]
+                        pending.extend(layer[1:])
+                    layer = None
+                    continue
+            # Only lock to check for a stop once one looks to be set
+            if self._external_stop:
+                self.test_for_external_stop()
+            if layer is None:
+                match = layer_start(code)
+                if match is None:
+                    yield code
+                else:
+                    layer = [code]
+                    slicer = 'SF' if match.group(1) == '<layer>' else 'MG'
+                    moves = 0
+                    comments = 0
+                continue
+            if slicer == 'MG':
+                if empty_line(code):
+                    if moves <= 2 and comments >= 1:
+                        # The empty line after the layer is kept
+                        pending.appendleft(code)
+                    else:
+                        yield layer[0]
+                        pending.extendleft(reversed(layer[1:] + [code]))
+                    layer = None
+                    continue
+                if move_gcode(code):
+                    moves += 1
+                if MG_nominal_comment(code):
+                    comments += 1
+                full = moves > 2
             else:
-                return (False, None)
-        elif(slicer == 'SF'):
-            if(moves_in_layer <= 1):
-                return (True, code_index+1) #avoids adding the </layer> tag
-            else:
-                return (False, None)
-
+                if SF_layer_end(code):
+                    if moves > 1:
+                        yield layer[0]
+                        pending.extendleft(reversed(layer[1:] + [code]))
+                    layer = None
+                    continue
+                if move_gcode(code):
+                    moves += 1
+                full = moves > 1
+            layer.append(code)
+            if full:
+                # Too many moves for an empty layer, look at it again
+                # from the line after its start
+                yield layer[0]
+                pending.extendleft(reversed(layer[1:]))
+                layer = None
 
-    def index_file(self, filename):
-
-        line_indexes = []
-        offset = 0
-        with open(filename, 'r') as f:
-            for line in f:
-                line_indexes.append(offset)    
-                offset += len(line)
-        return line_indexes
-
-        
+    def process_gcode_list(self, gcodes, callback=None):
+    #This processes gcode in the form of a list of gcodes, and the processed gcode is returned
+        return list(self.iter_process(gcodes))
@@ -8,6 +8,7 @@ import makerbot_driver
 class FanProcessor(Processor):
 
     def __init__(self):
+        super(FanProcessor, self).__init__()
         self.expected_raft_tag = "(<raftLayerEnd> </raftLayerEnd>)"
         self.raft_on = re.compile("\(\<setting\> raft Add_Raft,_Elevate_Nozzle,_Orbit: True \</setting\>\)")
         self.raft_end = re.compile("\(\<raftLayerEnd\> \<\/raftLayerEnd\>\)")
@@ -17,6 +18,9 @@ class FanProcessor(Processor):
         self.layer_count = 2 # Turn on fan at this layer AFTER The raft
         self.fan_on = "M126 T0 (Fan On)\n"
         self.fan_off = "M127 T0 (Fan Off)\n"
+        # Lines held back by iter_process after the place the fan goes on,
+        # in case the gcode has fan codes of its own
+        self.fan_code_lookahead = 10000
 
     def gather_stats(self, gcodes):
         """
@@ -76,3 +80,65 @@ class FanProcessor(Processor):
             gcodes.insert(layer_loc, self.fan_on)
             gcodes.append(self.fan_off)
         return gcodes 
+
+    def iter_process(self, gcodes):
+        """
+        Streaming version of process_gcode, which looks through all the
+        gcode for fan codes and the raft setting before adding anything.
+        Here only fan_code_lookahead lines after the place the fan goes on
+        are held back while looking for them, so the raft setting has to
+        come before that, as it does in skeinforge's settings.  Gcode with
+        fan codes further on gets the fan on, but no fan off at the end.
+
+        @param gcodes iterable of gcode lines
+        @return iterator over the lines with fan codes added
+        """
+        fan_codes_exist = False
+        fan_on_sent = False
+        raft = False
+        raft_ended = False
+        layers_seen = 0
+        # Lines after the place the fan goes on, held until it is sent
+        window = [] if self.layer_count == 0 else None
+        for code in gcodes:
+            self.test_for_external_stop()
+            if not fan_codes_exist and re.match(self.fan_codes, code):
+                fan_codes_exist = True
+            if window is not None:
+                window.append(code)
+                if not raft and re.match(self.raft_on, code):
+                    # The fan goes on after the raft instead
+                    raft = True
+                    layers_seen = 0
+                    for held in window:
+                        yield held
+                    window = None
+                elif fan_codes_exist or len(window) >= self.fan_code_lookahead:
+                    if not fan_codes_exist:
+                        yield self.fan_on
+                        fan_on_sent = True
+                    for held in window:
+                        yield held
+                    window = None
+                continue
+            yield code
+            if fan_codes_exist or fan_on_sent:
+                continue
+            if re.match(self.raft_on, code):
+                raft = True
+            elif raft and not raft_ended:
+                if re.match(self.raft_end, code):
+                    raft_ended = True
+                    if self.layer_count == 0:
+                        window = []
+            elif re.match(self.layer_end, code):
+                layers_seen += 1
+                if layers_seen >= self.layer_count:
+                    window = []
+        if not fan_codes_exist:
+            if not fan_on_sent:
+                # The fan goes on at the end if the layer was never reached
+                yield self.fan_on
+            for held in window or []:
+                yield held
+            yield self.fan_off
@@ -10,6 +10,106 @@ import makerbot_driver
 from . import Processor
 
 
+class _CodeMapMatcher(object):
+    """ Finds the first pattern in a code_map that matches a line.  The
+    patterns a line could match are joined into one regex, so the line is
+    scanned once rather than once per pattern.  Every pattern is a named
+    group in an alternation, in the order code_map gives them, so the
+    first one to match wins, as when they are tried one at a time.
+
+    Patterns with command words are only tried on lines that have one of
+    them before any comment, so most lines, i.e. moves and comments, skip
+    them without being scanned.
+    """
+
+    # G, M and T commands, i.e. 'M101'
+    _command_word = re.compile("[GMT]\d+")
+    # Patterns that can't be joined into one regex with others: ones that
+    # refer back to their own groups or set flags for the whole regex
+    _unjoinable_pattern = re.compile(r"\\[1-9]|\(\?P=|\(\?[iLmsux]+\)")
+
+    def __init__(self, code_map, command_words):
+        """
+        @param code_map map {compiled_regex:replace-funcion, }
+        @param command_words function giving the command words a line
+            needs for a code_map key to be tried on it, or None to try it
+            on every line
+        """
+        # (compiled_regex, replace-function) in code_map order
+        self.transforms = []
+        # Indexes of the patterns tried on every line
+        every_line = []
+        # Indexes of the patterns tried on lines with each command word
+        self.by_word = {}
+        for key in code_map:
+            index = len(self.transforms)
+            self.transforms.append((re.compile(key), code_map[key]))
+            words = command_words(key)
+            if words is None:
+                every_line.append(index)
+            else:
+                for word in words:
+                    self.by_word.setdefault(word.upper(), []).append(index)
+        self.every_line = tuple(every_line)
+        # Joined regex for each tuple of indexes tried so far
+        self._regexes = {}
+
+    def join(self, indexes):
+        """ Joins the patterns at indexes into one regex
+        @param indexes tuple of indexes in transforms, in order
+        @return the regex, or None if the patterns can't be joined
+        """
+        patterns = [self.transforms[index][0] for index in indexes]
+        flags = set(pattern.flags for pattern in patterns)
+        # Python's re only supports 100 groups in a regex
+        groups = sum(pattern.groups for pattern in patterns) + len(patterns)
+        if len(flags) != 1 or groups >= 100 or any(
+                self._unjoinable_pattern.search(pattern.pattern)
+                for pattern in patterns):
+            return None
+        try:
+            return re.compile('|'.join(
+                '(?P<_%i>%s)' % (index, pattern.pattern)
+                for index, pattern in zip(indexes, patterns)), flags.pop())
+        except re.error:
+            # i.e. two patterns with the same group names
+            return None
+
+    def match(self, code):
+        """ @param code: a single gcode line
+        @return (match, replace-function) of the first pattern to match
+            code, or None if none do
+        """
+        indexes = self.every_line
+        if self.by_word:
+            words = self._command_word.findall(
+                code.split('(', 1)[0].split(';', 1)[0].upper())
+            needed = [index for word in words
+                      for index in self.by_word.get(word, ())]
+            if needed:
+                indexes = tuple(sorted(set(indexes).union(needed)))
+        if not indexes:
+            return None
+        try:
+            regex = self._regexes[indexes]
+        except KeyError:
+            regex = self._regexes[indexes] = self.join(indexes)
+        if regex is None:
+            for index in indexes:
+                pattern, transform = self.transforms[index]
+                match = pattern.match(code)
+                if match is not None:
+                    return match, transform
+            return None
+        match = regex.match(code)
+        if match is None:
+            return None
+        # Match again with the pattern alone, so its groups are numbered
+        # as the replace-function expects
+        pattern, transform = self.transforms[int(match.lastgroup[1:])]
+        return pattern.match(code), transform
+
+
 class LineTransformProcessor(Processor):
     """ Base implementation of a system for doing line by line
     transformations of Gcode to convert it from a non-makerbot form into
@@ -17,9 +117,19 @@ class LineTransformProcessor(Processor):
     Gcode -> s3g engine, by doing Gcode -> Gcode transforms first
     """
 
+    # (code_map, command_words, _code_map_command_words, matcher) as last
+    # made by _compile_code_map
+    _compiled_code_map = None
+
     def __init__(self):
         super(LineTransformProcessor, self).__init__()
         self.code_map = {}  # map {compiled_regex:replace-funcion, }
+        # Command words (i.e. 'M101') a line must have before any comment
+        # for code_map to be tried on it; None to try it on every line.
+        # Only for patterns that can't match without one of them.
+        self.command_words = None
+        # Command words of single code_map keys, over command_words
+        self._code_map_command_words = {}
 
     def process_gcode(self, gcodes, callback=None):
         """ main line by line processing, inherited from Processor
@@ -44,6 +154,38 @@ class LineTransformProcessor(Processor):
                 callback(percent)
         return output
 
+    def iter_process(self, gcodes):
+        """ Streaming version of process_gcode: each line is transformed
+        as it is read
+        @param gcodes iterable of gcode lines
+        @return iterator over the transformed lines
+        """
+        for code in gcodes:
+            self.test_for_external_stop()
+            for tcode in self._transform_code(code):
+                yield tcode
+
+    def _compile_code_map(self):
+        """ Makes the _CodeMapMatcher for code_map, kept until code_map or
+        the command words change
+        @return _CodeMapMatcher
+        """
+        compiled = self._compiled_code_map
+        if compiled is not None and compiled[0] == self.code_map and \
+                compiled[1] == self.command_words and \
+                compiled[2] == self._code_map_command_words:
+            return compiled[3]
+        matcher = _CodeMapMatcher(
+            self.code_map,
+            lambda key: self._code_map_command_words.get(key, self.command_words))
+        command_words = self.command_words
+        if command_words is not None:
+            command_words = command_words[:]
+        self._compiled_code_map = (
+            dict(self.code_map), command_words,
+            dict(self._code_map_command_words), matcher)
+        return matcher
+
     def _transform_code(self, code):
         """ takes a single gcode, runs all transforms in code_map
         to convert it to a different style gcode. May return more (or
@@ -51,11 +193,10 @@ class LineTransformProcessor(Processor):
         @param code: a single gcode line
         @return a list of output tcodes. """
         tcode = code
-        for key in self.code_map:
-            match = re.match(key, code)
-            if match is not None:
-                tcode = self.code_map[key](match)
-                break
+        found = self._compile_code_map().match(code)
+        if found is not None:
+            match, transform = found
+            tcode = transform(match)
         #Always return a list, remove '' strings
         tcode = [tcode] if not isinstance(tcode, list) else tcode
         tcode = [code for code in tcode if code is not ""]
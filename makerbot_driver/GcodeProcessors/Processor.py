@@ -10,6 +10,10 @@ import makerbot_driver
 
 class Processor(object):
     """ Base class for all Gcode Processors."""
+
+    # A gcode variable, as removed by remove_variables
+    _variable_regex = re.compile("#[^ ^\n^\r]*")
+
     def __init__(self):
         self._external_stop = False
         # ^ set this to true from another thread to stop a processor
@@ -27,6 +31,16 @@ class Processor(object):
         self.test_for_external_stop()
         raise NotImplementedError("Unmplemented abstract method")
 
+    def iter_process(self, gcodes):
+        """ Process gcode lazily, yielding output lines as they are made.
+        Processors that can work a line at a time override this to
+        stream; by default the input is gathered and run through
+        process_gcode.
+        @param gcodes iterable of gcode lines
+        @return iterator over the processed lines
+        """
+        return iter(self.process_gcode(list(gcodes)))
+
     @classmethod
     def remove_variables(cls, gcode, newvalue='0'):
         """
@@ -36,12 +50,7 @@ class Processor(object):
         @param newvalue: replacement value, '0' if undefined
         @return a new gcode, with all variable replaced with newvalue
         """
-        variable_regex = "#[^ ^\n^\r]*"
-        m = re.search(variable_regex, gcode)
-        while m is not None:
-            gcode = gcode.replace(m.group(), newvalue)
-            m = re.search(variable_regex, gcode)
-        return gcode
+        return cls._variable_regex.sub(lambda match: newvalue, gcode)
 
     def set_external_stop(self, value=True):
         """ Set 'external stop' flag. If external stop is true,
@@ -0,0 +1,45 @@
+"""
+Runs gcode through several processors, one line at a time
+"""
+from __future__ import absolute_import
+
+from .Processor import Processor
+
+
+class ProcessorChain(Processor):
+    """ A processor made of other processors, each run on the output of
+    the one before.  iter_process joins their iter_process generators, so
+    lines flow through the whole chain as they are read instead of each
+    processor making a new copy of the gcode.
+    """
+
+    def __init__(self, processors=None):
+        """
+        @param processors list of Processor objects, run in order
+        """
+        super(ProcessorChain, self).__init__()
+        self.processors = list(processors) if processors is not None else []
+
+    def append(self, processor):
+        """ Add a processor to run after the others
+        @param processor Processor object
+        """
+        self.processors.append(processor)
+
+    def iter_process(self, gcodes):
+        """ Process gcode lazily through every processor in the chain
+        @param gcodes iterable of gcode lines
+        @return iterator over the processed lines
+        """
+        for processor in self.processors:
+            gcodes = processor.iter_process(gcodes)
+        return gcodes
+
+    def process_gcode(self, gcodes, callback=None):
+        self.test_for_external_stop()
+        return list(self.iter_process(gcodes))
+
+    def set_external_stop(self, value=True):
+        super(ProcessorChain, self).set_external_stop(value)
+        for processor in self.processors:
+            processor.set_external_stop(value)
@@ -3,6 +3,8 @@ Inserts progress commands in skeinforge gcode
 """
 from __future__ import absolute_import
 
+import os
+
 from .Processor import *
 
 
@@ -36,6 +38,80 @@ class ProgressProcessor(Processor):
                     callback(current_percent)
         return output
 
+    def iter_process(self, gcodes, transform=None, callback=None):
+        """ Streaming version of process_gcode.  Progress is worked out
+        from how far through the input each line is: by byte offset for a
+        seekable file, or by line count for input that knows its length
+        (i.e. a list), so neither is read ahead.  Anything else is
+        gathered first to count it.
+        @param gcodes iterable of gcode lines
+        @param transform function giving the list of lines to output in
+            place of each line, so other transforms (i.e. BundleProcessor's)
+            run in the same pass
+        @param callback for progress, expects 0-100 as percent 'done'
+        @return iterator over the lines with progress commands added
+        """
+        count_total = self._remaining_bytes(gcodes)
+        by_bytes = count_total is not None
+        if not by_bytes:
+            if not hasattr(gcodes, '__len__'):
+                gcodes = list(gcodes)
+            count_total = len(gcodes)
+        count_current = 0
+        current_percent = 0
+        # Count at which the percent next goes up
+        next_count = self._count_for_percent(1, count_total)
+        # Progress goes in before each line output after the first, so
+        # lines transformed away don't get progress commands of their own
+        started = False
+        for code in gcodes:
+            tcodes = [code] if transform is None else transform(code)
+            if tcodes:
+                if started and count_current >= next_count:
+                    current_percent = min(
+                        int(100.0 * count_current / count_total), 100)
+                    next_count = self._count_for_percent(
+                        current_percent + 1, count_total)
+                    self.test_for_external_stop()
+                    yield self.create_progress_msg(current_percent)
+                    if callback is not None:
+                        callback(current_percent)
+                started = True
+                for tcode in tcodes:
+                    yield tcode
+            count_current += len(code) if by_bytes else 1
+        if started and current_percent < 100:
+            self.test_for_external_stop()
+            yield self.create_progress_msg(100)
+            if callback is not None:
+                callback(100)
+
+    @staticmethod
+    def _count_for_percent(percent, count_total):
+        """ @param percent percent 'done'
+        @param count_total number of lines (or bytes) in all
+        @return least number of lines (or bytes) done that makes percent
+        """
+        count = percent * count_total // 100
+        while count < count_total and int(100.0 * count / count_total) < percent:
+            count += 1
+        return count
+
+    @staticmethod
+    def _remaining_bytes(gcodes):
+        """ @param gcodes iterable of gcode lines
+        @return number of bytes left to read if gcodes is a seekable
+            file, otherwise None
+        """
+        try:
+            start = gcodes.tell()
+            gcodes.seek(0, os.SEEK_END)
+            end = gcodes.tell()
+            gcodes.seek(start)
+        except (AttributeError, IOError, ValueError):
+            return None
+        return end - start
+
 
 def main():
     ProgressProcessor().process_gcode(sys.argv[1], sys.argv[2])
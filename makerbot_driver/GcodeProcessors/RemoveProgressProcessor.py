@@ -16,6 +16,7 @@ class RemoveProgressProcessor(LineTransformProcessor):
             re.compile("[^;(]*[mM]136"): self._transform_m136,
             re.compile("[^;(]*[mM]137"): self._transform_m137,
         }
+        self.command_words = ['M73', 'M136', 'M137']
 
     def _transform_m73(self, match):
         return ""
@@ -36,6 +36,29 @@ class RemoveRepGStartEndGcode(Processor):
                     callback(percent)
         return output
 
+    def iter_process(self, gcodes):
+        """ Streaming version of process_gcode: lines outside the start
+        and end gcode are yielded as they are read
+        @param gcodes iterable of gcode lines
+        @return iterator over the remaining lines
+        """
+        startgcode = False
+        endgcode = False
+        for code in gcodes:
+            if startgcode:
+                if(self.get_comment_match(code, 'end of start.gcode')):
+                    startgcode = False
+            elif endgcode:
+                if(self.get_comment_match(code, 'end End.gcode')):
+                    endgcode = False
+            elif (self.get_comment_match(code, '**** start.gcode')):
+                startgcode = True
+            elif (self.get_comment_match(code, '**** End.gcode')):
+                endgcode = True
+            else:
+                self.test_for_external_stop()
+                yield code
+
     def get_comment_match(self, gcode, match):
         (codes, flags, comments) = makerbot_driver.Gcode.parse_line(gcode)
         axis = None
@@ -20,6 +20,9 @@ class Rep2XDualstrusionProcessor(Processor):
         self.SF_layer_end = re.compile("^\(</layer>\)")
         self.retract_distance_mm = None
         self.return_distance_mm = None
+        self.squirt_redux = None
+        # Lines iter_process keeps to search back through for snorts
+        self.snort_lookbehind = 10000
 
     def process_gcode(self, gcode_in, outfile = None, profile = None):
         self.retract_distance_mm = makerbot_driver.profile.Profile(profile).values[
@@ -39,6 +42,184 @@ class Rep2XDualstrusionProcessor(Processor):
             else:
                 return False
 
+    def iter_process(self, gcodes):
+        """
+        Streaming version of process_gcode_file.  The distances come from
+        the profile the processor was created with, if any, otherwise the
+        ones already set; with no distances ('NULL') the gcode is passed
+        on unchanged.  Between snort_lookbehind and twice that many lines
+        are held back to search for snorts in, so a snort further back
+        than snort_lookbehind lines before its toolchange may be missed.
+        Changed moves replace the part of the line they matched, so unlike
+        writing over the file a longer move can't run into the next line.
+
+        @param gcodes iterable of gcode lines
+        @return iterator over the lines with snorts and squirts changed
+        """
+        profile = getattr(self, 'profile', None)
+        if profile is not None:
+            if isinstance(profile, basestring):
+                profile = makerbot_driver.profile.Profile(profile)
+            self.retract_distance_mm = profile.values[
+                "dualstrusion_retract_distance_mm"]
+            self.squirt_redux = profile.values["dualstrusion_squirt_reduce_mm"]
+        if self.retract_distance_mm in (None, 'NULL'):
+            for code in gcodes:
+                yield code
+            return
+
+        self.last_tool = -1
+        self.last_extruder_pos = -1
+        self.slicer = None
+        # Lines not yet passed on
+        window = []
+        # The slicer each unfinished squirt search started with
+        squirt_searches = []
+        for code in gcodes:
+            self.test_for_external_stop()
+            window.append(code)
+            squirt_searches = [
+                slicer for slicer in squirt_searches
+                if not self._stream_squirt_search(window, slicer)]
+            self.match = re.match(self.toolchange, code)
+            if self.match is not None:
+                if self.last_tool == -1:
+                    self.last_tool = self.match.group(1)
+                elif self.last_tool != self.match.group(1):
+                    # If this is a significant tool change
+                    self.last_tool = self.match.group(1)
+                    # Squirts come after the toolchange, so look at the
+                    # lines to come
+                    squirt_searches.append(self.slicer)
+                    self._stream_snort_search(window)
+            if len(window) >= 2 * self.snort_lookbehind:
+                for held in window[:self.snort_lookbehind]:
+                    yield held
+                del window[:self.snort_lookbehind]
+        for held in window:
+            yield held
+
+    def _stream_squirt_search(self, window, slicer):
+        """
+        Checks the last line in window for the squirt after a toolchange,
+        as squirt_search does, and changes it if it is the squirt
+
+        @param list window: Lines after the toolchange
+        @param str slicer: Slicer known when the search started
+        @return bool: True if the search is over
+        """
+        current_code = window[-1]
+        squirt_match = re.match(self.MG_squirt, current_code)
+        if squirt_match is not None:
+            self.slicer = 'MG'
+            feedrate = float(squirt_match.group(1))
+            extruder = squirt_match.group(2)
+            position = float(squirt_match.group(3))
+            index = len(window) - 1
+        else:
+            squirt_match = re.match(self.SF_snortsquirt, current_code)
+            if squirt_match is None:
+                if slicer == 'MG':
+                    return re.match(self.layer_start, current_code) is not None
+                elif slicer == 'SF':
+                    layer_end = re.match(self.SF_layer_end, current_code)
+                    return layer_end is not None
+                return False
+            self.slicer = 'SF'
+            position = float(squirt_match.group(1))
+            feedrate = float(window[-2].split('F')[1])
+            extruder = None
+            index = len(window) - 2
+        squirt_position = position - self.squirt_redux
+        if squirt_position <= 0:
+            squirt_position = 0
+        if self.slicer == 'MG':
+            new_move_line = "G1 F%.3f %s%.3f (squirt)" % (
+                feedrate / 2, extruder, squirt_position)
+            self._replace_move(
+                window, index, new_move_line, len(squirt_match.group()))
+        else:
+            self._replace_SF_snortsquirt(
+                window, index, feedrate / 2, squirt_position,
+                len(squirt_match.group()))
+        return True
+
+    def _stream_snort_search(self, window):
+        """
+        Searches back from the toolchange that is the last line in window
+        for the last snort, as reverse_snort_search does, and changes it
+
+        @param list window: Lines up to and including the toolchange
+        """
+        snort_index = len(window) - 3
+        while snort_index >= 0:
+            current_code = window[snort_index]
+            snort_match = re.match(self.MG_snort, current_code)
+            if snort_match is not None:
+                self.slicer = 'MG'
+                feedrate = float(snort_match.group(1))
+                extruder = snort_match.group(2)
+                position = float(snort_match.group(3))
+                break
+            snort_match = re.match(self.SF_snortsquirt, current_code)
+            if snort_match is not None and snort_index > 0:
+                self.slicer = 'SF'
+                # This is based on the assumption that the feedrate for
+                # the snort is set the line before
+                feedrate = float(window[snort_index - 1].split('F')[1])
+                position = float(snort_match.group(1))
+                extruder = None
+                break
+            if re.match(self.layer_start, current_code):
+                return
+            snort_index -= 1
+        else:
+            return
+        snort_extruder_pos = position - self.retract_distance_mm
+        if snort_extruder_pos <= 0:
+            snort_extruder_pos = 0
+        self.last_extruder_pos = snort_extruder_pos
+        if self.slicer == 'MG':
+            new_move_line = "G1 F%.3f %s%.3f (snort)" % (
+                feedrate / 2, extruder, snort_extruder_pos)
+            self._replace_move(
+                window, snort_index, new_move_line, len(snort_match.group()))
+        else:
+            self._replace_SF_snortsquirt(
+                window, snort_index - 1, feedrate / 2, snort_extruder_pos,
+                len(snort_match.group()))
+
+    def _replace_SF_snortsquirt(self, window, index, feedrate, position,
+                                length):
+        """
+        Replaces a skeinforge snort or squirt: a feedrate line, then the
+        extruder move.  The new lines are padded to the length of the old
+        ones, as format_snort pads them.
+
+        @param list window: Lines the snort or squirt is in
+        @param int index: Index of the feedrate line
+        @param float feedrate: New feedrate
+        @param float position: New extruder position
+        @param int length: Length of the extruder move in its line
+        """
+        feedrate_line = "G1 F%.1f\n" % feedrate
+        padded_len = len(window[index]) + length - len(feedrate_line)
+        move_line = ("G1 E%.2f" % position).ljust(padded_len)
+        window[index + 1] = move_line + window[index + 1][length:]
+        window[index] = feedrate_line
+
+    @staticmethod
+    def _replace_move(window, index, new_move_line, length):
+        """
+        Replaces the first length characters of a line, padding the new
+        move to that length; the rest of the line is kept
+
+        @param list window: Lines the move is in
+        @param int index: Index of the line
+        @param str new_move_line: Move to put in, without its newline
+        @param int length: Number of characters it replaces
+        """
+        window[index] = new_move_line.ljust(length) + window[index][length:]
 
     def process_gcode_list(self, gcodes, callback=None):
 #TODO Update this to use the new functions
@@ -28,6 +28,7 @@ class RpmProcessor(LineTransformProcessor):
             re.compile('[^(;]*[mM]103'): self._transform_m103,
             re.compile('[^(;]*[mM]108'): self._transform_m108,
         }
+        self.command_words = ['M101', 'M102', 'M103', 'M108']
 
     def _transform_m101(self, match):
         """
@@ -13,6 +13,7 @@ class SetTemperatureProcessor(LineTransformProcessor):
         self.code_map = {
             re.compile("[^(;]*[mM]104"): self._transform_m104,
         }
+        self.command_words = ['M104']
 
     def _transform_m104(self, match):
         return ""
@@ -26,6 +27,7 @@ class GetTemperatureProcessor(LineTransformProcessor):
         self.code_map = {
             re.compile("[^(;]*[mM]105"): self._transform_m105,
         }
+        self.command_words = ['M105']
 
     def _transform_m105(self, match):
         return ""
@@ -0,0 +1,719 @@
+"""
+A simulated s3g machine, for testing and benchmarking the driver without
+hardware.  The simulator speaks the s3g protocol over a pseudo-terminal or
+a socketpair, keeps its own command buffer, position, heaters, EEPROM and
+SD card, and can be told to misbehave with latency, noise and bad CRCs.
+
+Usage:
+    sim = makerbot_driver.Simulator(buffer_size=512)
+    port = sim.open_pty()
+    sim.start()
+    r = makerbot_driver.s3g.from_filename(port, threading.Condition())
+    ...
+    sim.stop()
+"""
+
+from __future__ import absolute_import
+
+import collections
+import errno
+import json
+import logging
+import os
+import random
+import select
+import socket
+import struct
+import threading
+import time
+
+import makerbot_driver
+
+
+class SimulatedTool(object):
+    """ A toolhead with an extruder heater, a platform heater and an EEPROM """
+
+    def __init__(self, ambient_temperature=25.0):
+        """
+        @param float ambient_temperature: Temperature unpowered heaters settle at
+        """
+        self.ambient_temperature = ambient_temperature
+        self.toolhead_temperature = ambient_temperature
+        self.toolhead_target = 0
+        self.platform_temperature = ambient_temperature
+        self.platform_target = 0
+        self.motor_rpm = 0
+        self.motor_enabled = False
+        self.fan_enabled = False
+        self.eeprom = bytearray(
+            '\xff' * makerbot_driver.EEPROM.constants.total_eeprom_size)
+
+    def update(self, seconds, heating_rate, cooling_rate):
+        """
+        Move both heaters towards their targets
+        @param float seconds: Simulated time that has passed
+        @param float heating_rate: Degrees per second a heater warms up at
+        @param float cooling_rate: Degrees per second a heater cools down at
+        """
+        self.toolhead_temperature = self._approach(
+            self.toolhead_temperature, self.toolhead_target,
+            seconds, heating_rate, cooling_rate)
+        self.platform_temperature = self._approach(
+            self.platform_temperature, self.platform_target,
+            seconds, heating_rate, cooling_rate)
+
+    def is_toolhead_ready(self, tolerance):
+        return abs(self.toolhead_temperature - self.toolhead_target) <= tolerance
+
+    def is_platform_ready(self, tolerance):
+        return abs(self.platform_temperature - self.platform_target) <= tolerance
+
+    def _approach(self, current, target, seconds, heating_rate, cooling_rate):
+        if target == 0:
+            target = self.ambient_temperature
+        if current < target:
+            return min(target, current + heating_rate * seconds)
+        return max(target, current - cooling_rate * seconds)
+
+
+class _EepromAdapter(object):
+    """ Lets an EepromWriter write straight into a simulated EEPROM """
+
+    def __init__(self, eeprom):
+        self.eeprom = eeprom
+
+    def write_to_EEPROM(self, offset, data):
+        self.eeprom[offset:offset + len(data)] = data
+
+
+class Simulator(object):
+    """
+    A virtual s3g machine.  Query commands are answered straight away.
+    Action commands are accounted against a command buffer of buffer_size
+    bytes, answered with ACTION_BUFFER_OVERFLOW when it is full, and then
+    executed in order against a simulated clock: moves take as long as
+    their feedrate says, waits block until the heaters are ready.  The
+    clock runs speedup times faster than real time.
+    """
+
+    def __init__(self, buffer_size=512, tool_count=2, firmware_version=600,
+                 software_variant=0, speedup=1.0, ambient_temperature=25.0,
+                 heating_rate=5.0, cooling_rate=2.0, ready_tolerance=2,
+                 eeprom_values=None, latency=0, noise_rate=0, noise_length=4,
+                 crc_error_rate=0, seed=None):
+        """
+        @param int buffer_size: Size of the command buffer, in bytes
+        @param int tool_count: Number of toolheads
+        @param int firmware_version: Version to report, i.e. 600 for 6.0
+        @param int software_variant: Software variant to report
+        @param float speedup: Simulated seconds per real second
+        @param float ambient_temperature: Temperature of unpowered heaters
+        @param float heating_rate: Degrees per simulated second heaters warm up at
+        @param float cooling_rate: Degrees per simulated second heaters cool at
+        @param int ready_tolerance: Degrees from target a heater counts as ready
+        @param eeprom_values: Map with values to load into the EEPROM, in the
+          form EepromReader.read_entire_map returns, or the path of a json file
+          holding one
+        @param float latency: Seconds to wait before sending each response
+        @param float noise_rate: Chance of sending noise before a response
+        @param int noise_length: Number of noise bytes to send each time
+        @param float crc_error_rate: Chance of corrupting a response's crc
+        @param seed: Seed for the random fault injection
+        """
+        self.buffer_size = buffer_size
+        self.firmware_version = firmware_version
+        self.software_variant = software_variant
+        self.speedup = speedup
+        self.heating_rate = heating_rate
+        self.cooling_rate = cooling_rate
+        self.ready_tolerance = ready_tolerance
+        self.latency = latency
+        self.noise_rate = noise_rate
+        self.noise_length = noise_length
+        self.crc_error_rate = crc_error_rate
+        self.random = random.Random(seed)
+        self._log = logging.getLogger(self.__class__.__name__)
+
+        self.tools = [SimulatedTool(ambient_temperature)
+                      for i in range(tool_count)]
+        self.eeprom = bytearray(
+            '\xff' * makerbot_driver.EEPROM.constants.total_eeprom_size)
+        if eeprom_values is not None:
+            self.load_eeprom_values(eeprom_values)
+
+        self.sim_time = 0.0
+        self.position = [0, 0, 0, 0, 0]
+        self.enabled_axes = 0
+        self.current_tool = 0
+        self.build_name = ''
+        self.build_state = 0
+        self.build_start_time = 0.0
+        self.build_percent = 0
+        self.line_number = 0
+        self.sd_card = {}
+        self.executed = []
+
+        self.packets_received = 0
+        self.packets_sent = 0
+        self.total_overflows = 0
+        self.injected_noise_bytes = 0
+        self.injected_crc_errors = 0
+
+        self._queue = collections.deque()
+        self._buffer_used = 0
+        self._busy_until = 0.0
+        self._wait_start = None
+        self._capture_name = None
+        self._capture = None
+        self._sd_index = 0
+        self._last_update = None
+        self._decoder = makerbot_driver.Encoder.PacketStreamDecoder()
+        self.fd = None
+        self.port = None
+        self._slave_fd = None
+        self._socket = None
+        self._thread = None
+        self._stopped = False
+
+        q = makerbot_driver.host_query_command_dict
+        self.QUERY_HANDLERS = {
+            q['GET_VERSION']: self._get_version,
+            q['INIT']: self._init,
+            q['GET_AVAILABLE_BUFFER_SIZE']: self._get_available_buffer_size,
+            q['CLEAR_BUFFER']: self._clear_buffer,
+            q['ABORT_IMMEDIATELY']: self._abort_immediately,
+            q['PAUSE']: self._success,
+            q['TOOL_QUERY']: self._tool_query,
+            q['IS_FINISHED']: self._is_finished,
+            q['READ_FROM_EEPROM']: self._read_from_eeprom,
+            q['WRITE_TO_EEPROM']: self._write_to_eeprom,
+            q['CAPTURE_TO_FILE']: self._capture_to_file,
+            q['END_CAPTURE']: self._end_capture,
+            q['PLAYBACK_CAPTURE']: self._playback_capture,
+            q['RESET']: self._init,
+            q['GET_NEXT_FILENAME']: self._get_next_filename,
+            q['GET_BUILD_NAME']: self._get_build_name,
+            q['GET_EXTENDED_POSITION']: self._get_extended_position,
+            q['EXTENDED_STOP']: self._extended_stop,
+            q['GET_MOTHERBOARD_STATUS']: self._get_motherboard_status,
+            q['GET_BUILD_STATS']: self._get_build_stats,
+            q['GET_COMMUNICATION_STATS']: self._get_communication_stats,
+            q['GET_ADVANCED_VERSION']: self._get_advanced_version,
+        }
+
+        t = makerbot_driver.slave_query_command_dict
+        self.TOOL_QUERY_HANDLERS = {
+            t['GET_VERSION']: self._tool_get_version,
+            t['GET_TOOLHEAD_TEMP']: lambda tool, data: self._pack(
+                '<BH', int(round(tool.toolhead_temperature))),
+            t['GET_MOTOR_1_SPEED_RPM']: lambda tool, data: self._pack(
+                '<BI', tool.motor_rpm),
+            t['IS_TOOL_READY']: lambda tool, data: self._pack(
+                '<BB', tool.is_toolhead_ready(self.ready_tolerance)),
+            t['READ_FROM_EEPROM']: self._tool_read_from_eeprom,
+            t['WRITE_TO_EEPROM']: self._tool_write_to_eeprom,
+            t['GET_PLATFORM_TEMP']: lambda tool, data: self._pack(
+                '<BH', int(round(tool.platform_temperature))),
+            t['GET_TOOLHEAD_TARGET_TEMP']: lambda tool, data: self._pack(
+                '<BH', tool.toolhead_target),
+            t['GET_PLATFORM_TARGET_TEMP']: lambda tool, data: self._pack(
+                '<BH', tool.platform_target),
+            t['IS_PLATFORM_READY']: lambda tool, data: self._pack(
+                '<BB', tool.is_platform_ready(self.ready_tolerance)),
+            t['GET_TOOL_STATUS']: lambda tool, data: self._pack(
+                '<BB', tool.is_toolhead_ready(self.ready_tolerance)),
+            t['GET_PID_STATE']: self._tool_get_pid_state,
+        }
+
+        a = makerbot_driver.host_action_command_dict
+        self.ACTION_HANDLERS = {
+            a['DELAY']: self._delay,
+            a['CHANGE_TOOL']: self._change_tool,
+            a['WAIT_FOR_TOOL_READY']: self._wait_for_tool_ready,
+            a['TOOL_ACTION_COMMAND']: self._tool_action_command,
+            a['ENABLE_AXES']: self._enable_axes,
+            a['QUEUE_EXTENDED_POINT']: self._queue_extended_point,
+            a['SET_EXTENDED_POSITION']: self._set_extended_position,
+            a['WAIT_FOR_PLATFORM_READY']: self._wait_for_platform_ready,
+            a['QUEUE_EXTENDED_POINT_NEW']: self._queue_extended_point_new,
+            a['SET_BUILD_PERCENT']: self._set_build_percent,
+            a['BUILD_START_NOTIFICATION']: self._build_start_notification,
+            a['BUILD_END_NOTIFICATION']: self._build_end_notification,
+            a['QUEUE_EXTENDED_POINT_ACCELERATED']: self._queue_extended_point_accelerated,
+        }
+
+        s = makerbot_driver.slave_action_command_dict
+        self.TOOL_ACTION_HANDLERS = {
+            s['SET_TOOLHEAD_TARGET_TEMP']: self._set_toolhead_target,
+            s['SET_PLATFORM_TEMP']: self._set_platform_target,
+            s['SET_MOTOR_1_SPEED_RPM']: self._set_motor_speed,
+            s['TOGGLE_MOTOR_1']: self._toggle_motor,
+            s['TOGGLE_FAN']: self._toggle_fan,
+            s['ABORT']: self._tool_abort,
+        }
+
+    def load_eeprom_values(self, eeprom_values):
+        """
+        Write values into the EEPROM using the map for this firmware version
+        @param eeprom_values: Map with values, or the path of a json file holding one
+        """
+        if not isinstance(eeprom_values, dict):
+            with open(eeprom_values) as f:
+                eeprom_values = json.load(f)
+        writer = makerbot_driver.EEPROM.EepromWriter.factory(
+            _EepromAdapter(self.eeprom),
+            '%i.%i' % divmod(self.firmware_version, 100),
+            '0x%02x' % self.software_variant)
+        writer.write_entire_map(eeprom_values)
+
+    def get_available_buffer_size(self):
+        return self.buffer_size - self._buffer_used
+
+    def is_finished(self):
+        return len(self._queue) == 0 and self._busy_until <= self.sim_time
+
+    def update(self, now=None):
+        """
+        Advance the simulated clock, warming the heaters and executing
+        whatever queued commands are due.
+        @param float now: Real time to advance to; defaults to the current time
+        """
+        if now is None:
+            now = time.time()
+        if self._last_update is None:
+            self._last_update = now
+        seconds = max(0, now - self._last_update) * self.speedup
+        self._last_update = now
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        """
+        Advance the simulated clock by a number of simulated seconds
+        @param float seconds: Time to advance by
+        """
+        self.sim_time += seconds
+        for tool in self.tools:
+            tool.update(seconds, self.heating_rate, self.cooling_rate)
+        while len(self._queue) > 0 and self._busy_until <= self.sim_time:
+            payload, counted = self._queue[0]
+            duration = self._execute(payload)
+            if duration is None:
+                break
+            self._queue.popleft()
+            if counted:
+                self._buffer_used -= len(payload)
+            self._busy_until += duration
+
+    def handle_payload(self, payload):
+        """
+        Act on a single packet payload from the host
+        @param bytearray payload: Payload received
+        @return bytearray: Response payload
+        """
+        self.packets_received += 1
+        command = payload[0]
+        if command in self.QUERY_HANDLERS:
+            return self.QUERY_HANDLERS[command](payload)
+        elif command in makerbot_driver.host_action_command_dict.values():
+            return self._queue_action(payload)
+        return self._response('COMMAND_NOT_SUPPORTED')
+
+    def handle_bytes(self, data):
+        """
+        Act on raw bytes from the host, which may hold any number of packets
+        @param str data: Bytes received
+        @return str: Bytes to send back, including any injected faults
+        """
+        responses = []
+        # Fed a byte at a time so a bad packet is answered in its place
+        # among the packets around it
+        for i in range(len(data)):
+            try:
+                payloads = self._decoder.feed(data[i:i + 1])
+            except makerbot_driver.PacketCRCError:
+                self.packets_received += 1
+                responses.append(self._encode_response(
+                    self._response('CRC_MISMATCH')))
+                continue
+            except makerbot_driver.PacketDecodeError:
+                # Firmware drops malformed packets and lets the host time out
+                continue
+            for payload in payloads:
+                self.update()
+                responses.append(
+                    self._encode_response(self.handle_payload(payload)))
+        return ''.join(responses)
+
+    def open_pty(self):
+        """
+        Serve on a new pseudo-terminal
+        @return str: Name of the port for the host to open
+        """
+        # pty and tty are Unix only
+        import pty
+        import tty
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.fd = master
+        self._slave_fd = slave
+        self.port = os.ttyname(slave)
+        return self.port
+
+    def open_socketpair(self):
+        """
+        Serve on one end of a new socketpair
+        @return socket: The host's end
+        """
+        sim_end, host_end = socket.socketpair()
+        self._socket = sim_end
+        self.fd = sim_end.fileno()
+        return host_end
+
+    def start(self):
+        """ Serve in a background thread """
+        self._stopped = False
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stop serving and close the connection """
+        self._stopped = True
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        elif self.fd is not None:
+            os.close(self.fd)
+            os.close(self._slave_fd)
+        self.fd = None
+
+    def serve_forever(self, poll_interval=0.01):
+        """
+        Answer packets until stop is called or the host hangs up
+        @param float poll_interval: Longest time between clock updates
+        """
+        while not self._stopped:
+            readable, _, _ = select.select([self.fd], [], [], poll_interval)
+            self.update()
+            if not readable:
+                continue
+            try:
+                data = os.read(self.fd, 4096)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EIO):
+                    continue
+                raise
+            if data == '':
+                break
+            response = self.handle_bytes(data)
+            if len(response) > 0:
+                if self.latency > 0:
+                    time.sleep(self.latency)
+                os.write(self.fd, response)
+
+    def _encode_response(self, response):
+        self.packets_sent += 1
+        packet = makerbot_driver.Encoder.encode_payload(response)
+        if self.crc_error_rate > 0 and self.random.random() < self.crc_error_rate:
+            self.injected_crc_errors += 1
+            packet[-1] ^= 0xFF
+        data = str(packet)
+        if self.noise_rate > 0 and self.random.random() < self.noise_rate:
+            noise = bytearray(self.random.choice(
+                [b for b in range(256) if b != makerbot_driver.header])
+                for i in range(self.noise_length))
+            self.injected_noise_bytes += len(noise)
+            data = str(noise) + data
+        return data
+
+    def _response(self, code):
+        return bytearray([makerbot_driver.response_code_dict[code]])
+
+    def _pack(self, code, *args):
+        return bytearray(struct.pack(
+            code, makerbot_driver.response_code_dict['SUCCESS'], *args))
+
+    def _success(self, payload):
+        return self._response('SUCCESS')
+
+    def _queue_action(self, payload):
+        if self._capture is not None:
+            self._capture.append(payload)
+            return self._response('SUCCESS')
+        if len(payload) > self.get_available_buffer_size():
+            self.total_overflows += 1
+            self._log.debug('{"event":"simulated_buffer_overflow", "available":%i}', self.get_available_buffer_size())
+            return self._response('ACTION_BUFFER_OVERFLOW')
+        self._enqueue(payload, True)
+        return self._response('SUCCESS')
+
+    def _enqueue(self, payload, counted):
+        if self.is_finished():
+            self._busy_until = self.sim_time
+        self._queue.append((payload, counted))
+        if counted:
+            self._buffer_used += len(payload)
+        self.advance(0)
+
+    def _execute(self, payload):
+        """
+        Execute an action command
+        @return float: Simulated seconds it takes, or None if it is blocked
+        """
+        handler = self.ACTION_HANDLERS.get(payload[0])
+        duration = 0
+        if handler is not None:
+            duration = handler(payload)
+        if duration is not None:
+            self.executed.append(payload)
+            self.line_number += 1
+        return duration
+
+    # Host queries
+
+    def _get_version(self, payload):
+        return self._pack('<BH', self.firmware_version)
+
+    def _get_advanced_version(self, payload):
+        return self._pack('<BHHBBH', self.firmware_version,
+                          self.firmware_version, self.software_variant, 0, 0)
+
+    def _init(self, payload):
+        self._clear_buffer(payload)
+        self.position = [0, 0, 0, 0, 0]
+        self.build_state = 0
+        return self._response('SUCCESS')
+
+    def _get_available_buffer_size(self, payload):
+        return self._pack('<BI', self.get_available_buffer_size())
+
+    def _clear_buffer(self, payload):
+        self._queue.clear()
+        self._buffer_used = 0
+        self._busy_until = self.sim_time
+        self._wait_start = None
+        return self._response('SUCCESS')
+
+    def _abort_immediately(self, payload):
+        self._clear_buffer(payload)
+        for tool in self.tools:
+            self._tool_abort(tool, '')
+        self.enabled_axes = 0
+        return self._response('SUCCESS')
+
+    def _is_finished(self, payload):
+        return self._pack('<B?', self.is_finished())
+
+    def _get_extended_position(self, payload):
+        return self._pack('<BiiiiiH', *(self.position + [0]))
+
+    def _extended_stop(self, payload):
+        (halt_steppers,) = struct.unpack('<b', str(payload[1:2]))
+        if halt_steppers & 0x02:
+            self._clear_buffer(payload)
+        if halt_steppers & 0x01:
+            self.enabled_axes = 0
+        return self._pack('<BB', 0)
+
+    def _get_motherboard_status(self, payload):
+        return self._pack('<BB', 0)
+
+    def _get_build_stats(self, payload):
+        minutes = int(self.sim_time - self.build_start_time) / 60
+        return self._pack('<BBBBLL', self.build_state, min(minutes / 60, 255),
+                          minutes % 60, self.line_number, 0)
+
+    def _get_communication_stats(self, payload):
+        return self._pack('<BLLLLL', self.packets_received, self.packets_sent,
+                          0, 0, self._decoder.noise_bytes)
+
+    def _get_build_name(self, payload):
+        return self._response('SUCCESS') + self.build_name + '\x00'
+
+    def _read_from_eeprom(self, payload):
+        offset, length = struct.unpack('<Hb', str(payload[1:4]))
+        return self._response('SUCCESS') + self.eeprom[offset:offset + length]
+
+    def _write_to_eeprom(self, payload):
+        offset, length = struct.unpack('<hb', str(payload[1:4]))
+        data = payload[4:4 + length]
+        self.eeprom[offset:offset + len(data)] = data
+        return self._pack('<BB', len(data))
+
+    # SD card
+
+    def _sd_response(self, code):
+        return self._pack('<BB', makerbot_driver.sd_error_dict[code])
+
+    def _capture_to_file(self, payload):
+        self._capture_name = str(payload[1:]).rstrip('\x00')
+        self._capture = []
+        return self._sd_response('SUCCESS')
+
+    def _end_capture(self, payload):
+        if self._capture is None:
+            return self._pack('<BI', 0)
+        self.sd_card[self._capture_name] = self._capture
+        self._capture = None
+        return self._pack('<BI', sum(len(p) for p in self.sd_card[self._capture_name]))
+
+    def _playback_capture(self, payload):
+        filename = str(payload[1:]).rstrip('\x00')
+        if filename not in self.sd_card:
+            return self._sd_response('FILESYSTEM_ERROR')
+        self.build_name = filename
+        for captured in self.sd_card[filename]:
+            self._enqueue(captured, False)
+        return self._sd_response('SUCCESS')
+
+    def _get_next_filename(self, payload):
+        if payload[1]:
+            self._sd_index = 0
+        names = sorted(self.sd_card)
+        name = ''
+        if self._sd_index < len(names):
+            name = names[self._sd_index]
+            self._sd_index += 1
+        return self._sd_response('SUCCESS') + name + '\x00'
+
+    # Tool queries
+
+    def _tool_query(self, payload):
+        tool_index, command = payload[1], payload[2]
+        if tool_index >= len(self.tools):
+            return self._response('DOWNSTREAM_TIMEOUT')
+        handler = self.TOOL_QUERY_HANDLERS.get(command)
+        if handler is None:
+            return self._response('COMMAND_NOT_SUPPORTED')
+        return handler(self.tools[tool_index], payload[3:])
+
+    def _tool_get_version(self, tool, data):
+        return self._pack('<BH', self.firmware_version)
+
+    def _tool_get_pid_state(self, tool, data):
+        extruder_error = int(tool.toolhead_target - tool.toolhead_temperature)
+        platform_error = int(tool.platform_target - tool.platform_temperature)
+        return self._pack('<Bhhhhhh', extruder_error, 0, 0, platform_error, 0, 0)
+
+    def _tool_read_from_eeprom(self, tool, data):
+        offset, length = struct.unpack('<HB', str(data[0:3]))
+        return self._response('SUCCESS') + tool.eeprom[offset:offset + length]
+
+    def _tool_write_to_eeprom(self, tool, data):
+        offset, length = struct.unpack('<HB', str(data[0:3]))
+        written = data[3:3 + length]
+        tool.eeprom[offset:offset + len(written)] = written
+        return self._pack('<BB', len(written))
+
+    # Actions
+
+    def _move_duration(self, target, relative):
+        steps = 0
+        for i in range(5):
+            if relative & (1 << i):
+                target[i] += self.position[i]
+            steps = max(steps, abs(target[i] - self.position[i]))
+        self.position = target
+        return steps
+
+    def _queue_extended_point(self, payload):
+        values = struct.unpack('<iiiiiI', str(payload[1:25]))
+        steps = self._move_duration(list(values[:5]), 0)
+        return steps * values[5] / 1000000.0
+
+    def _queue_extended_point_new(self, payload):
+        values = struct.unpack('<iiiiiIB', str(payload[1:26]))
+        self._move_duration(list(values[:5]), values[6])
+        return values[5] / 1000000.0
+
+    def _queue_extended_point_accelerated(self, payload):
+        values = struct.unpack('<iiiiiIBfh', str(payload[1:32]))
+        steps = self._move_duration(list(values[:5]), values[6])
+        if values[5] == 0:
+            return 0
+        return float(steps) / values[5]
+
+    def _set_extended_position(self, payload):
+        self.position = list(struct.unpack('<iiiii', str(payload[1:21])))
+        return 0
+
+    def _delay(self, payload):
+        (delay,) = struct.unpack('<I', str(payload[1:5]))
+        return delay / 1000000.0
+
+    def _change_tool(self, payload):
+        self.current_tool = payload[1]
+        return 0
+
+    def _enable_axes(self, payload):
+        axes = payload[1] & 0x1F
+        if payload[1] & 0x80:
+            self.enabled_axes |= axes
+        else:
+            self.enabled_axes &= ~axes
+        return 0
+
+    def _wait_for(self, payload, is_ready):
+        tool_index, delay, timeout = struct.unpack('<BHH', str(payload[1:6]))
+        if tool_index >= len(self.tools) or is_ready(self.tools[tool_index]):
+            self._wait_start = None
+            return 0
+        if self._wait_start is None:
+            self._wait_start = self.sim_time
+        if timeout > 0 and self.sim_time - self._wait_start >= timeout:
+            self._wait_start = None
+            return 0
+        return None
+
+    def _wait_for_tool_ready(self, payload):
+        return self._wait_for(
+            payload, lambda tool: tool.is_toolhead_ready(self.ready_tolerance))
+
+    def _wait_for_platform_ready(self, payload):
+        return self._wait_for(
+            payload, lambda tool: tool.is_platform_ready(self.ready_tolerance))
+
+    def _set_build_percent(self, payload):
+        self.build_percent = payload[1]
+        return 0
+
+    def _build_start_notification(self, payload):
+        self.build_name = str(payload[5:]).rstrip('\x00')
+        self.build_state = 1
+        self.build_start_time = self.sim_time
+        self.line_number = 0
+        return 0
+
+    def _build_end_notification(self, payload):
+        self.build_state = 2
+        return 0
+
+    def _tool_action_command(self, payload):
+        tool_index, command, length = payload[1], payload[2], payload[3]
+        handler = self.TOOL_ACTION_HANDLERS.get(command)
+        if tool_index < len(self.tools) and handler is not None:
+            handler(self.tools[tool_index], payload[4:4 + length])
+        return 0
+
+    def _set_toolhead_target(self, tool, data):
+        (tool.toolhead_target,) = struct.unpack('<H', str(data[0:2]))
+
+    def _set_platform_target(self, tool, data):
+        (tool.platform_target,) = struct.unpack('<H', str(data[0:2]))
+
+    def _set_motor_speed(self, tool, data):
+        (tool.motor_rpm,) = struct.unpack('<I', str(data[0:4]))
+
+    def _toggle_motor(self, tool, data):
+        tool.motor_enabled = bool(data[0] & 0x01)
+
+    def _toggle_fan(self, tool, data):
+        tool.fan_enabled = bool(data[0] & 0x01)
+
+    def _tool_abort(self, tool, data):
+        tool.toolhead_target = 0
+        tool.platform_target = 0
+        tool.motor_enabled = False
@@ -23,6 +23,26 @@ class AbstractWriter(object):
         """
         raise NotImplementedError()
 
+    def send_action_from_builder(self, builder):
+        """ Send the command last packed into a PacketBuilder as an action command.
+        Writers that send framed packets can override this to use the builder's
+        prebuilt packet buffer.
+
+        @param PacketBuilder builder Builder holding the packed command
+        """
+        self.send_action_payload(builder.payload())
+
+    def send_action_payloads(self, data, payload_length):
+        """ Send a run of fixed length action payloads packed back to back.
+        Writers that store bare payloads can override this to write them all
+        at once.
+
+        @param bytearray data Payloads packed one after another
+        @param int payload_length Length of each payload in data
+        """
+        for offset in range(0, len(data), payload_length):
+            self.send_action_payload(data[offset:offset + payload_length])
+
     def send_query_payload(self, payload):
         """ Send the given payload as a query command
 
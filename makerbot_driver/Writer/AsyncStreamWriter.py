@@ -0,0 +1,323 @@
+""" A non-blocking writer for s3g streams, driven by a select loop so a
+single thread can talk to many machines at once.
+"""
+from __future__ import absolute_import
+
+import collections
+import errno
+import logging
+import os
+import select
+import time
+
+import makerbot_driver
+
+
+class PendingResponse(object):
+    """ The eventual response to a packet sent with an AsyncStreamWriter.
+    Either a result or an exception is set once the machine answers.
+    """
+
+    def __init__(self, payload=None):
+        """
+        @param bytearray payload: Payload this is the response to
+        """
+        self.payload = payload
+        self.retry_count = 0
+        self.received_errors = []
+        self.sent_time = None
+        self._done = False
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        """@returns True once a result or exception has been set """
+        return self._done
+
+    def result(self):
+        """ Get the result, raising the exception instead if one was set.
+        @return The response
+        """
+        if not self._done:
+            raise makerbot_driver.Writer.ResponseNotReadyError()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        """@returns The exception that was set, or None """
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """ Call callback(self) once this is done, or now if it already is.
+        @param callback: Function taking this PendingResponse
+        """
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def set_result(self, result):
+        self._result = result
+        self._finish()
+
+    def set_exception(self, exception):
+        self._exception = exception
+        self._finish()
+
+    def map(self, function):
+        """ Create a PendingResponse for function(result) of this one.
+        Exceptions from this one, or from function, are passed through.
+        @param function: Function to apply to the result
+        @return PendingResponse
+        """
+        mapped = PendingResponse(self.payload)
+
+        def callback(pending):
+            if pending.exception() is not None:
+                mapped.set_exception(pending.exception())
+                return
+            try:
+                result = function(pending.result())
+            except Exception as e:
+                mapped.set_exception(e)
+            else:
+                mapped.set_result(result)
+        self.add_done_callback(callback)
+        return mapped
+
+    def _finish(self):
+        self._done = True
+        callbacks = self._callbacks
+        self._callbacks = []
+        for callback in callbacks:
+            callback(self)
+
+
+class AsyncStreamWriter(object):
+    """ Sends packets to a machine over a non-blocking file descriptor.
+    Packets are queued and sent one at a time; each send returns a
+    PendingResponse that is completed when a SelectLoop sees the answer.
+    Retries follow the same rules as StreamWriter.
+    """
+
+    def __init__(self, file):
+        """ Initialize a new AsyncStreamWriter
+
+        @param file: File descriptor, or object with a fileno() method
+        """
+        self.file = file
+        if hasattr(file, 'fileno'):
+            self.fd = file.fileno()
+        else:
+            self.fd = file
+        # fcntl is POSIX only, so it is imported here rather than with the
+        # package
+        import fcntl
+        flags = fcntl.fcntl(self.fd, fcntl.F_GETFL)
+        fcntl.fcntl(self.fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self._log = logging.getLogger(self.__class__.__name__)
+        self._decoder = makerbot_driver.Encoder.PacketStreamDecoder()
+        self._queue = collections.deque()
+        self._current = None
+        self.external_stop = False
+        self.total_retries = 0
+        self.total_overflows = 0
+
+    def fileno(self):
+        return self.fd
+
+    def close(self):
+        """ Close the stream, failing anything not yet answered """
+        pending = list(self._queue)
+        if self._current is not None:
+            pending.insert(0, self._current)
+        self._queue.clear()
+        self._current = None
+        for p in pending:
+            p.set_exception(makerbot_driver.ExternalStopError())
+        if hasattr(self.file, 'close'):
+            self.file.close()
+        else:
+            os.close(self.fd)
+
+    def set_external_stop(self, value=True):
+        self.external_stop = value
+
+    def send_query_payload(self, payload):
+        """ Queue a query payload to be sent.
+        @param bytearray payload: Payload to send
+        @return PendingResponse for the response payload
+        """
+        return self._queue_payload(payload)
+
+    def send_action_payload(self, payload):
+        """ Queue an action payload to be sent.
+        @param bytearray payload: Payload to send
+        @return PendingResponse for the response payload
+        """
+        return self._queue_payload(payload)
+
+    def is_idle(self):
+        """@returns True if nothing is waiting for an answer """
+        return self._current is None and len(self._queue) == 0
+
+    def next_timeout(self):
+        """@returns Time the packet in flight times out, or None """
+        if self._current is None:
+            return None
+        return self._current.sent_time + makerbot_driver.timeout_length
+
+    def handle_readable(self):
+        """ Read whatever the machine has sent and complete any answered packets.
+        Called by the SelectLoop when the file descriptor is readable.
+        """
+        try:
+            data = os.read(self.fd, 4096)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            raise
+        try:
+            payloads = self._decoder.feed(data)
+        except makerbot_driver.PacketDecodeError as e:
+            self._retry(e)
+            payloads = self._decoder.feed('')
+        for payload in payloads:
+            self._handle_payload(payload)
+
+    def check_timeout(self, now):
+        """ Retry the packet in flight if it has waited too long.
+        @param float now: The current time
+        """
+        timeout = self.next_timeout()
+        if timeout is not None and now > timeout:
+            self._log.debug('{"event":"machine_timeout"}')
+            self._retry(makerbot_driver.TimeoutError(0, self._decoder.state))
+
+    def _queue_payload(self, payload):
+        pending = PendingResponse(payload)
+        if self.external_stop:
+            pending.set_exception(makerbot_driver.ExternalStopError())
+            return pending
+        self._queue.append(pending)
+        if self._current is None:
+            self._send_next()
+        return pending
+
+    def _send_next(self):
+        self._current = None
+        if len(self._queue) > 0:
+            self._current = self._queue.popleft()
+            self._transmit(self._current)
+
+    def _transmit(self, pending):
+        packet = makerbot_driver.Encoder.encode_payload(pending.payload)
+        data = str(packet)
+        while len(data) > 0:
+            try:
+                written = os.write(self.fd, data)
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+                select.select([], [self.fd], [], makerbot_driver.timeout_length)
+                continue
+            data = data[written:]
+        pending.sent_time = time.time()
+
+    def _handle_payload(self, payload):
+        pending = self._current
+        if pending is None:
+            self._log.debug('{"event":"unexpected_response"}')
+            return
+        try:
+            makerbot_driver.Encoder.check_response_code(payload[0])
+        except makerbot_driver.BufferOverflowError as e:
+            # As with StreamWriter, overflows are left to the caller
+            self.total_overflows += 1
+            pending.set_exception(e)
+        except makerbot_driver.RetryableError as e:
+            self._retry(e)
+            return
+        except Exception as e:
+            pending.set_exception(e)
+        else:
+            pending.set_result(payload)
+        self._send_next()
+
+    def _retry(self, error):
+        pending = self._current
+        if pending is None:
+            return
+        self._log.debug('{"event":"transmission_problem", "exception":"%s", "retry_count"=%i}', type(error), pending.retry_count)
+        self.total_retries += 1
+        pending.retry_count += 1
+        pending.received_errors.append(error.__class__.__name__)
+        if self.external_stop:
+            pending.set_exception(makerbot_driver.ExternalStopError())
+            self._send_next()
+        elif pending.retry_count >= makerbot_driver.max_retry_count:
+            self._log.error('{"event":"transmission_error"}')
+            pending.set_exception(
+                makerbot_driver.TransmissionError(pending.received_errors))
+            self._send_next()
+        else:
+            self._transmit(pending)
+
+
+class SelectLoop(object):
+    """ Waits on many AsyncStreamWriters (or anything else with fileno and
+    handle_readable methods) at once, dispatching reads and timeouts.
+    """
+
+    def __init__(self):
+        self.handlers = []
+
+    def add(self, handler):
+        self.handlers.append(handler)
+
+    def remove(self, handler):
+        self.handlers.remove(handler)
+
+    def run_once(self, timeout=None):
+        """ Wait until a handler is readable or a packet times out, then
+        dispatch.
+        @param float timeout: Longest time to wait, in seconds
+        """
+        now = time.time()
+        for handler in self.handlers:
+            if hasattr(handler, 'next_timeout') and handler.next_timeout() is not None:
+                wait = max(0, handler.next_timeout() - now)
+                if timeout is None or wait < timeout:
+                    timeout = wait
+        readable, _, _ = select.select(self.handlers, [], [], timeout)
+        for handler in readable:
+            handler.handle_readable()
+        now = time.time()
+        for handler in self.handlers:
+            if hasattr(handler, 'check_timeout'):
+                handler.check_timeout(now)
+
+    def run_until_complete(self, pending, timeout=None):
+        """ Run the loop until pending is done.
+        @param pending: A PendingResponse, or list of them
+        @param float timeout: Give up after this many seconds
+        @return The result, or list of results
+        """
+        if isinstance(pending, list):
+            responses = pending
+        else:
+            responses = [pending]
+        if timeout is not None:
+            end_time = time.time() + timeout
+        while not all(p.done() for p in responses):
+            wait = None
+            if timeout is not None:
+                wait = end_time - time.time()
+                if wait <= 0:
+                    raise makerbot_driver.Writer.ResponseNotReadyError()
+            self.run_once(wait)
+        if isinstance(pending, list):
+            return [p.result() for p in pending]
+        return pending.result()
@@ -0,0 +1,73 @@
+"""A FileWriter that gathers payloads into large writes and keeps the
+file's checksum as it goes, so a compiled file can be finished without
+reading it back.
+"""
+from __future__ import absolute_import
+
+from .FileWriter import FileWriter
+import makerbot_driver
+
+
+class BufferedFileWriter(FileWriter):
+    """ Collects payloads in a buffer and writes them to the file once
+    buffer_size bytes have built up.  The checksum FileComplete appends to a
+    finished file is summed over each buffer before it is written.
+    """
+    def __init__(self, file, condition, buffer_size=65536):
+        """
+        @param file File object to write to, opened in binary mode
+        @param condition Condition used to lock the file
+        @param int buffer_size Number of bytes to collect before writing
+        """
+        super(BufferedFileWriter, self).__init__(file, condition)
+        self.buffer_size = buffer_size
+        self.checksum = 0
+        self.bytes_written = 0
+        self._buffer = bytearray()
+
+    def _write(self, data):
+        if self.external_stop:
+            self._log.error('{"event":"external_stop"}')
+            raise makerbot_driver.ExternalStopError
+        with self._condition:
+            self._buffer += data
+            if len(self._buffer) >= self.buffer_size:
+                self._flush_buffer()
+
+    def _flush_buffer(self):
+        """ Write out the buffer.  Must be called with the condition held. """
+        if self._buffer:
+            self.check_binary_mode()
+            # FileComplete uses a 2 byte checksum
+            self.checksum = (self.checksum + sum(self._buffer)) % 65536
+            self.bytes_written += len(self._buffer)
+            self.file.write(bytes(self._buffer))
+            del self._buffer[:]
+
+    def flush(self):
+        """ Write out everything buffered so far """
+        with self._condition:
+            self._flush_buffer()
+            self.file.flush()
+
+    def write_data(self, data):
+        """ Append data that is already packed as it is stored in the file,
+        i.e. part of a build compiled by another writer.
+
+        @param str data Bare payloads packed one after another
+        """
+        self._write(bytes(data))
+
+    def write_checksum(self):
+        """ Flush the buffer and end the file with its checksum, the same
+        way FileComplete.finish does.
+        """
+        with self._condition:
+            self._flush_buffer()
+            self.file.write(bytes(self.checksum))
+
+    def close(self):
+        with self._condition:
+            if not self.file.closed:
+                self._flush_buffer()
+                self.file.close()
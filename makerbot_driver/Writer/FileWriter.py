@@ -36,9 +36,18 @@ class FileWriter(AbstractWriter):
             raise makerbot_driver.Writer.NonBinaryModeFileError
 
     def send_action_payload(self, payload):
+        self._write(bytes(payload))
+
+    def send_action_from_builder(self, builder):
+        self._write(builder.payload())
+
+    def send_action_payloads(self, data, payload_length):
+        self._write(bytes(data))
+
+    def _write(self, data):
         if self.external_stop:
             self._log.error('{"event":"external_stop"}')
             raise makerbot_driver.ExternalStopError
         self.check_binary_mode()
         with self._condition:
-            self.file.write(bytes(payload))
+            self.file.write(data)
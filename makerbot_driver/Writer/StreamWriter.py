@@ -2,6 +2,7 @@
 """
 from __future__ import absolute_import
 
+import collections
 import time
 import threading
 import logging
@@ -28,14 +29,197 @@ class StreamWriter(AbstractWriter):
                        str(self.file))
         self.total_retries = 0
         self.total_overflows = 0
+        self.total_credit_waits = 0
+        self.credit_poll_interval = 0.05
+        self._in_flight = None
+        self._credit = 0
+        self._buffer_capacity = None
+        self._max_in_flight = 0
+        self._refresh_buffer_size = None
 
     # TODO: test me
     def send_query_payload(self, payload):
-        return self.send_command(payload)
+        with self._condition:
+            # Queries are answered in order, so anything in flight goes first
+            self.flush_pipeline()
+            return self.send_command(payload)
 
     # TODO: test me
     def send_action_payload(self, payload):
-        self.send_command(payload)
+        if self._in_flight is not None:
+            self.send_pipelined_action(payload)
+        else:
+            self.send_command(payload)
+
+    def send_action_from_builder(self, builder):
+        if self._in_flight is not None:
+            # The builder's buffer is reused, but pipelined packets are kept
+            # until they are answered
+            self._send_pipelined_packet(bytearray(builder.packet()))
+        else:
+            self.send_packet(builder.packet())
+
+    def start_pipelining(self, buffer_size, refresh_buffer_size, max_in_flight=8,
+                         buffer_capacity=None):
+        """ Switch action commands to pipelined sending.  Up to max_in_flight
+        action packets are written before their responses are read, as long
+        as the machine's command buffer has room for them.  Responses are
+        matched to packets in order.  Instead of raising BufferOverflowErrors,
+        sending blocks until the machine has room.
+
+        @param int buffer_size: Free bytes in the machine's command buffer
+        @param refresh_buffer_size: Callable returning the machine's current
+            free buffer size, used to regain credit once it runs out
+        @param int max_in_flight: Most packets to send before reading a response
+        @param int buffer_capacity: Size of the machine's whole command
+            buffer, or None if it isn't known
+        """
+        with self._condition:
+            self.flush_pipeline()
+            self._in_flight = collections.deque()
+            self._credit = buffer_size
+            self._buffer_capacity = buffer_capacity
+            self._max_in_flight = max_in_flight
+            self._refresh_buffer_size = refresh_buffer_size
+
+    def stop_pipelining(self):
+        """ Read all outstanding responses and go back to sending each
+        action command as a round trip.
+        """
+        with self._condition:
+            self.flush_pipeline()
+            self._in_flight = None
+            self._refresh_buffer_size = None
+
+    def is_pipelining(self):
+        """@returns True if action commands are being pipelined """
+        return self._in_flight is not None
+
+    def send_pipelined_action(self, payload):
+        """ Send an action payload without waiting for its response, as long
+        as the machine has room for it.
+
+        @param bytearray payload: Payload to send as an action payload
+        """
+        self._send_pipelined_packet(makerbot_driver.Encoder.encode_payload(payload))
+
+    def _send_pipelined_packet(self, packet):
+        if self.external_stop:
+            self._log.error('{"event":"external_stop"}')
+            raise makerbot_driver.ExternalStopError
+        payload_length = packet[1]
+        with self._condition:
+            while len(self._in_flight) >= self._max_in_flight:
+                self._read_oldest_response()
+            if payload_length > self._credit:
+                self._wait_for_credit(payload_length)
+            self.file.write(packet)
+            self.file.flush()
+            self._in_flight.append(packet)
+            self._credit -= payload_length
+
+    def flush_pipeline(self):
+        """ Read the responses to all pipelined packets """
+        with self._condition:
+            while self._in_flight:
+                self._read_oldest_response()
+
+    def _wait_for_credit(self, needed):
+        """ Block until the machine has at least needed bytes free in its
+        command buffer.  A packet longer than the whole buffer only waits
+        for the buffer to empty, since it can never have more room; the
+        machine then answers with an overflow.
+
+        @param int needed: Number of bytes needed
+        """
+        if self._buffer_capacity is not None:
+            needed = min(needed, self._buffer_capacity)
+        self.flush_pipeline()
+        while True:
+            self._credit = self._refresh_buffer_size()
+            if self._credit >= needed:
+                return
+            self.total_credit_waits += 1
+            self._log.debug('{"event":"waiting_for_credit", "credit":%i, "needed":%i}', self._credit, needed)
+            if self.external_stop:
+                self._log.error('{"event":"external_stop"}')
+                raise makerbot_driver.ExternalStopError
+            time.sleep(self.credit_poll_interval)
+
+    def _read_oldest_response(self):
+        """ Read the response to the oldest packet in flight.  If the machine
+        rejected it, read the rest of the responses and resend everything it
+        rejected, in order.
+        """
+        try:
+            self._read_response(time.time())
+        except Exception as e:
+            self._recover_pipeline(e)
+        else:
+            self._in_flight.popleft()
+
+    def _recover_pipeline(self, error):
+        """ Recover from an error response to the oldest packet in flight.
+
+        Packets the machine rejected (buffer overflow, bad crc or a generic
+        error) are resent in order.  If the machine accepted a packet after
+        rejecting an earlier one, or a response could not be decoded, the
+        order of commands on the machine is unknown and a TransmissionError
+        is raised.
+
+        @param Exception error: Error raised by the oldest response
+        """
+        rejected_errors = (
+            makerbot_driver.BufferOverflowError,
+            makerbot_driver.GenericError,
+            makerbot_driver.CRCMismatchError,
+        )
+        received_errors = [error.__class__.__name__]
+        rejected = [self._in_flight.popleft()]
+        if isinstance(error, makerbot_driver.RetryableError) and not isinstance(error, rejected_errors):
+            # The response was lost or garbled, so later ones can't be matched up
+            self._in_flight.clear()
+            self._log.error('{"event":"pipeline_lost_response", "exception":"%s"}', type(error))
+            raise makerbot_driver.TransmissionError(received_errors)
+        elif not isinstance(error, rejected_errors):
+            # Read what is left so the stream stays in step, then pass the error on
+            while self._in_flight:
+                self._in_flight.popleft()
+                try:
+                    self._read_response(time.time())
+                except Exception:
+                    pass
+            raise error
+        while self._in_flight:
+            packet = self._in_flight.popleft()
+            try:
+                self._read_response(time.time())
+            except rejected_errors as e:
+                received_errors.append(e.__class__.__name__)
+                rejected.append(packet)
+            except Exception as e:
+                self._in_flight.clear()
+                received_errors.append(e.__class__.__name__)
+                self._log.error('{"event":"pipeline_lost_response", "exception":"%s"}', type(e))
+                raise makerbot_driver.TransmissionError(received_errors)
+            else:
+                self._in_flight.clear()
+                self._log.error('{"event":"pipeline_out_of_order"}')
+                raise makerbot_driver.TransmissionError(received_errors)
+        self._log.debug('{"event":"pipeline_resend", "count":%i}', len(rejected))
+        self.total_overflows += received_errors.count('BufferOverflowError')
+        # Our idea of the free buffer space is wrong, so ask again before the next send
+        self._credit = 0
+        for packet in rejected:
+            while True:
+                try:
+                    self.send_packet(packet)
+                    break
+                except makerbot_driver.BufferOverflowError:
+                    if self.external_stop:
+                        self._log.error('{"event":"external_stop"}')
+                        raise makerbot_driver.ExternalStopError
+                    time.sleep(self.credit_poll_interval)
 
     def close(self):
         with self._condition:
@@ -59,6 +243,46 @@ class StreamWriter(AbstractWriter):
         packet = makerbot_driver.Encoder.encode_payload(payload)
         return self.send_packet(packet)
 
+    def _read_bytes(self, count, decoder, start_time):
+        """
+        Read exactly count bytes from the stream, accumulating partial
+        reads until the response timeout runs out.
+        @param int count: Number of bytes to read
+        @param decoder PacketStreamDecoder, used to report its state on timeout
+        @param float start_time: Time the packet was sent at
+        @return str of count bytes
+        """
+        # pySerial streams handle blocking read. Be sure to set up a timeout when
+        # initializing them, or this could hang forever
+        data = self.file.read(count)
+        while len(data) < count:
+            if (time.time() > start_time + makerbot_driver.timeout_length):
+                self._log.error('{"event":"machine_timeout"}')
+                raise makerbot_driver.TimeoutError(len(data), decoder.state)
+            data += self.file.read(count - len(data))
+        return data
+
+    def _read_response(self, start_time):
+        """
+        Read one response packet from the stream and check its response code.
+        @param float start_time: Time the packet was sent at
+        @return Response payload, if successful.
+        """
+        decoder = makerbot_driver.Encoder.PacketStreamDecoder()
+        with self._condition:
+            # Read the header and length, then the rest of the packet
+            # (payload + crc) in one request.
+            decoder.parse_byte(ord(self._read_bytes(1, decoder, start_time)))
+            decoder.parse_byte(ord(self._read_bytes(1, decoder, start_time)))
+            decoder.parse_bytes(self._read_bytes(
+                decoder.expected_length + 1, decoder, start_time))
+        if decoder.state != decoder.PAYLOAD_READY:
+            # Only a zero length packet can get here
+            raise makerbot_driver.PacketLengthFieldError(decoder.expected_length, 1)
+
+        makerbot_driver.Encoder.check_response_code(decoder.payload[0])
+        return decoder.payload
+
     def send_packet(self, packet):
         """
         Attempt to send a packet to the machine, retrying up to 5 times if an error
@@ -73,7 +297,6 @@ class StreamWriter(AbstractWriter):
             if self.external_stop:
                 self._log.error('{"event":"external_stop"}')
                 raise makerbot_driver.ExternalStopError
-            decoder = makerbot_driver.Encoder.PacketStreamDecoder()
             with self._condition:
                 self.file.write(packet)
                 self.file.flush()
@@ -83,28 +306,13 @@ class StreamWriter(AbstractWriter):
 
             try:
                 with self._condition:
-                    while (decoder.state != 'PAYLOAD_READY'):
-                        # Try to read a byte
-                        data = ''
-                        while data == '':
-                            if (time.time() > start_time + makerbot_driver.timeout_length):
-                                self._log.error('{"event":"machine_timeout"}')
-                                raise makerbot_driver.TimeoutError(len(data), decoder.state)
-
-                            # pySerial streams handle blocking read. Be sure to set up a timeout when
-                            # initializing them, or this could hang forever
-                            data = self.file.read(1)
-
-                        data = ord(data)
-                        decoder.parse_byte(data)
-
-                    makerbot_driver.Encoder.check_response_code(decoder.payload[0])
+                    payload = self._read_response(start_time)
                     if self.external_stop:
                         self._log.error('{"event":"external_stop"}')
                         raise makerbot_driver.ExternalStopError
 
                 # TODO: Should we chop the response code?
-                return decoder.payload
+                return payload
 
             except (makerbot_driver.BufferOverflowError) as e:
                 # Relative to the StreamWriter, BufferOverflowErrors aren't retryable.  But, they
@@ -1,6 +1,8 @@
-__all__ = ['AbstractWriter', 'FileWriter', 'StreamWriter', 'errors']
+__all__ = ['AbstractWriter', 'FileWriter', 'BufferedFileWriter', 'StreamWriter', 'AsyncStreamWriter', 'errors']
 
 from AbstractWriter import *
 from StreamWriter import *
 from FileWriter import *
+from BufferedFileWriter import *
+from AsyncStreamWriter import *
 from errors import *
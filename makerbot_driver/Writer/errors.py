@@ -4,3 +4,11 @@ class NonBinaryModeFileError(IOError):
     passed into FileWriter that is not opened in
     binary mode.  Open a binary mode file with 'wb'
     """
+
+
+class ResponseNotReadyError(Exception):
+    """
+    A ResponseNotReadyError is raised when the result of a
+    PendingResponse is asked for before the machine has
+    answered.
+    """
@@ -1,4 +1,4 @@
-__all__ = ['GcodeProcessors', 'Encoder', 'EEPROM', 'FileReader', 'Gcode', 'Writer', 'MachineFactory', 'MachineDetector', 's3g', 'profile', 'constants', 'errors', 'GcodeAssembler', 'Factory']
+__all__ = ['GcodeProcessors', 'Encoder', 'EEPROM', 'FileReader', 'Gcode', 'Writer', 'MachineFactory', 'MachineDetector', 's3g', 'profile', 'constants', 'errors', 'GcodeAssembler', 'Factory', 'BuildStreamer', 'AsyncS3g', 'Simulator', 'Compiler']
 
 __version__ = '0.1.1'
 
@@ -10,6 +10,10 @@ from GcodeAssembler import *
 from MachineDetector import *
 from MachineFactory import *
 from Factory import *
+from BuildStreamer import *
+from AsyncS3g import *
+from Simulator import *
+from Compiler import *
 import GcodeProcessors
 import Encoder
 import EEPROM
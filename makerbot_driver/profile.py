@@ -40,6 +40,16 @@ class Profile(object):
             self._log.debug("no such profile file %s for %s", path, name)
             raise IOError("no such profile file %s for %s", path, name)
 
+    def __getstate__(self):
+        # Loggers can't be pickled, so profiles can be sent to other processes without theirs
+        state = self.__dict__.copy()
+        del state['_log']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._log = logging.getLogger(self.__class__.__name__)
+
 
 def list_profiles(profiledir=None):
     """
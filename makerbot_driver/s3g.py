@@ -6,9 +6,41 @@ import array
 import time
 import serial
 
+try:
+    import numpy
+except ImportError:
+    # Batches of points are packed one at a time instead
+    numpy = None
+
 import makerbot_driver
 import uuid
 
+if numpy is not None:
+    # Memory layout of a QUEUE_EXTENDED_POINT_ACCELERATED payload ('<BiiiiiIBfh')
+    _x3g_point_dtype = numpy.dtype([
+        ('command', 'u1'),
+        ('position', '<i4', (5,)),
+        ('dda_rate', '<u4'),
+        ('relative_axes', 'u1'),
+        ('distance', '<f4'),
+        ('feedrate', '<i2'),
+    ])
+
+    def _check_packable(values, dtype, format_name):
+        """
+        Raise the struct.error that packing the values one at a time would,
+        since casting them into _x3g_point_dtype silently wraps instead.
+        Like struct, values are truncated towards zero first.
+        @param values: numpy array of the values to pack
+        @param str dtype: numpy integer type the values are cast to
+        @param str format_name: Name struct gives the format in its errors
+        """
+        info = numpy.iinfo(dtype)
+        values = numpy.trunc(values)
+        if values.size and (values.min() < info.min or values.max() > info.max):
+            raise struct.error('%s format requires %i <= number <= %i' % (
+                format_name, info.min, info.max))
+
 
 class s3g(object):
     """ Represents an interface to a s3g driven bot. Contains methods and functions to
@@ -50,6 +82,14 @@ class s3g(object):
         self._eeprom_reader = None
         self.print_to_file_type = 's3g'
         self.tool_query_code = 'Bbb'
+        # Movement commands are sent far more than any other, so they are
+        # packed with prebuilt structs into reusable packet buffers
+        self._point_builder_classic = makerbot_driver.Encoder.PacketBuilder(
+            '<BiiiiiI',
+            makerbot_driver.host_action_command_dict['QUEUE_EXTENDED_POINT'])
+        self._point_builder_x3g = makerbot_driver.Encoder.PacketBuilder(
+            '<BiiiiiIBfh',
+            makerbot_driver.host_action_command_dict['QUEUE_EXTENDED_POINT_ACCELERATED'])
 
     def set_print_to_file_type(self, print_to_file_type):
         self.print_to_file_type = print_to_file_type
@@ -680,6 +720,28 @@ class s3g(object):
 
         return buffer_size
 
+    def enable_pipelined_actions(self, max_in_flight=8, buffer_capacity=512):
+        """
+        Send action commands without waiting for each response, keeping up to
+        max_in_flight packets in flight while the machine's command buffer has
+        room for them.  The free buffer space is seeded from, and refreshed
+        with, get_available_buffer_size.
+        @param int max_in_flight: Most action packets to send before reading a response
+        @param int buffer_capacity: Size of the machine's whole command buffer,
+          512 bytes in MakerBot firmware
+        """
+        buffer_size = self.get_available_buffer_size()
+        self.writer.start_pipelining(
+            buffer_size, self.get_available_buffer_size, max_in_flight,
+            buffer_capacity)
+
+    def disable_pipelined_actions(self):
+        """
+        Wait for all pipelined action commands to be answered, and go back to
+        sending action commands one round trip at a time.
+        """
+        self.writer.stop_pipelining()
+
     def abort_immediately(self):
         """
         Stop the machine by disabling steppers, clearing the command buffers, and
@@ -841,17 +903,82 @@ class s3g(object):
         if len(position) != s3g.EXTENDED_POINT_LENGTH:
             raise makerbot_driver.PointLengthError(len(position))
 
-        payload = struct.pack(
-            '<BiiiiiIBfh',
-        makerbot_driver.makerbot_driver.host_action_command_dict[
-            'QUEUE_EXTENDED_POINT_ACCELERATED'],
-        position[0], position[1], position[2], position[3], position[4],
-        dda_rate,
-        makerbot_driver.Encoder.encode_axes(relative_axes),
-        float(distance),
-        int(feedrate * 64.0)
+        builder = self._point_builder_x3g
+        builder.pack(
+            position[0], position[1], position[2], position[3], position[4],
+            dda_rate,
+            makerbot_driver.Encoder.encode_axes(relative_axes),
+            float(distance),
+            int(feedrate * 64.0)
         )
-        self.writer.send_action_payload(payload)
+        self.writer.send_action_from_builder(builder)
+
+    def queue_extended_points(self, positions, dda_rates, distances, feedrates, relative_axes=[]):
+        """
+        Queue many positions with the x3g style at once.  All of the payloads are
+        packed into one buffer and handed to the writer together, so a FileWriter
+        stores them with a single write.  Inputs are array-likes: with numpy
+        installed they are packed column by column, otherwise point by point.
+        @param positions: Nx5 positions in steps, as a numpy array, a list of 5
+          dimensional positions or a flat array.array of N*5 steps
+        @param dda_rates: N steps per second along the master axis
+        @param distances: N distances in millimeters, as for queue_extended_point_x3g
+        @param feedrates: N feedrates in millimeters/second
+        @param list relative_axes: Array of axes whose coordinates should be considered relative, for every point
+        """
+        count = len(dda_rates)
+        if len(distances) != count or len(feedrates) != count:
+            raise makerbot_driver.ParameterError(
+                'dda_rates, distances and feedrates differ in length')
+        flat = isinstance(positions, array.array)
+        if flat:
+            if len(positions) != count * s3g.EXTENDED_POINT_LENGTH:
+                raise makerbot_driver.PointLengthError(len(positions))
+        elif len(positions) != count:
+            raise makerbot_driver.ParameterError(
+                'positions and dda_rates differ in length')
+        if count == 0:
+            return
+
+        builder = self._point_builder_x3g
+        relative = makerbot_driver.Encoder.encode_axes(relative_axes)
+        if numpy is not None:
+            steps = numpy.asarray(positions)
+            if flat:
+                steps = steps.reshape(count, s3g.EXTENDED_POINT_LENGTH)
+            elif steps.ndim != 2 or steps.shape[1] != s3g.EXTENDED_POINT_LENGTH:
+                raise makerbot_driver.PointLengthError(steps.shape)
+            dda_rates = numpy.asarray(dda_rates)
+            feedrates = numpy.asarray(feedrates, dtype=float) * 64.0
+            _check_packable(steps, '<i4', "'i'")
+            _check_packable(dda_rates, '<u4', "'I'")
+            _check_packable(feedrates, '<i2', 'short')
+            points = numpy.empty(count, dtype=_x3g_point_dtype)
+            points['command'] = builder.command
+            points['position'] = steps
+            points['dda_rate'] = dda_rates
+            points['relative_axes'] = relative
+            points['distance'] = distances
+            points['feedrate'] = feedrates
+            data = points.tostring()
+        else:
+            if flat:
+                length = s3g.EXTENDED_POINT_LENGTH
+                positions = [positions[i:i + length]
+                             for i in range(0, len(positions), length)]
+            data = bytearray(count * builder.payload_length)
+            offset = 0
+            pack_into = builder.pack_payload_into
+            for position, dda_rate, distance, feedrate in zip(
+                    positions, dda_rates, distances, feedrates):
+                if len(position) != s3g.EXTENDED_POINT_LENGTH:
+                    raise makerbot_driver.PointLengthError(len(position))
+                offset = pack_into(
+                    data, offset,
+                    position[0], position[1], position[2], position[3], position[4],
+                    dda_rate, relative, float(distance), int(feedrate * 64.0)
+                )
+        self.writer.send_action_payloads(data, builder.payload_length)
 
     def queue_extended_point(self, position, dda_speed, e_distance, feedrate_mm_sec, relative_axes=[]):
         """
@@ -886,15 +1013,12 @@ class s3g(object):
         if len(position) != s3g.EXTENDED_POINT_LENGTH:
             raise makerbot_driver.PointLengthError(len(position))
 
-        payload = struct.pack(
-            '<BiiiiiI',
-        makerbot_driver.host_action_command_dict[
-            'QUEUE_EXTENDED_POINT'],
-        position[0], position[1], position[2],
-        position[3], position[4], dda_speed
+        builder = self._point_builder_classic
+        builder.pack(
+            position[0], position[1], position[2],
+            position[3], position[4], dda_speed
         )
-
-        self.writer.send_action_payload(payload)
+        self.writer.send_action_from_builder(builder)
 
     def set_extended_position(self, position):
         """
@@ -0,0 +1,193 @@
+import os
+import sys
+lib_path = os.path.abspath('./')
+sys.path.insert(0, lib_path)
+
+import pty
+import struct
+import tty
+import unittest
+
+import makerbot_driver
+
+
+class PtyMachine(object):
+    """ A machine stand in on the far side of a pseudo-terminal.  Each packet
+    it receives is answered with the next scripted response: either a payload,
+    raw bytes to write as is, or None to stay silent.  Registered with the
+    same SelectLoop as the writer under test.
+    """
+    def __init__(self):
+        master, self.fd = pty.openpty()
+        tty.setraw(self.fd)
+        self.host_fd = master
+        self.decoder = makerbot_driver.Encoder.PacketStreamDecoder()
+        self.received = []
+        self.responses = []
+
+    def fileno(self):
+        return self.fd
+
+    def handle_readable(self):
+        for payload in self.decoder.feed(os.read(self.fd, 4096)):
+            self.received.append(payload)
+            response = self.responses.pop(0)
+            if isinstance(response, str):
+                os.write(self.fd, response)
+            elif response is not None:
+                os.write(self.fd, str(
+                    makerbot_driver.Encoder.encode_payload(response)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class AsyncS3gTests(unittest.TestCase):
+    def setUp(self):
+        self.machine = PtyMachine()
+        self.writer = makerbot_driver.Writer.AsyncStreamWriter(
+            self.machine.host_fd)
+        self.bot = makerbot_driver.AsyncS3g(self.writer)
+        self.loop = makerbot_driver.Writer.SelectLoop()
+        self.loop.add(self.writer)
+        self.loop.add(self.machine)
+        self.success = makerbot_driver.response_code_dict['SUCCESS']
+
+    def tearDown(self):
+        self.writer.close()
+        self.machine.close()
+
+    def test_get_version(self):
+        self.machine.responses.append(
+            bytearray(struct.pack('<BH', self.success, 0x0600)))
+        pending = self.bot.get_version()
+        self.assertFalse(pending.done())
+        self.assertEqual(0x0600, self.loop.run_until_complete(pending, 5))
+        expected = struct.pack(
+            '<BH', makerbot_driver.host_query_command_dict['GET_VERSION'],
+            makerbot_driver.s3g_version)
+        self.assertEqual(bytearray(expected), self.machine.received[0])
+
+    def test_result_before_done(self):
+        self.machine.responses.append(None)
+        pending = self.bot.get_version()
+        self.assertRaises(
+            makerbot_driver.Writer.ResponseNotReadyError, pending.result)
+
+    def test_queries_are_answered_in_order(self):
+        self.machine.responses.append(
+            bytearray(struct.pack('<BH', self.success, 225)))
+        self.machine.responses.append(
+            bytearray(struct.pack('<Bi', self.success, 512)))
+        temperature = self.bot.get_toolhead_temperature(0)
+        buffer_size = self.bot.get_available_buffer_size()
+        self.assertEqual(
+            [225, 512],
+            self.loop.run_until_complete([temperature, buffer_size], 5))
+        self.assertEqual(2, len(self.machine.received))
+
+    def test_many_machines_one_loop(self):
+        machines = [PtyMachine() for i in range(5)]
+        bots = []
+        for i, machine in enumerate(machines):
+            machine.responses.append(
+                bytearray(struct.pack('<BH', self.success, 200 + i)))
+            writer = makerbot_driver.Writer.AsyncStreamWriter(machine.host_fd)
+            self.loop.add(writer)
+            self.loop.add(machine)
+            bots.append(makerbot_driver.AsyncS3g(writer))
+        try:
+            pending = [bot.get_platform_temperature(0) for bot in bots]
+            self.assertEqual(
+                [200, 201, 202, 203, 204],
+                self.loop.run_until_complete(pending, 5))
+        finally:
+            for bot, machine in zip(bots, machines):
+                bot.writer.close()
+                machine.close()
+
+    def test_retries_after_crc_error(self):
+        response = makerbot_driver.Encoder.encode_payload(
+            bytearray(struct.pack('<BH', self.success, 225)))
+        corrupt = bytearray(response)
+        corrupt[-1] ^= 0xFF
+        self.machine.responses.append(str(corrupt))
+        self.machine.responses.append(str(response))
+        pending = self.bot.get_toolhead_temperature(0)
+        self.assertEqual(225, self.loop.run_until_complete(pending, 5))
+        self.assertEqual(2, len(self.machine.received))
+        self.assertEqual(1, self.writer.total_retries)
+
+    def test_retries_after_generic_error(self):
+        self.machine.responses.append(bytearray(
+            [makerbot_driver.response_code_dict['GENERIC_PACKET_ERROR']]))
+        self.machine.responses.append(
+            bytearray(struct.pack('<BH', self.success, 225)))
+        pending = self.bot.get_toolhead_temperature(0)
+        self.assertEqual(225, self.loop.run_until_complete(pending, 5))
+        self.assertEqual(1, self.writer.total_retries)
+
+    def test_transmission_error_after_max_retries(self):
+        for i in range(makerbot_driver.max_retry_count):
+            self.machine.responses.append(bytearray(
+                [makerbot_driver.response_code_dict['GENERIC_PACKET_ERROR']]))
+        pending = self.bot.get_version()
+        self.assertRaises(makerbot_driver.TransmissionError,
+                          self.loop.run_until_complete, pending, 5)
+        self.assertEqual(
+            makerbot_driver.max_retry_count, len(self.machine.received))
+
+    def test_timeout_resends(self):
+        original_timeout = makerbot_driver.timeout_length
+        makerbot_driver.timeout_length = 0.05
+        try:
+            self.machine.responses.append(None)
+            self.machine.responses.append(
+                bytearray(struct.pack('<BH', self.success, 0x0600)))
+            pending = self.bot.get_version()
+            self.assertEqual(0x0600, self.loop.run_until_complete(pending, 5))
+            self.assertEqual(2, len(self.machine.received))
+        finally:
+            makerbot_driver.timeout_length = original_timeout
+
+    def test_buffer_overflow_not_retried(self):
+        self.machine.responses.append(bytearray(
+            [makerbot_driver.response_code_dict['ACTION_BUFFER_OVERFLOW']]))
+        pending = self.bot.abort_immediately()
+        self.assertRaises(makerbot_driver.BufferOverflowError,
+                          self.loop.run_until_complete, pending, 5)
+        self.assertEqual(1, self.writer.total_overflows)
+
+    def test_external_stop(self):
+        self.writer.set_external_stop()
+        pending = self.bot.get_version()
+        self.assertTrue(pending.done())
+        self.assertRaises(makerbot_driver.ExternalStopError, pending.result)
+
+    def test_send_checks_command(self):
+        self.assertRaises(AttributeError, self.bot.send, 'not_a_command')
+
+
+class PendingResponseTests(unittest.TestCase):
+    def test_map(self):
+        pending = makerbot_driver.Writer.PendingResponse()
+        mapped = pending.map(lambda x: x * 2)
+        self.assertFalse(mapped.done())
+        pending.set_result(4)
+        self.assertEqual(8, mapped.result())
+
+    def test_map_passes_exceptions(self):
+        pending = makerbot_driver.Writer.PendingResponse()
+        mapped = pending.map(lambda x: x * 2)
+        pending.set_exception(makerbot_driver.TransmissionError([]))
+        self.assertRaises(makerbot_driver.TransmissionError, mapped.result)
+
+    def test_callback_after_done(self):
+        pending = makerbot_driver.Writer.PendingResponse()
+        pending.set_result(1)
+        results = []
+        pending.add_done_callback(lambda p: results.append(p.result()))
+        self.assertEqual([1], results)
+
+if __name__ == "__main__":
+    unittest.main()
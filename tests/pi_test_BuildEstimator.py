@@ -0,0 +1,89 @@
+import os
+import sys
+lib_path = os.path.abspath('./')
+sys.path.insert(0, lib_path)
+
+import json
+import tempfile
+import unittest
+
+import makerbot_driver
+
+
+class BuildEstimatorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.e = makerbot_driver.Gcode.BuildEstimator()
+        # Travel, then two layers with a Z hop between them
+        self.moves = [
+            ([0, 0, 0, 0, 0], [10, 10, 5, 0, 0], 1.0),
+            ([10, 10, 5, 0, 0], [10, 10, 0.3, 0, 0], 0.5),
+            ([10, 10, 0.3, 0, 0], [20, 10, 0.3, 1, 0], 2.0),
+            ([20, 10, 0.3, 1, 0], [20, 10, 0.3, 0.5, 0], 0.1),
+            ([20, 10, 0.3, 0.5, 0], [20, 10, 1.3, 0.5, 0], 0.2),
+            ([20, 10, 1.3, 0.5, 0], [-5, 30, 0.6, 0.5, 0], 0.3),
+            ([-5, 30, 0.6, 0.5, 0], [-5, 30, 0.6, 1.5, 0], 0.4),
+            ([-5, 30, 0.6, 1.5, 0], [0, 25, 0.6, 1.5, 2], 3.0),
+        ]
+
+    def add_moves(self, estimator, moves):
+        for start, end, minutes in moves:
+            estimator.add_move(start, end, 1, minutes)
+
+    def test_empty(self):
+        self.assertEqual({
+            'minutes': 0.0,
+            'moves': 0,
+            'layers': [],
+            'extruded': [0.0, 0.0],
+            'minimums': None,
+            'maximums': None,
+        }, self.e.summary())
+
+    def test_moves(self):
+        self.add_moves(self.e, self.moves)
+        summary = self.e.summary()
+        self.assertAlmostEqual(7.5, summary['minutes'])
+        self.assertEqual(8, summary['moves'])
+        self.assertEqual([None, 0.3, 0.6], [z for z, minutes in summary['layers']])
+        for expected, (z, minutes) in zip([1.5, 2.6, 3.4], summary['layers']):
+            self.assertAlmostEqual(expected, minutes)
+        self.assertEqual([1.5, 2.0], summary['extruded'])
+        self.assertEqual([-5, 10, 0.3], summary['minimums'])
+        self.assertEqual([20, 30, 5], summary['maximums'])
+
+    def test_dwell(self):
+        self.e.add_dwell(2)
+        self.add_moves(self.e, self.moves[2:3])
+        self.e.add_dwell(0.5)
+        self.assertEqual([[None, 2], [0.3, 2.5]], self.e.summary()['layers'])
+        self.assertEqual(4.5, self.e.minutes)
+
+    def test_merge_matches_single_estimate(self):
+        self.add_moves(self.e, self.moves)
+        for split in range(len(self.moves) + 1):
+            first = makerbot_driver.Gcode.BuildEstimator()
+            self.add_moves(first, self.moves[:split])
+            following = makerbot_driver.Gcode.BuildEstimator()
+            self.add_moves(following, self.moves[split:])
+            first.merge(following)
+            merged = first.summary()
+            expected = self.e.summary()
+            self.assertAlmostEqual(expected.pop('minutes'), merged.pop('minutes'))
+            self.assertEqual([z for z, minutes in expected.pop('layers')],
+                             [z for z, minutes in merged.pop('layers')])
+            self.assertEqual(expected, merged)
+
+    def test_write_json(self):
+        self.add_moves(self.e, self.moves)
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            path = f.name
+        try:
+            self.e.write_json(path)
+            with open(path) as f:
+                self.assertEqual(self.e.summary(), json.load(f))
+        finally:
+            os.remove(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import os
+import sys
+lib_path = os.path.abspath('./')
+sys.path.insert(0, lib_path)
+
+import io
+import tempfile
+import unittest
+import mock
+
+import makerbot_driver
+
+
+class OverflowingParser(object):
+    """ A parser stand in that overflows a set number of times per line,
+    and reports a set move duration for each line it executes """
+    def __init__(self, overflows=0, move_minutes=0):
+        self.overflows = overflows
+        self.move_minutes = move_minutes
+        self.last_move_minutes = 0
+        self.lines = []
+        self.attempts = 0
+
+    def execute_line(self, line):
+        self.attempts += 1
+        if self.overflows > 0:
+            self.overflows -= 1
+            raise makerbot_driver.BufferOverflowError
+        self.lines.append(line)
+        self.last_move_minutes = self.move_minutes
+
+
+class BuildStreamerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = OverflowingParser()
+        self.streamer = makerbot_driver.BuildStreamer(self.parser)
+
+    def tearDown(self):
+        self.parser = None
+        self.streamer = None
+
+    def test_execute_lines(self):
+        lines = ['G1 X1\n', 'G1 X2\n', 'G1 X3\n']
+        self.streamer.execute_lines(lines)
+        self.assertEqual(lines, self.parser.lines)
+        self.assertEqual(0, self.streamer.total_overflows)
+        self.assertEqual(0, self.streamer.blocked_seconds)
+
+    def test_default_backoff(self):
+        self.assertEqual(
+            self.streamer.default_backoff, self.streamer.get_backoff())
+
+    def test_backoff_follows_move_durations(self):
+        self.parser.move_minutes = 0.001
+        self.streamer.execute_lines(['G1 X1\n'] * 4)
+        self.assertAlmostEqual(0.06, self.streamer.get_backoff())
+        self.assertAlmostEqual(0.12, self.streamer.get_backoff(2))
+
+    def test_non_moves_dont_change_backoff(self):
+        self.parser.move_minutes = 0.001
+        self.streamer.execute_line('G1 X1\n')
+        self.parser.move_minutes = 0
+        self.streamer.execute_line('M18\n')
+        self.assertAlmostEqual(0.06, self.streamer.get_backoff())
+
+    def test_backoff_clamped(self):
+        self.parser.move_minutes = 10
+        self.streamer.execute_line('G1 X1\n')
+        self.assertEqual(self.streamer.max_backoff, self.streamer.get_backoff())
+        self.parser.move_minutes = 0.000001
+        self.streamer = makerbot_driver.BuildStreamer(self.parser)
+        self.streamer.execute_line('G1 X1\n')
+        self.assertEqual(self.streamer.min_backoff, self.streamer.get_backoff())
+
+    def test_retries_on_overflow(self):
+        self.parser.move_minutes = 0.001
+        self.streamer.execute_line('G1 X1\n')
+        self.parser.overflows = 3
+        with mock.patch('time.sleep') as sleep:
+            self.streamer.execute_line('G1 X2\n')
+        self.assertEqual(['G1 X1\n', 'G1 X2\n'], self.parser.lines)
+        self.assertEqual(5, self.parser.attempts)
+        self.assertEqual(3, self.streamer.total_overflows)
+        waits = [call[0][0] for call in sleep.call_args_list]
+        self.assertEqual(3, len(waits))
+        for wait, expected in zip(waits, [0.06, 0.12, 0.24]):
+            self.assertAlmostEqual(expected, wait)
+
+    def test_blocked_time(self):
+        self.parser.overflows = 1
+        self.streamer.default_backoff = 0.01
+        self.streamer.execute_line('G1 X1\n')
+        self.assertTrue(self.streamer.blocked_seconds >= 0.01)
+
+
+class BuildStreamerCheckpointTests(unittest.TestCase):
+
+    def setUp(self):
+        self.gcodes = [
+            'G92 X0 Y0 Z0 A0 B0\n',
+            'M135 T0\n',
+            'M104 S#TEMP T0\n',
+            'G1 X10 Y10 Z1 F3000\n',
+            'G1 X20 Y5 A1.5 F1800\n',
+            '(a comment)\n',
+            'G1 X0 Y0 A2\n',
+            'M135 T1\n',
+            'G1 X5 B1\n',
+            'M73 P50\n',
+            'G1 Y5 B2\n',
+        ]
+        self.file = tempfile.TemporaryFile()
+        self.file.write(''.join(self.gcodes))
+        self.file.seek(0)
+
+    def tearDown(self):
+        self.file.close()
+
+    def make_streamer(self):
+        parser = makerbot_driver.Gcode.GcodeParser()
+        parser.state.profile = makerbot_driver.Profile('ReplicatorDual')
+        parser.environment['TEMP'] = 220
+        parser.s3g = mock.Mock()
+        return makerbot_driver.BuildStreamer(parser)
+
+    def test_execute_file_checkpoints(self):
+        streamer = self.make_streamer()
+        checkpoints = []
+        streamer.execute_file(self.file, 3, checkpoints.append)
+        self.assertEqual(3, len(checkpoints))
+        for i, checkpoint in enumerate(checkpoints):
+            lines = (i + 1) * 3
+            self.assertEqual(lines + 1, checkpoint.line_number)
+            self.assertEqual(len(''.join(self.gcodes[:lines])), checkpoint.offset)
+        self.assertEqual(len(self.gcodes) + 1, streamer.parser.line_number)
+
+    def test_resume_skips_lines_before_checkpoint(self):
+        streamer = self.make_streamer()
+        checkpoints = []
+        streamer.execute_file(self.file, 4, checkpoints.append)
+        checkpoint = checkpoints[1]
+        # Lines 9 to 11 make three calls
+        expected_calls = streamer.parser.s3g.mock_calls[-3:]
+
+        resumed = self.make_streamer()
+        resumed.parser.environment = {}
+        resumed.resume(self.file, checkpoint)
+        self.assertEqual(expected_calls, resumed.parser.s3g.mock_calls)
+        self.assertEqual(streamer.parser.state.position.ToList(),
+                         resumed.parser.state.position.ToList())
+        self.assertEqual(streamer.parser.state.values, resumed.parser.state.values)
+        self.assertEqual(streamer.parser.line_number, resumed.parser.line_number)
+
+    def test_resume_from_saved_checkpoint(self):
+        streamer = self.make_streamer()
+        checkpoints = []
+        streamer.execute_file(self.file, 5, checkpoints.append)
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            path = f.name
+        try:
+            checkpoints[0].write_json(path)
+            checkpoint = makerbot_driver.Gcode.ParserCheckpoint.read_json(path)
+        finally:
+            os.remove(path)
+        resumed = self.make_streamer()
+        resumed.resume(self.file, checkpoint)
+        self.assertEqual(streamer.parser.state.position.ToList(),
+                         resumed.parser.state.position.ToList())
+        self.assertEqual(streamer.parser.state.values, resumed.parser.state.values)
+
+    def test_resume_text_mode_crlf(self):
+        with tempfile.NamedTemporaryFile(suffix='.gcode', delete=False) as f:
+            f.write('\r\n'.join(line.rstrip('\n') for line in self.gcodes))
+            path = f.name
+        try:
+            streamer = self.make_streamer()
+            checkpoints = []
+            with io.open(path, 'r') as f:
+                streamer.execute_file(f, 4, checkpoints.append)
+            expected_calls = streamer.parser.s3g.mock_calls[-3:]
+            resumed = self.make_streamer()
+            with io.open(path, 'r') as f:
+                resumed.resume(f, checkpoints[1])
+        finally:
+            os.remove(path)
+        self.assertEqual(expected_calls, resumed.parser.s3g.mock_calls)
+        self.assertEqual(streamer.parser.line_number, resumed.parser.line_number)
+
+    def test_resume_without_offset(self):
+        streamer = self.make_streamer()
+        self.assertRaises(makerbot_driver.ParameterError, streamer.resume,
+                          self.file, streamer.parser.checkpoint())
+
+if __name__ == "__main__":
+    unittest.main()
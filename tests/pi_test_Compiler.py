@@ -0,0 +1,285 @@
+import os
+import sys
+lib_path = os.path.abspath('./')
+sys.path.insert(0, lib_path)
+
+import unittest
+import struct
+import tempfile
+import threading
+
+import makerbot_driver
+
+
+class TestCompileFile(unittest.TestCase):
+
+    def setUp(self):
+        self.gcodes = [
+            'G92 X0 Y0 Z0 A0 B0\n',
+            'M135 T0\n',
+            'M104 S#TEMP T0\n',
+            'G1 X10 Y10 Z1 F3000\n',
+            '(a comment)\n',
+            'M101\n',
+            'G1 X20 Y5 Z1 F1800 E1.5\n',
+            'M103\n',
+            'G1 X0 Y0 Z2 F3000\n',
+        ]
+        with tempfile.NamedTemporaryFile(suffix='.gcode', delete=False) as f:
+            f.write(''.join(self.gcodes))
+            self.src = f.name
+        with tempfile.NamedTemporaryFile(suffix='.x3g', delete=False) as f:
+            self.dst = f.name
+        self.profile = makerbot_driver.Profile('ReplicatorSingle')
+
+    def tearDown(self):
+        os.remove(self.src)
+        os.remove(self.dst)
+
+    def compile_old_way(self, gcodes, print_to_file_type='x3g'):
+        """ Compile the way the conversion example always has: a FileWriter,
+        then FileComplete reading the file back for its checksum """
+        with tempfile.NamedTemporaryFile(suffix='.x3g', delete=False) as f:
+            path = f.name
+        try:
+            parser = makerbot_driver.Gcode.GcodeParser()
+            parser.state.profile = self.profile
+            parser.state.values['build_name'] = os.path.splitext(
+                os.path.basename(self.src))[0]
+            parser.environment.update({'TEMP': 220})
+            parser.s3g = makerbot_driver.s3g(makerbot_driver.Writer.FileWriter(
+                open(path, 'wb'), threading.Condition()))
+            parser.s3g.set_print_to_file_type(print_to_file_type)
+            for line in gcodes:
+                parser.execute_line(line)
+            parser.s3g.writer.file.close()
+            makerbot_driver.Gcode.FileComplete().finish(path)
+            with open(path, 'rb') as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+    def read_dst(self):
+        with open(self.dst, 'rb') as f:
+            return f.read()
+
+    def test_matches_file_complete(self):
+        processor = makerbot_driver.GcodeProcessors.Skeinforge50Processor()
+        processor.do_progress = False
+        expected = self.compile_old_way(processor.process_gcode(self.gcodes))
+        makerbot_driver.compile_file(
+            self.src, self.dst, self.profile, processors=['Skeinforge50Processor'],
+            environment={'TEMP': 220})
+        # The processor created by name puts progress updates in
+        self.assertNotEqual(expected, self.read_dst())
+        processor = makerbot_driver.GcodeProcessors.Skeinforge50Processor()
+        processor.do_progress = False
+        makerbot_driver.compile_file(
+            self.src, self.dst, self.profile, processors=[processor],
+            environment={'TEMP': 220})
+        self.assertEqual(expected, self.read_dst())
+
+    def test_small_buffer(self):
+        processor = makerbot_driver.GcodeProcessors.Skeinforge50Processor()
+        # Progress read from a file goes by byte offset
+        with open(self.src) as f:
+            expected = self.compile_old_way(processor.process_gcode(f), 's3g')
+        makerbot_driver.compile_file(
+            self.src, self.dst, 'ReplicatorSingle',
+            processors='Skeinforge50Processor', environment={'TEMP': 220},
+            print_to_file_type='s3g', buffer_size=7)
+        self.assertEqual(expected, self.read_dst())
+
+    def test_start_and_end_gcode(self):
+        start = ['G92 X0 Y0 Z0 A0 B0', 'M135 T0']
+        end = ['M18 X Y Z A B']
+        gcodes = [line for line in self.gcodes if 'M10' not in line]
+        expected = self.compile_old_way(start + gcodes + end)
+        with open(self.src, 'w') as f:
+            f.write(''.join(gcodes))
+        makerbot_driver.compile_file(
+            self.src, self.dst, self.profile, start_gcode=start,
+            end_gcode=end, environment={'TEMP': 220})
+        self.assertEqual(expected, self.read_dst())
+
+    def test_file_objects_without_checksum(self):
+        gcodes = ['G92 X0 Y0 Z0 A0 B0', 'M135 T0', 'G1 X10 Y10 Z1 F3000']
+        with open(self.dst, 'wb') as f:
+            parser = makerbot_driver.compile_file(
+                iter(gcodes), f, self.profile, checksum=False)
+            self.assertFalse(f.closed)
+        self.assertEqual(len(gcodes) + 1, parser.line_number)
+        expected = self.compile_old_way(gcodes)
+        data = self.read_dst()
+        self.assertTrue(expected.startswith(data))
+        self.assertTrue(expected[len(data):].isdigit())
+
+    def test_sinks(self):
+        gcodes = ['G92 X0 Y0 Z0 A0 B0', 'M135 T0', 'G1 X10 Y10 Z1 F3000']
+        state = makerbot_driver.Gcode.GcodeStates()
+        state.profile = self.profile
+        preview = makerbot_driver.Gcode.ToolpathSink(state.mm_per_step)
+        makerbot_driver.compile_file(gcodes, self.dst, self.profile, sinks=[preview])
+        self.assertEqual(self.compile_old_way(gcodes), self.read_dst())
+        self.assertEqual(2, len(preview.paths))
+        self.assertEqual(0, preview.paths[1][0])
+        for expected, actual in zip([10, 10, 1], preview.paths[1][1][-1]):
+            self.assertAlmostEqual(expected, actual, places=2)
+
+    def test_gcode_error_closes_files(self):
+        gcodes = ['G92 X0 Y0 Z0 A0 B0\n', 'M135 T0\n', 'G1 X10 Y10 Z1 F3000\n']
+        with open(self.src, 'w') as f:
+            f.write(''.join(gcodes) + 'G999\n')
+        self.assertRaises(makerbot_driver.Gcode.UnrecognizedCommandError,
+                          makerbot_driver.compile_file,
+                          self.src, self.dst, self.profile)
+        # Everything compiled before the error was written out
+        data = self.read_dst()
+        self.assertTrue(len(data) > 0)
+        self.assertTrue(self.compile_old_way(gcodes).startswith(data))
+
+    def test_missing_input_makes_no_output(self):
+        os.remove(self.dst)
+        missing = self.src + '.missing'
+        self.assertRaises(IOError, makerbot_driver.compile_file,
+                          missing, self.dst, self.profile)
+        self.assertFalse(os.path.exists(self.dst))
+        # For tearDown
+        open(self.dst, 'wb').close()
+
+
+class TestCompileFileParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.start = ['G92 X0 Y0 Z0 A0 B0', 'M135 T0']
+        self.gcodes = ['M104 S#TEMP T0\n']
+        for layer in range(8):
+            self.gcodes.append('(<layer> %.2f )\n' % (0.3 * (layer + 1)))
+            self.gcodes.append('G1 Z%.2f F1200\n' % (0.3 * (layer + 1)))
+            for i in range(5):
+                self.gcodes.append('G1 X%i Y%i A%.1f\n' % (layer + i, i * 2, layer + i * 0.1))
+            # Zero length moves don't store their feedrate
+            self.gcodes.append('G1 X%i Y8 F99\n' % (layer + 4))
+            self.gcodes.append('(</layer>)\n')
+        self.gcodes.append('M18 X Y Z A B\n')
+        with tempfile.NamedTemporaryFile(suffix='.gcode', delete=False) as f:
+            f.write(''.join(self.gcodes))
+            self.src = f.name
+        with tempfile.NamedTemporaryFile(suffix='.x3g', delete=False) as f:
+            self.dst = f.name
+        with tempfile.NamedTemporaryFile(suffix='.x3g', delete=False) as f:
+            self.expected_dst = f.name
+
+    def tearDown(self):
+        for path in (self.src, self.dst, self.expected_dst):
+            os.remove(path)
+
+    def compile_both(self, **kwargs):
+        makerbot_driver.compile_file(
+            self.src, self.expected_dst, 'ReplicatorSingle', start_gcode=self.start,
+            environment={'TEMP': 220})
+        parser = makerbot_driver.compile_file_parallel(
+            self.src, self.dst, 'ReplicatorSingle', start_gcode=self.start,
+            environment={'TEMP': 220}, shard_lines=10, **kwargs)
+        with open(self.expected_dst, 'rb') as f:
+            expected = f.read()
+        with open(self.dst, 'rb') as f:
+            self.assertEqual(expected, f.read())
+        return parser
+
+    def test_split_at_layers(self):
+        scanner = makerbot_driver.Compiler._create_parser(
+            makerbot_driver.Compiler._ScanningParser,
+            makerbot_driver.Profile('ReplicatorSingle'), False, None, None)
+        lines = self.start + self.gcodes
+        scanner.environment['TEMP'] = 220
+        shards = makerbot_driver.Compiler._split_shards(scanner, lines, 10)
+        self.assertEqual(5, len(shards))
+        self.assertEqual(0, shards[0][0])
+        self.assertEqual(len(lines), shards[-1][1])
+        for (start, end, checkpoint), following in zip(shards, shards[1:]):
+            self.assertEqual(end, following[0])
+            self.assertTrue(lines[end].startswith('(<layer>'))
+        # Each shard starts where the last one's moves left off
+        checkpoint = shards[1][2]
+        self.assertEqual(0, checkpoint.lost)
+        self.assertEqual(1200, checkpoint.values['feedrate'])
+        self.assertEqual(0, checkpoint.values['tool_index'])
+        self.assertEqual(shards[1][0] + 1, checkpoint.line_number)
+        self.assertEqual({'TEMP': 220}, checkpoint.environment)
+
+    def test_matches_compile_file(self):
+        parser = self.compile_both(processes=2)
+        self.assertEqual(len(self.start) + len(self.gcodes) + 1, parser.line_number)
+        self.assertEqual(
+            [11, 8, 0.3 * 8, 7.4, 0], parser.state.position.ToList())
+
+    def test_single_process(self):
+        self.compile_both(processes=1)
+
+    def test_estimator(self):
+        expected = makerbot_driver.Gcode.BuildEstimator()
+        makerbot_driver.compile_file(
+            self.src, self.expected_dst, 'ReplicatorSingle', start_gcode=self.start,
+            environment={'TEMP': 220}, estimator=expected)
+        self.assertEqual(9, len(expected.layers))
+        estimator = makerbot_driver.Gcode.BuildEstimator()
+        makerbot_driver.compile_file_parallel(
+            self.src, self.dst, 'ReplicatorSingle', start_gcode=self.start,
+            environment={'TEMP': 220}, shard_lines=10, processes=2,
+            estimator=estimator)
+        self.assertEqual(expected.moves, estimator.moves)
+        self.assertAlmostEqual(expected.minutes, estimator.minutes)
+        self.assertEqual([z for z, minutes in expected.layers],
+                         [z for z, minutes in estimator.layers])
+        for (z, expected_minutes), (z, minutes) in zip(expected.layers, estimator.layers):
+            self.assertAlmostEqual(expected_minutes, minutes)
+        self.assertEqual(expected.minimums, estimator.minimums)
+        self.assertEqual(expected.maximums, estimator.maximums)
+
+    def test_processors(self):
+        self.compile_both(processes=2, processors=[])
+        processor = makerbot_driver.GcodeProcessors.RpmProcessor()
+        makerbot_driver.compile_file_parallel(
+            self.gcodes, self.dst, 'ReplicatorSingle', processors=[processor],
+            start_gcode=self.start, environment={'TEMP': 220}, processes=2,
+            checksum=False)
+
+    def test_error_in_worker(self):
+        with open(self.src, 'a') as f:
+            f.write('(<layer> 9 )\nM104 S-5 T0\n')
+        self.assertRaises(struct.error, makerbot_driver.compile_file_parallel,
+                          self.src, self.dst, 'ReplicatorSingle',
+                          start_gcode=self.start, environment={'TEMP': 220},
+                          processes=2, shard_lines=10)
+
+    def test_error_in_scan(self):
+        with open(self.src, 'a') as f:
+            f.write('(<layer> 9 )\nG1 X0 Y0 F3000 E0 Q1\n')
+        try:
+            makerbot_driver.compile_file_parallel(
+                self.src, self.dst, 'ReplicatorSingle', start_gcode=self.start,
+                environment={'TEMP': 220}, processes=2, shard_lines=10)
+            self.fail('InvalidCodeError not raised')
+        except makerbot_driver.Gcode.GcodeError as e:
+            self.assertEqual(len(self.start) + len(self.gcodes) + 2,
+                             e.values['LineNumber'])
+
+
+class TestChainProcessors(unittest.TestCase):
+
+    def test_lazy(self):
+        def gcodes():
+            yield 'G1 X0\n'
+            raise AssertionError('read too far')
+        lines = makerbot_driver.chain_processors(
+            gcodes(), [makerbot_driver.GcodeProcessors.RpmProcessor()])
+        self.assertEqual('G1 X0\n', next(lines))
+
+    def test_names(self):
+        lines = makerbot_driver.chain_processors(
+            ['M101\n', 'M103\n', 'G1 X0\n'], 'RpmProcessor, AbpProcessor')
+        self.assertEqual(['G1 X0\n'], list(lines))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -19,5 +19,58 @@ class CRCTests(unittest.TestCase):
         for case in cases:
             assert makerbot_driver.Encoder.CalculateCRC(case[0]) == case[1]
 
+    def test_bytearray_input(self):
+        data = bytearray(b'abcdefghijk')
+        self.assertEqual(0xb4, makerbot_driver.Encoder.CalculateCRC(data))
+        self.assertEqual(bytearray(b'abcdefghijk'), data)
+
+    def test_table_walk_matches(self):
+        data = bytearray(range(256)) * 4
+        self.assertEqual(
+            makerbot_driver.Encoder.Crc._py_crc_update(data),
+            makerbot_driver.Encoder.CalculateCRC(data))
+
+
+class Crc8Tests(unittest.TestCase):
+    def test_starts_at_zero(self):
+        crc = makerbot_driver.Encoder.Crc8()
+        self.assertEqual(0, crc.digest())
+
+    def test_initial_data(self):
+        crc = makerbot_driver.Encoder.Crc8(b'abcdefghijk')
+        self.assertEqual(0xb4, crc.digest())
+
+    def test_update_in_chunks(self):
+        data = bytearray(range(256)) * 16
+        expected = makerbot_driver.Encoder.CalculateCRC(data)
+        crc = makerbot_driver.Encoder.Crc8()
+        for i in range(0, len(data), 100):
+            crc.update(data[i:i + 100])
+        self.assertEqual(expected, crc.digest())
+
+    def test_update_byte(self):
+        data = b'abcdefghijk'
+        crc = makerbot_driver.Encoder.Crc8()
+        for byte in bytearray(data):
+            crc.update_byte(byte)
+        self.assertEqual(0xb4, crc.digest())
+
+    def test_update_chains(self):
+        crc = makerbot_driver.Encoder.Crc8().update(b'abcde').update(b'fghijk')
+        self.assertEqual(0xb4, crc.digest())
+
+    def test_reset(self):
+        crc = makerbot_driver.Encoder.Crc8(b'abcdefghijk')
+        crc.reset()
+        self.assertEqual(0, crc.digest())
+
+    def test_copy(self):
+        crc = makerbot_driver.Encoder.Crc8(b'abcde')
+        other = crc.copy()
+        other.update(b'fghijk')
+        self.assertEqual(0xb4, other.digest())
+        self.assertEqual(
+            makerbot_driver.Encoder.CalculateCRC(b'abcde'), crc.digest())
+
 if __name__ == "__main__":
     unittest.main()
@@ -2,6 +2,7 @@ import os
 import sys
 import unittest
 import re
+import tempfile
 
 sys.path.append(os.path.abspath('../../s3g'))
 import makerbot_driver
@@ -87,6 +88,122 @@ class TestEmptyLayerProcessor(unittest.TestCase):
                 self.assertEqual(match.group(), case[2])
 
 
+    def test_iter_process_SF(self):
+        gcodes = [
+            '(<layer> 0.3 )\n',
+            'G1 X0 Y0 Z0.3\n',
+            'G1 X1 Y1 Z0.3\n',
+            '(</layer>)\n',
+            '(<layer> 0.6 )\n',
+            'G1 X0 Y0 Z0.6\n',
+            '(</layer>)\n',
+            '(<layer> 0.9 )\n',
+            '(</layer>)\n',
+        ]
+        got_gcodes = list(self.p.iter_process(iter(gcodes)))
+        self.assertEqual(gcodes[:4], got_gcodes)
+
+    def test_iter_process_MG(self):
+        gcodes = [
+            '(Slice 0, 1 Extruder)\n',
+            'G1 X0 Y0 Z0.3\n',
+            'G1 X1 Y1 Z0.3\n',
+            'G1 X2 Y2 Z0.3\n',
+            '\n',
+            '(Slice 1, 1 Extruder)\n',
+            'G1 Z0.6 F1380.000 (move Z)\n',
+            '(Slowing to 0% of nominal speeds)\n',
+            '\n',
+            '(Slice 2, 1 Extruder)\n',
+            'G1 Z0.9 F1380.000 (move Z)\n',
+            '(Slowing to 0% of nominal speeds)\n',
+        ]
+        # The empty line after an empty slice is kept
+        expected_gcodes = gcodes[:5] + ['\n']
+        got_gcodes = list(self.p.iter_process(iter(gcodes)))
+        self.assertEqual(expected_gcodes, got_gcodes)
+
+    def test_iter_process_layer_start_in_layer(self):
+        gcodes = [
+            '(Slice 0, 1 Extruder)\n',
+            'G1 X0 Y0 Z0.3\n',
+            'G1 X1 Y1 Z0.3\n',
+            '(Slice 1, 1 Extruder)\n',
+            'G1 Z0.6 F1380.000 (move Z)\n',
+            '(Slowing to 0% of nominal speeds)\n',
+            '\n',
+        ]
+        # Slice 0 has too many moves to be empty, and is looked through
+        # again for the empty Slice 1
+        expected_gcodes = gcodes[:3] + ['\n']
+        got_gcodes = list(self.p.iter_process(gcodes))
+        self.assertEqual(expected_gcodes, got_gcodes)
+
+    def test_process_gcode_list(self):
+        gcodes = [
+            '(<layer> 0.3 )\n',
+            '(</layer>)\n',
+            'M73 P100\n',
+        ]
+        self.assertEqual(['M73 P100\n'], self.p.process_gcode(gcodes))
+
+    def test_process_gcode_file(self):
+        in_path = os.path.abspath('tests/test_files/sf_empty_slice_input.gcode')
+        with open(in_path) as f:
+            expected_gcodes = self.p.process_gcode(list(f))
+        with tempfile.NamedTemporaryFile(suffix='.gcode', delete=False) as f:
+            out_path = f.name
+        try:
+            self.assertTrue(self.p.process_gcode(in_path, outfile=out_path))
+            with open(out_path) as f:
+                self.assertEqual(expected_gcodes, list(f))
+        finally:
+            os.remove(out_path)
+
+    def test_process_gcode_file_crlf(self):
+        gcodes = [
+            '(Slice 0, 1 Extruder)\r\n',
+            'G1 X0 Y0 Z0.3\r\n',
+            'G1 X1 Y1 Z0.3\r\n',
+            'G1 X2 Y2 Z0.3\r\n',
+            '\r\n',
+            '(Slice 1, 1 Extruder)\r\n',
+            'G1 Z0.6 F1380.000 (move Z)\r\n',
+            '(Slowing to 0% of nominal speeds)\r\n',
+            '\r\n',
+        ]
+        with tempfile.NamedTemporaryFile(suffix='.gcode', delete=False) as f:
+            f.write(''.join(gcodes))
+            in_path = f.name
+        out_path = in_path + '.out'
+        try:
+            self.p.process_gcode_file(in_path, out_path)
+            with open(out_path, 'rb') as f:
+                self.assertEqual(''.join(gcodes[:5] + ['\r\n']), f.read())
+        finally:
+            os.remove(in_path)
+            if os.path.exists(out_path):
+                os.remove(out_path)
+
+    def test_process_gcode_file_empty(self):
+        # An empty file can't be mapped, and is read as it is
+        with tempfile.NamedTemporaryFile(suffix='.gcode', delete=False) as f:
+            in_path = f.name
+        out_path = in_path + '.out'
+        try:
+            self.p.process_gcode_file(in_path, out_path)
+            with open(out_path) as f:
+                self.assertEqual('', f.read())
+        finally:
+            os.remove(in_path)
+            if os.path.exists(out_path):
+                os.remove(out_path)
+
+    def test_iter_process_external_stop(self):
+        self.p.set_external_stop()
+        lines = self.p.iter_process(['(<layer> 0.3 )\n', '(</layer>)\n'])
+        self.assertRaises(makerbot_driver.ExternalStopError, list, lines)
+
     def test_process_file(self):
     #TODO update this to work with new formatting
         pass
@@ -276,5 +276,45 @@ class TestFanProcessor(unittest.TestCase):
         got_codes = self.fan_processor.process_gcode(codes)
         self.assertEqual(expected_codes, got_codes)
 
+    def test_iter_process(self):
+        layers = [
+            '(<layer>)',
+            'G1 X0 Y0 Z0',
+            '(</layer>)',
+            '(<layer>)',
+            'G1 X1 Y1 Z1',
+            '(</layer>)',
+            '(<layer>)',
+            'G1 X0 Y0 Z3',
+            '(</layer>)',
+        ]
+        cases = [
+            layers,
+            [self.long_raft_command] + layers[:3] +
+            [self.fan_processor.expected_raft_tag] + layers,
+            layers[:4] + ['M126'] + layers[4:],
+            layers + ['M127'],
+            layers[:3],
+            [],
+        ]
+        for codes in cases:
+            expected_codes = makerbot_driver.GcodeProcessors.FanProcessor(
+            ).process_gcode(codes[:])
+            got_codes = list(self.fan_processor.iter_process(iter(codes)))
+            self.assertEqual(expected_codes, got_codes)
+
+    def test_iter_process_fan_code_after_lookahead(self):
+        self.fan_processor.fan_code_lookahead = 2
+        codes = [
+            '(</layer>)',
+            '(</layer>)',
+            'G1 X0 Y0 Z0',
+            'G1 X1 Y1 Z1',
+            'M127',
+        ]
+        expected_codes = codes[:2] + ['M126 T0 (Fan On)\n'] + codes[2:]
+        got_codes = list(self.fan_processor.iter_process(codes))
+        self.assertEqual(expected_codes, got_codes)
+
 if __name__ == "__main__":
     unittest.main()
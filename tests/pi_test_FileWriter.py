@@ -32,6 +32,34 @@ class s3gFileWriterTests(unittest.TestCase):
         with open(self.the_file, 'r') as f:
             self.assertEqual(expected_payload, f.read())
 
+    def test_send_action_from_builder(self):
+        builder = makerbot_driver.Encoder.PacketBuilder('<BH', 100)
+        builder.pack(0x0201)
+        self.w.send_action_from_builder(builder)
+        builder.pack(0x0403)
+        self.w.send_action_from_builder(builder)
+        self.w.close()
+        with open(self.the_file, 'rb') as f:
+            self.assertEqual('\x64\x01\x02\x64\x03\x04', f.read())
+
+    def test_send_action_payloads(self):
+        self.w.send_action_payloads(bytearray('\x64\x01\x02\x64\x03\x04'), 3)
+        self.w.close()
+        with open(self.the_file, 'rb') as f:
+            self.assertEqual('\x64\x01\x02\x64\x03\x04', f.read())
+
+    def test_send_action_payloads_external_stop(self):
+        self.w.external_stop = True
+        self.assertRaises(makerbot_driver.ExternalStopError,
+                          self.w.send_action_payloads, bytearray(6), 3)
+
+    def test_builder_external_stop(self):
+        self.w.external_stop = True
+        builder = makerbot_driver.Encoder.PacketBuilder('<B', 100)
+        builder.pack()
+        self.assertRaises(makerbot_driver.ExternalStopError,
+                          self.w.send_action_from_builder, builder)
+
     def test_write_external_stop(self):
         self.w.external_stop = True
         self.assertRaises(makerbot_driver.ExternalStopError,
@@ -67,5 +95,64 @@ class s3gFileWriterTests(unittest.TestCase):
         with self.assertRaises(makerbot_driver.Writer.NonBinaryModeFileError):
             self.w.check_binary_mode()
 
+
+class BufferedFileWriterTests(unittest.TestCase):
+    def setUp(self):
+        with tempfile.NamedTemporaryFile(delete=True, suffix='.x3g') as f:
+            self.the_file = f.name
+        condition = threading.Condition()
+        self.w = makerbot_driver.Writer.BufferedFileWriter(
+            open(self.the_file, 'wb'), condition, 8)
+
+    def tearDown(self):
+        self.w.close()
+        os.remove(self.the_file)
+
+    def read(self):
+        with open(self.the_file, 'rb') as f:
+            return f.read()
+
+    def test_buffers_until_full(self):
+        self.w.send_action_payload('abcde')
+        self.w.file.flush()
+        self.assertEqual('', self.read())
+        builder = makerbot_driver.Encoder.PacketBuilder('<BH', 100)
+        builder.pack(0x0201)
+        self.w.send_action_from_builder(builder)
+        self.w.file.flush()
+        self.assertEqual('abcde\x64\x01\x02', self.read())
+        self.w.send_action_payloads(bytearray('\x01\x02'), 1)
+        self.w.close()
+        self.assertEqual('abcde\x64\x01\x02\x01\x02', self.read())
+
+    def test_checksum_matches_file_complete(self):
+        data = ''.join(chr(i % 256) for i in range(1000))
+        for i in range(0, len(data), 10):
+            self.w.send_action_payload(data[i:i + 10])
+        self.w.write_checksum()
+        self.w.close()
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.x3g') as f:
+            f.write(data)
+        try:
+            makerbot_driver.Gcode.FileComplete().finish(f.name)
+            with open(f.name, 'rb') as expected:
+                self.assertEqual(expected.read(), self.read())
+        finally:
+            os.remove(f.name)
+
+    def test_external_stop(self):
+        self.w.external_stop = True
+        self.assertRaises(makerbot_driver.ExternalStopError,
+                          self.w.send_action_payload, 'asdf')
+
+    def test_write_data(self):
+        self.w.send_action_payload('abc')
+        self.w.write_data('defghijk')
+        self.w.write_data(bytearray('l'))
+        self.w.write_checksum()
+        self.w.close()
+        data = 'abcdefghijkl'
+        self.assertEqual(data + str(sum(bytearray(data))), self.read())
+
 if __name__ == "__main__":
     unittest.main()
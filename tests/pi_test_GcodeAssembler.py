@@ -260,5 +260,16 @@ class TestGcodeAssembler(unittest.TestCase):
                 expected_sequence.extend(
                     end_sequence_template[routine][recipe[routine]])
         self.assertEqual(expected_sequence, self.ga.assemble_sequence_from_recipe(recipe, template, the_order))
+
+    def test_assemble_sequences_with_variables(self):
+        start, end, variables = self.ga.assemble_recipe(tool_0=True, tool_1=True)
+        variables.update({'START_X': -110.5, 'START_Y': -74, 'START_Z': 0.2})
+        for assemble, recipe in ((self.ga.assemble_start_sequence, start),
+                                 (self.ga.assemble_end_sequence, end)):
+            expected = [makerbot_driver.Gcode.variable_substitute(str(line), variables)
+                        for line in assemble(recipe)]
+            self.assertEqual(expected, assemble(recipe, variables))
+            self.assertFalse(any('#' in line for line in expected))
+
 if __name__ == '__main__':
     unittest.main()
@@ -22,6 +22,16 @@ class s3gHelperFunctionTests(unittest.TestCase):
         self.assertRaises(makerbot_driver.Gcode.UnspecifiedAxisLocationError,
                           self.g.get_position)
 
+    def test_check_position_names_lost_axis(self):
+        self.g.position.SetPoint({'X': 0, 'Y': 0, 'Z': 0})
+        try:
+            self.g.check_position()
+            self.fail('UnspecifiedAxisLocationError not raised')
+        except makerbot_driver.Gcode.UnspecifiedAxisLocationError as e:
+            self.assertEqual('A', e.values['UnspecifiedAxis'])
+        self.g.position.SetPoint({'A': 0, 'B': 0})
+        self.g.check_position()
+
     def test_get_position_no_offsets(self):
         position = {
             'X': 0,
@@ -221,6 +231,51 @@ class MachineProfileWith4Axes(unittest.TestCase):
         self.assertEqual(expected_values, self.g.get_axes_values(key))
 
 
+class AxesVectorsTests(unittest.TestCase):
+    def setUp(self):
+        self.g = makerbot_driver.Gcode.GcodeStates()
+
+    def tearDown(self):
+        self.g = None
+
+    def test_no_profile(self):
+        self.assertEqual(None, self.g.steps_per_mm)
+        self.assertEqual(None, self.g.max_feedrates)
+
+    def test_set_on_profile_assignment(self):
+        self.g.profile = makerbot_driver.Profile('ReplicatorDual')
+        self.assertEqual(
+            tuple(self.g.get_axes_values('steps_per_mm')), self.g.steps_per_mm)
+        self.assertEqual(
+            tuple(self.g.get_axes_values('max_feedrate')), self.g.max_feedrates)
+        self.assertEqual(1 / 94.139704, self.g.mm_per_step[0])
+        self.assertEqual(1 / -96.275, self.g.mm_per_step[4])
+        self.assertEqual(
+            1.0 / self.g.max_feedrates[2], self.g.min_per_mm[2])
+
+    def test_missing_axis_reciprocal(self):
+        self.g.profile = makerbot_driver.Profile('ReplicatorSingle')
+        self.assertEqual(0, self.g.steps_per_mm[4])
+        self.assertEqual(0, self.g.mm_per_step[4])
+        self.assertEqual(0, self.g.min_per_mm[4])
+
+    def test_invalidated_by_new_profile(self):
+        self.g.profile = makerbot_driver.Profile('ReplicatorDual')
+        self.g.profile = makerbot_driver.Profile('ReplicatorSingle')
+        self.assertEqual(0, self.g.steps_per_mm[4])
+        self.g.profile = None
+        self.assertEqual(None, self.g.steps_per_mm)
+
+    def test_update_after_editing_profile(self):
+        profile = makerbot_driver.Profile('ReplicatorDual')
+        self.g.profile = profile
+        profile.values['axes']['X']['steps_per_mm'] = 100.0
+        self.assertEqual(94.139704, self.g.steps_per_mm[0])
+        self.g.update_axes_vectors()
+        self.assertEqual(100.0, self.g.steps_per_mm[0])
+        self.assertEqual(0.01, self.g.mm_per_step[0])
+
+
 class GetAxesFeedrateSPM(unittest.TestCase):
 
     def setUp(self):
@@ -8,6 +8,7 @@ import unittest
 import string
 import mock
 import math
+import threading
 
 import makerbot_driver
 
@@ -192,6 +193,61 @@ class ParseCommandTests(unittest.TestCase):
         for code in zip(expected_codes.values(), codes.values()):
             self.assertEquals(type(code[0]), type(code[1]))
 
+    def test_value_types(self):
+        command = 'G1 X-12 Y+3 Z1e2 A.5 B-0.25 E1E-1'
+        expected_codes = {
+            'G': 1,
+            'X': -12,
+            'Y': 3,
+            'Z': 100.0,
+            'A': 0.5,
+            'B': -0.25,
+            'E': 0.1,
+        }
+        codes, flags = makerbot_driver.Gcode.parse_command(command)
+        self.assertEqual(expected_codes, codes)
+        for code in 'GXY':
+            self.assertEqual(int, type(codes[code]))
+        for code in 'ZABE':
+            self.assertEqual(float, type(codes[code]))
+
+    def test_error_values(self):
+        try:
+            makerbot_driver.Gcode.parse_command('G1 X1 #2')
+            self.fail()
+        except makerbot_driver.Gcode.InvalidCodeError as e:
+            self.assertEqual({'InvalidCode': '#'}, e.values)
+        try:
+            makerbot_driver.Gcode.parse_command('G1 x1 X2')
+            self.fail()
+        except makerbot_driver.Gcode.RepeatCodeError as e:
+            self.assertEqual({'RepeatedCode': 'X'}, e.values)
+
+    def test_first_error_wins(self):
+        self.assertRaises(makerbot_driver.Gcode.RepeatCodeError,
+                          makerbot_driver.Gcode.parse_command, 'G1 G2 M3 ~')
+        self.assertRaises(makerbot_driver.Gcode.MultipleCommandCodeError,
+                          makerbot_driver.Gcode.parse_command, 'G1 M3 G2 ~')
+
+    def test_flag_then_code(self):
+        codes, flags = makerbot_driver.Gcode.parse_command('M18 X X1')
+        self.assertEqual({'M': 18, 'X': 1}, codes)
+        self.assertEqual(['X'], flags)
+
+    def test_unicode_letters(self):
+        codes, flags = makerbot_driver.Gcode.parse_command(u'G1 \xe9')
+        self.assertEqual({'G': 1}, codes)
+        self.assertEqual([u'\xc9'], flags)
+
+
+class ParseLineTests(unittest.TestCase):
+    def test_codes_flags_and_comment(self):
+        line = 'G162 x y F2500 (home xy; fast)\n'
+        codes, flags, comment = makerbot_driver.Gcode.parse_line(line)
+        self.assertEqual({'G': 162, 'F': 2500}, codes)
+        self.assertEqual(['X', 'Y'], flags)
+        self.assertEqual('home xy fast)\n', comment)
+
 
 class CheckForExtraneousCodesTests(unittest.TestCase):
     def test_no_codes(self):
@@ -368,6 +424,21 @@ class GetSafeFeedrateTests(unittest.TestCase):
             self.assertEquals(case[3], makerbot_driver.Gcode.get_safe_feedrate(
                 case[0], case[1], case[2]))
 
+    def test_good_result_with_reciprocals(self):
+        cases = [
+            [[13, 0, 0, 0, 0], [1, 0, 0, 0, 0], 10],
+            [[1, -2, 3, -4, 5], [1, 1, 1, 1, 1], 10],
+            [[1, -2, 3, -4, 5], [100, 2, 50, 3, 0], 10],
+            [[0, 2, 0, 0, 0], [0, 30, 0, 0, 0], 20],
+        ]
+        for displacement, max_feedrates, feedrate in cases:
+            min_per_mm = [1.0 / value if value else 0 for value in max_feedrates]
+            self.assertAlmostEqual(
+                makerbot_driver.Gcode.get_safe_feedrate(
+                    displacement, max_feedrates, feedrate),
+                makerbot_driver.Gcode.get_safe_feedrate(
+                    displacement, max_feedrates, feedrate, min_per_mm))
+
 
 class FindLongestAxisTests(unittest.TestCase):
     def test_reject_non_5d_list(self):
@@ -407,6 +478,11 @@ class CalculateDDASpeedTestsWithReplicatorDual(unittest.TestCase):
         for case in cases:
             self.assertAlmostEqual(case[0], case[1], 7)
 
+    def test_calculate_dda_speed_with_cached_reciprocals(self):
+        cases = generic_calculate_dda_speed_good_result(self.g, cached=True)
+        for case in cases:
+            self.assertAlmostEqual(case[0], case[1], 7)
+
 
 class DDASpeedTestsWithReplicatorSingle(unittest.TestCase):
     """Because the parser is desinged to support a 5d machine,
@@ -455,12 +531,14 @@ def generic_zero_move_test(state):
     )
 
 
-def generic_calculate_dda_speed_good_result(state):
+def generic_calculate_dda_speed_good_result(state, cached=False):
     """This function is used to test both replicator single and dual profiles
     while calculating DDA speeds
 
     @param state state: A state machine that houses either a replicator single or
         dual profile.
+    @param bool cached: If true, also pass the state's cached min_per_mm and
+        mm_per_step vectors
     """
     # TODO: These cases assume a replicator with specific steps_per_mm
     cases = [
@@ -474,13 +552,15 @@ def generic_calculate_dda_speed_good_result(state):
          2598.0762113533156],        # Multiple axis, forward motion
     ]
 
+    reciprocals = (state.min_per_mm, state.mm_per_step) if cached else ()
     for case in cases:
         dda_speed = makerbot_driver.Gcode.calculate_DDA_speed(
             case[0],
             case[1],
             case[2],
             state.get_axes_values('max_feedrate'),
-            state.get_axes_values('steps_per_mm'))
+            state.get_axes_values('steps_per_mm'),
+            *reciprocals)
         #Return a generator of the expected and calculated DDA speed
         yield case[3], dda_speed
 
@@ -585,6 +665,72 @@ class VariableSubstituteTest(unittest.TestCase):
         self.assertEqual(expected_line, makerbot_driver.Gcode.variable_substitute(line, environment))
 
 
+    def test_variable_that_starts_another(self):
+        environment = {
+            'TEMP': '220',
+            'TEMP_B': '230',
+            'T': '1',
+        }
+        line = 'M104 S#TEMP_B T#T\nM104 S#TEMP T0'
+        expected_line = 'M104 S230 T1\nM104 S220 T0'
+        self.assertEqual(expected_line, makerbot_driver.Gcode.variable_substitute(line, environment))
+
+    def test_unicode_environment(self):
+        environment = {u'TEMP': u'220'}
+        replaced_line = makerbot_driver.Gcode.variable_substitute('S#TEMP', environment)
+        self.assertEqual('S220', replaced_line)
+        self.assertTrue(isinstance(replaced_line, str))
+
+
+class CompiledEnvironmentTest(unittest.TestCase):
+
+    def test_cache(self):
+        environment = makerbot_driver.Gcode.CompiledEnvironment({'A': 1}, cache_size=2)
+        self.assertEqual('1', environment.substitute('#A'))
+        self.assertEqual('1 1', environment.substitute('#A #A'))
+        self.assertEqual('1', environment.substitute('#A'))
+        self.assertEqual('x', environment.substitute('x'))
+        # The least recently used line was dropped
+        self.assertEqual(['#A', 'x'], list(environment._cache))
+        with mock.patch.object(environment, '_variables') as variables:
+            self.assertEqual('1', environment.substitute('#A'))
+            self.assertFalse(variables.sub.called)
+
+    def test_undefined_variable_not_cached(self):
+        environment = makerbot_driver.Gcode.CompiledEnvironment({'A': 1})
+        for i in range(2):
+            self.assertRaises(makerbot_driver.Gcode.UndefinedVariableError,
+                              environment.substitute, '#A #B')
+        self.assertEqual([], list(environment._cache))
+
+    def test_compile_environment_reuses(self):
+        environment = makerbot_driver.Gcode.compile_environment({'A': 1, 'B': 'x'})
+        self.assertTrue(environment is
+                        makerbot_driver.Gcode.compile_environment({u'B': u'x', 'A': '1'}))
+        self.assertFalse(environment is
+                         makerbot_driver.Gcode.compile_environment({'A': 2, 'B': 'x'}))
+
+    def test_shared_between_threads(self):
+        environment = makerbot_driver.Gcode.CompiledEnvironment({'A': 1}, cache_size=8)
+        errors = []
+
+        def substitute(offset):
+            try:
+                for i in range(2000):
+                    line = '#A %i' % ((i + offset) % 20)
+                    if environment.substitute(line) != '1' + line[2:]:
+                        errors.append(line)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=substitute, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual(8, len(environment._cache))
+
+
 class calculate_homing_DDA_speed(unittest.TestCase):
     def test_calculate_homing_dda_speed_max_feedrates_empty(self):
         feedrate = 10
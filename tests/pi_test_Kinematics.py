@@ -0,0 +1,220 @@
+import os
+import sys
+lib_path = os.path.abspath('./')
+sys.path.insert(0, lib_path)
+
+import random
+import struct
+import tempfile
+import threading
+import unittest
+import mock
+
+import makerbot_driver
+
+Kinematics = makerbot_driver.Gcode.Kinematics
+
+
+def single_moves(start, targets, feedrates, max_feedrates, steps_per_mm):
+    """ Works out each move the way linear_interpolation does """
+    expected = ([], [], [], [])
+    current = start
+    for target, feedrate in zip(targets, feedrates):
+        expected[0].append(makerbot_driver.Gcode.multiply_vector(
+            target, steps_per_mm))
+        expected[1].append(makerbot_driver.Gcode.calculate_DDA_speed(
+            current, target, feedrate, max_feedrates, steps_per_mm))
+        distance = makerbot_driver.Gcode.calculate_euclidean_distance(
+            current[:3], target[:3])
+        if distance == 0:
+            distance = max(abs(current[3] - target[3]), abs(current[4] - target[4]))
+        expected[2].append(distance)
+        expected[3].append(makerbot_driver.Gcode.get_safe_feedrate(
+            makerbot_driver.Gcode.calculate_vector_difference(target, current),
+            max_feedrates, feedrate))
+        current = target
+    return expected
+
+
+class CalculateMovesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.start = [0, 0, 0, 0, 0]
+        self.targets = [
+            [10, 0, 0, 0, 0],
+            [10, 20, 0, 0, 0],
+            [10, 20, 0.3, 0, 0],
+            [10, 20, 0.3, 5, 0],
+            [-15.5, 3.25, 0.3, 5.7, 0],
+            [-15.5, 3.25, 0.3, 5.7, -2],
+            [40, 40, 40, 40, 40],
+        ]
+        self.feedrates = [1000, 6000, 1200, 1800, 3000, 100, 9000]
+        self.max_feedrates = [18000, 18000, 1170, 1600, 1600]
+        self.steps_per_mm = [94.1397, 94.1397, 400, -96.2752, -96.2752]
+        random.seed(0)
+        position = self.start
+        for i in range(200):
+            position = [p + random.uniform(-20, 20) for p in position]
+            self.targets.append(position)
+            self.feedrates.append(random.uniform(10, 20000))
+
+    def check(self, moves):
+        expected = single_moves(
+            self.start, self.targets, self.feedrates, self.max_feedrates,
+            self.steps_per_mm)
+        for got, want in zip(moves, expected):
+            self.assertEqual(len(want), len(got))
+            for g, w in zip(got, want):
+                if isinstance(w, list):
+                    for a, b in zip(g, w):
+                        self.assertAlmostEqual(b, a, places=6)
+                else:
+                    self.assertAlmostEqual(1.0, g / w, places=9)
+
+    def test_matches_single_moves_python(self):
+        with mock.patch.object(Kinematics, 'numpy', None):
+            moves = makerbot_driver.Gcode.calculate_moves(
+                self.start, self.targets, self.feedrates, self.max_feedrates,
+                self.steps_per_mm)
+        self.assertTrue(all(isinstance(m, list) for m in moves))
+        self.check(moves)
+
+    @unittest.skipIf(Kinematics.numpy is None, 'numpy is not installed')
+    def test_matches_single_moves_numpy(self):
+        moves = makerbot_driver.Gcode.calculate_moves(
+            self.start, Kinematics.numpy.array(self.targets), self.feedrates,
+            self.max_feedrates, self.steps_per_mm)
+        self.assertEqual((len(self.targets), 5), moves[0].shape)
+        self.check(moves)
+
+    def test_single_feedrate(self):
+        for numpy in (None, Kinematics.numpy):
+            with mock.patch.object(Kinematics, 'numpy', numpy):
+                moves = makerbot_driver.Gcode.calculate_moves(
+                    self.start, self.targets[:2], 1000, self.max_feedrates,
+                    self.steps_per_mm)
+            self.assertEqual([1000, 1000], list(moves[3]))
+
+    def test_no_moves(self):
+        for numpy in (None, Kinematics.numpy):
+            with mock.patch.object(Kinematics, 'numpy', numpy):
+                moves = makerbot_driver.Gcode.calculate_moves(
+                    self.start, [], [], self.max_feedrates, self.steps_per_mm)
+            self.assertEqual([0, 0, 0, 0], [len(m) for m in moves])
+
+    def test_zero_length_move(self):
+        targets = [[1, 0, 0, 0, 0], [1, 0, 0, 0, 0]]
+        for numpy in (None, Kinematics.numpy):
+            with mock.patch.object(Kinematics, 'numpy', numpy):
+                try:
+                    makerbot_driver.Gcode.calculate_moves(
+                        self.start, targets, 100, self.max_feedrates,
+                        self.steps_per_mm)
+                    self.fail('VectorLengthZeroError not raised')
+                except makerbot_driver.Gcode.VectorLengthZeroError as e:
+                    self.assertEqual(1, e.values['MoveIndex'])
+
+    def test_invalid_feedrate(self):
+        for numpy in (None, Kinematics.numpy):
+            with mock.patch.object(Kinematics, 'numpy', numpy):
+                try:
+                    makerbot_driver.Gcode.calculate_moves(
+                        self.start, self.targets[:3], [100, 100, 0],
+                        self.max_feedrates, self.steps_per_mm)
+                    self.fail('InvalidFeedrateError not raised')
+                except makerbot_driver.Gcode.InvalidFeedrateError as e:
+                    self.assertEqual(2, e.values['MoveIndex'])
+
+    def test_bad_lengths(self):
+        for numpy in (None, Kinematics.numpy):
+            with mock.patch.object(Kinematics, 'numpy', numpy):
+                self.assertRaises(
+                    makerbot_driver.PointLengthError,
+                    makerbot_driver.Gcode.calculate_moves,
+                    self.start, [[1, 2, 3, 4]], 100, self.max_feedrates,
+                    self.steps_per_mm)
+                self.assertRaises(
+                    makerbot_driver.ParameterError,
+                    makerbot_driver.Gcode.calculate_moves,
+                    self.start, self.targets[:2], [100], self.max_feedrates,
+                    self.steps_per_mm)
+        self.assertRaises(
+            makerbot_driver.PointLengthError,
+            makerbot_driver.Gcode.calculate_moves,
+            [0, 0, 0], self.targets, 100, self.max_feedrates, self.steps_per_mm)
+
+
+class QueueMovesTests(unittest.TestCase):
+
+    def test_queues_all_moves_at_once(self):
+        max_feedrates = [18000, 18000, 1170, 1600, 1600]
+        steps_per_mm = [94.1397, 94.1397, 400, -96.2752, -96.2752]
+        targets = [[10, 0, 0, 0, 0], [10, 20, 0, 0, 0]]
+        for numpy in (None, Kinematics.numpy):
+            s3g = mock.Mock()
+            with mock.patch.object(Kinematics, 'numpy', numpy):
+                safe_feedrates = makerbot_driver.Gcode.queue_moves(
+                    s3g, [0, 0, 0, 0, 0], targets, 6000, max_feedrates,
+                    steps_per_mm)
+            self.assertEqual(1, s3g.queue_extended_points.call_count)
+            points, dda_rates, distances, feedrates = \
+                s3g.queue_extended_points.call_args[0]
+            self.assertEqual([10, 20], list(distances))
+            self.assertEqual([100, 100], list(feedrates))
+            self.assertEqual([6000, 6000], list(safe_feedrates))
+
+    def test_rounds_stepped_points(self):
+        max_feedrates = [18000, 18000, 1170, 1600, 1600]
+        steps_per_mm = [100, 100, 400, -96.2752, -96.2752]
+        targets = [[0.006, -0.006, 0.001, 0, 0], [0.004, 0.024, 0.001, 0, 0]]
+        for numpy in (None, Kinematics.numpy):
+            s3g = mock.Mock()
+            with mock.patch.object(Kinematics, 'numpy', numpy):
+                makerbot_driver.Gcode.queue_moves(
+                    s3g, [0, 0, 0, 0, 0], targets, 6000, max_feedrates,
+                    steps_per_mm)
+            points = s3g.queue_extended_points.call_args[0][0]
+            self.assertEqual(
+                [[1, -1, 0, 0, 0], [0, 2, 0, 0, 0]],
+                [[int(value) for value in point] for point in points])
+            for point in points:
+                for value in point:
+                    self.assertEqual(value, int(value))
+
+    def write_points(self, queue):
+        with tempfile.NamedTemporaryFile(delete=True, suffix='.x3g') as f:
+            path = f.name
+        r = makerbot_driver.s3g(makerbot_driver.Writer.FileWriter(
+            open(path, 'wb'), threading.Condition()))
+        r.set_print_to_file_type('x3g')
+        queue(r)
+        r.writer.close()
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.remove(path)
+        return data
+
+    def test_matches_queue_extended_point(self):
+        max_feedrates = [18000, 18000, 1170, 1600, 1600]
+        steps_per_mm = [94.1, 94.1, 400, -96.2752, -96.2752]
+        start = [0, 0, 0, 0, 0]
+        targets = [[10, 0, 0, 0, 0], [10, 20, 0.0049, 0, 0.0052]]
+
+        def queue_single(r):
+            expected = single_moves(
+                start, targets, [6000, 6000], max_feedrates, steps_per_mm)
+            for point, dda_speed, distance, feedrate in zip(*expected):
+                point = [int(round(value)) for value in point]
+                r.queue_extended_point(point, dda_speed, distance, feedrate / 60.0)
+        expected = self.write_points(queue_single)
+        for numpy in (None, Kinematics.numpy):
+            with mock.patch.object(Kinematics, 'numpy', numpy):
+                data = self.write_points(lambda r: makerbot_driver.Gcode.queue_moves(
+                    r, start, targets, 6000, max_feedrates, steps_per_mm))
+            self.assertEqual(expected, data)
+            # dda_rate, in steps per second, follows the 5 position steps
+            self.assertEqual(9410, struct.unpack('<I', data[21:25])[0])
+
+if __name__ == '__main__':
+    unittest.main()
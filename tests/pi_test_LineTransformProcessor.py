@@ -3,6 +3,7 @@ import sys
 lib_path = os.path.abspath('./')
 sys.path.insert(0, lib_path)
 
+import re
 import unittest
 import mock
 
@@ -36,6 +37,78 @@ class TestLineTransformProcessor(unittest.TestCase):
             result = self.p._transform_code(case[0])
             self.assertEqual(result, case[1])
 
+    def test_transform_code_precedence(self):
+        # Patterns that overlap go in code_map order, first match wins
+        self.p.code_map.update({
+            "G1": lambda match: "G1",
+            "G1 X": lambda match: "G1 X",
+            "G": lambda match: "G",
+            "[^;]*X": lambda match: "X",
+        })
+        expected = None
+        for key in self.p.code_map:
+            if re.match(key, "G1 X0"):
+                expected = [self.p.code_map[key](None)]
+                break
+        self.assertEqual(expected, self.p._transform_code("G1 X0"))
+
+    def test_transform_code_groups(self):
+        # Each replace-function sees the groups of its own pattern
+        self.p.code_map.update({
+            re.compile("[^(;]*[gG]1 (X)"): lambda match: match.group(1),
+            re.compile("[^(;]*[mM](10)(4)"): lambda match: match.group(1, 2),
+        })
+        self.assertEqual(["X"], self.p._transform_code("G1 X0"))
+        self.assertEqual([("10", "4")], self.p._transform_code("M104 S220"))
+        self.assertEqual(["G92 X0"], self.p._transform_code("G92 X0"))
+
+    def test_transform_code_code_map_changed(self):
+        self.p.code_map.update({"G1": lambda match: "G1_TRANSFORMED"})
+        self.assertEqual(["G1_TRANSFORMED"], self.p._transform_code("G1 X0"))
+        self.p.code_map["G1"] = lambda match: "G1_CHANGED"
+        self.assertEqual(["G1_CHANGED"], self.p._transform_code("G1 X0"))
+        del self.p.code_map["G1"]
+        self.assertEqual(["G1 X0"], self.p._transform_code("G1 X0"))
+
+    def test_transform_code_unjoinable_patterns(self):
+        # A backreference would refer to the wrong group once joined
+        self.p.code_map.update({
+            "G1": lambda match: "G1_TRANSFORMED",
+            r"M(\d)\1": lambda match: match.group(1),
+        })
+        self.assertEqual(None, self.p._compile_code_map().join((0, 1)))
+        self.assertEqual(["G1_TRANSFORMED"], self.p._transform_code("G1 X0"))
+        self.assertEqual(["7"], self.p._transform_code("M77"))
+        self.assertEqual(["M78"], self.p._transform_code("M78"))
+
+    def test_transform_code_command_words(self):
+        self.p.code_map.update({"G1": lambda match: "G1_TRANSFORMED"})
+        self.p.command_words = ['M101']
+        cases = [
+            ["G1 X0", ["G1 X0"]],
+            ["G1 X0 M101", ["G1_TRANSFORMED"]],
+            ["G1 X0 m101", ["G1_TRANSFORMED"]],
+            # Words in comments don't count
+            ["G1 X0 (M101)", ["G1 X0 (M101)"]],
+            ["G1 X0; M101", ["G1 X0; M101"]],
+            ["G1 X0 M1010", ["G1 X0 M1010"]],
+        ]
+        for case in cases:
+            self.assertEqual(case[1], self.p._transform_code(case[0]))
+        self.p.command_words = None
+        self.assertEqual(["G1_TRANSFORMED"], self.p._transform_code("G1 X0"))
+
+    def test_transform_code_command_words_per_key(self):
+        self.p.code_map.update({
+            "G1": lambda match: "G1_TRANSFORMED",
+            "[^(;]*M101": lambda match: "M101_TRANSFORMED",
+        })
+        self.p._code_map_command_words["G1"] = ['G1']
+        self.p.command_words = ['M101']
+        self.assertEqual(["G1_TRANSFORMED"], self.p._transform_code("G1 X0"))
+        self.assertEqual(["M101_TRANSFORMED"], self.p._transform_code("M101"))
+        self.assertEqual(["G0 X0"], self.p._transform_code("G0 X0"))
+
     def test_process_file_no_code_map(self):
         lines = [
             "G0 X0 Y0 Z0",
@@ -71,6 +144,22 @@ class TestLineTransformProcessor(unittest.TestCase):
         got_output = self.p.process_gcode(lines)
         self.assertEqual(got_output, expected_output)
 
+    def test_iter_process(self):
+        def _transform_g1(match):
+            return ["G1_A", "G1_B"]
+        self.p.code_map.update({"G1": _transform_g1, "G2": lambda match: ""})
+        gcodes = ["G0 X0", "G1 X1", "G2 X2", "G3 X3"]
+        output = self.p.iter_process(iter(gcodes))
+        self.assertEqual("G0 X0", next(output))
+        self.assertEqual(["G1_A", "G1_B", "G3 X3"], list(output))
+        self.assertEqual(self.p.process_gcode(gcodes),
+                         list(self.p.iter_process(gcodes)))
+
+    def test_iter_process_external_stop(self):
+        self.p.set_external_stop()
+        self.assertRaises(makerbot_driver.ExternalStopError,
+                          list, self.p.iter_process(["G1 X0"]))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -3,6 +3,7 @@ import sys
 lib_path = os.path.abspath('./')
 sys.path.insert(0, lib_path)
 
+import struct
 import unittest
 import makerbot_driver
 
@@ -37,6 +38,50 @@ class PacketEncodeTests(unittest.TestCase):
         assert packet[6] == makerbot_driver.Encoder.CalculateCRC(payload)
 
 
+class PacketBuilderTests(unittest.TestCase):
+    def test_packet_matches_encode_payload(self):
+        builder = makerbot_driver.Encoder.PacketBuilder('<BiiiiiI', 139)
+        builder.pack(1, -2, 3, -4, 5, 1000)
+        payload = struct.pack('<BiiiiiI', 139, 1, -2, 3, -4, 5, 1000)
+        self.assertEqual(payload, builder.payload())
+        self.assertEqual(
+            makerbot_driver.Encoder.encode_payload(payload), builder.packet())
+
+    def test_packet_buffer_reused(self):
+        builder = makerbot_driver.Encoder.PacketBuilder('<BH', 1)
+        builder.pack(5)
+        first = builder.packet()
+        builder.pack(6)
+        self.assertTrue(first is builder.packet())
+        self.assertEqual(
+            makerbot_driver.Encoder.encode_payload(struct.pack('<BH', 1, 6)),
+            first)
+
+    def test_pack_into(self):
+        builder = makerbot_driver.Encoder.PacketBuilder('<BH', 1)
+        buf = bytearray(builder.packet_length * 2)
+        offset = builder.pack_packet_into(buf, 0, 5)
+        self.assertEqual(builder.packet_length, offset)
+        offset = builder.pack_packet_into(buf, offset, 6)
+        self.assertEqual(len(buf), offset)
+        self.assertEqual(
+            makerbot_driver.Encoder.encode_payload(struct.pack('<BH', 1, 5)) +
+            makerbot_driver.Encoder.encode_payload(struct.pack('<BH', 1, 6)),
+            buf)
+        buf = bytearray(builder.payload_length * 2)
+        offset = builder.pack_payload_into(buf, 0, 5)
+        builder.pack_payload_into(buf, offset, 6)
+        self.assertEqual(struct.pack('<BHBH', 1, 5, 1, 6), buf)
+
+    def test_payload_too_long(self):
+        self.assertRaises(makerbot_driver.PacketLengthError,
+                          makerbot_driver.Encoder.PacketBuilder, '<B32s', 1)
+
+    def test_bad_arguments(self):
+        builder = makerbot_driver.Encoder.PacketBuilder('<BH', 1)
+        self.assertRaises(struct.error, builder.pack, 1, 2)
+
+
 class PacketDecodeTests(unittest.TestCase):
     def test_undersize_packet(self):
         packet = bytearray('abc')
@@ -86,18 +131,18 @@ class PacketStreamDecoderTests(unittest.TestCase):
         self.s = None
 
     def test_starts_in_wait_for_header_mode(self):
-        assert self.s.state == 'WAIT_FOR_HEADER'
+        assert self.s.state == makerbot_driver.Encoder.PacketStreamDecoder.WAIT_FOR_HEADER
         assert len(self.s.payload) == 0
         assert self.s.expected_length == 0
 
     def test_reject_bad_header(self):
         self.assertRaises(
             makerbot_driver.PacketHeaderError, self.s.parse_byte, 0x00)
-        assert self.s.state == 'WAIT_FOR_HEADER'
+        assert self.s.state == makerbot_driver.Encoder.PacketStreamDecoder.WAIT_FOR_HEADER
 
     def test_accept_header(self):
         self.s.parse_byte(makerbot_driver.header)
-        assert self.s.state == 'WAIT_FOR_LENGTH'
+        assert self.s.state == makerbot_driver.Encoder.PacketStreamDecoder.WAIT_FOR_LENGTH
 
     def test_reject_bad_size(self):
         self.s.parse_byte(makerbot_driver.header)
@@ -108,7 +153,7 @@ class PacketStreamDecoderTests(unittest.TestCase):
     def test_accept_size(self):
         self.s.parse_byte(makerbot_driver.header)
         self.s.parse_byte(makerbot_driver.maximum_payload_length)
-        assert(self.s.state == 'WAIT_FOR_DATA')
+        assert(self.s.state == makerbot_driver.Encoder.PacketStreamDecoder.WAIT_FOR_DATA)
         assert(
             self.s.expected_length == makerbot_driver.maximum_payload_length)
 
@@ -179,7 +224,7 @@ class PacketStreamDecoderTests(unittest.TestCase):
         for i in range(0, len(payload)):
             self.s.parse_byte(payload[i])
         self.s.parse_byte(makerbot_driver.Encoder.CalculateCRC(payload))
-        assert(self.s.state == 'PAYLOAD_READY')
+        assert(self.s.state == makerbot_driver.Encoder.PacketStreamDecoder.PAYLOAD_READY)
         assert(self.s.payload == payload)
 
     def test_accept_packet_ignore_response_code(self):
@@ -192,8 +237,126 @@ class PacketStreamDecoderTests(unittest.TestCase):
         for i in range(0, len(payload)):
             self.s.parse_byte(payload[i])
         self.s.parse_byte(makerbot_driver.Encoder.CalculateCRC(payload))
-        assert(self.s.state == 'PAYLOAD_READY')
+        assert(self.s.state == makerbot_driver.Encoder.PacketStreamDecoder.PAYLOAD_READY)
         assert(self.s.payload == payload)
 
+class PacketStreamDecoderParseBytesTests(unittest.TestCase):
+    def setUp(self):
+        self.s = makerbot_driver.Encoder.PacketStreamDecoder()
+
+    def test_parse_bytes_whole_packet(self):
+        payload = bytearray('abcde')
+        self.s.parse_bytes(makerbot_driver.Encoder.encode_payload(payload))
+        self.assertEqual(
+            makerbot_driver.Encoder.PacketStreamDecoder.PAYLOAD_READY, self.s.state)
+        self.assertEqual(payload, self.s.payload)
+
+    def test_parse_bytes_in_pieces(self):
+        payload = bytearray('abcde')
+        packet = makerbot_driver.Encoder.encode_payload(payload)
+        self.s.parse_bytes(packet[:2])
+        self.s.parse_bytes(str(packet[2:5]))
+        self.assertEqual(
+            makerbot_driver.Encoder.PacketStreamDecoder.WAIT_FOR_DATA, self.s.state)
+        self.s.parse_bytes(packet[5:])
+        self.assertEqual(payload, self.s.payload)
+
+    def test_parse_bytes_bad_crc(self):
+        packet = makerbot_driver.Encoder.encode_payload('abcde')
+        packet[-1] += 1
+        self.assertRaises(
+            makerbot_driver.PacketCRCError, self.s.parse_bytes, packet)
+
+    def test_parse_bytes_bad_header(self):
+        self.assertRaises(
+            makerbot_driver.PacketHeaderError, self.s.parse_bytes, 'abc')
+
+
+class PacketStreamDecoderFeedTests(unittest.TestCase):
+    def setUp(self):
+        self.s = makerbot_driver.Encoder.PacketStreamDecoder()
+
+    def tearDown(self):
+        self.s = None
+
+    def test_feed_single_packet(self):
+        payload = bytearray('abcde')
+        packet = makerbot_driver.Encoder.encode_payload(payload)
+        self.assertEqual([payload], self.s.feed(packet))
+        self.assertEqual(
+            makerbot_driver.Encoder.PacketStreamDecoder.WAIT_FOR_HEADER, self.s.state)
+
+    def test_feed_multiple_packets(self):
+        payloads = [bytearray('abc'), bytearray('de'), bytearray('fghij')]
+        data = bytearray()
+        for payload in payloads:
+            data.extend(makerbot_driver.Encoder.encode_payload(payload))
+        self.assertEqual(payloads, self.s.feed(data))
+
+    def test_feed_empty(self):
+        self.assertEqual([], self.s.feed(''))
+
+    def test_feed_memoryview(self):
+        payload = bytearray('abcde')
+        packet = makerbot_driver.Encoder.encode_payload(payload)
+        self.assertEqual([payload], self.s.feed(memoryview(packet)))
+
+    def test_feed_split_packet(self):
+        payload = bytearray('abcde')
+        packet = makerbot_driver.Encoder.encode_payload(payload)
+        self.assertEqual([], self.s.feed(packet[:1]))
+        self.assertEqual(
+            makerbot_driver.Encoder.PacketStreamDecoder.WAIT_FOR_LENGTH, self.s.state)
+        self.assertEqual([], self.s.feed(packet[1:4]))
+        self.assertEqual(
+            makerbot_driver.Encoder.PacketStreamDecoder.WAIT_FOR_DATA, self.s.state)
+        self.assertEqual(len(payload), self.s.expected_length)
+        self.assertEqual([], self.s.feed(packet[4:-1]))
+        self.assertEqual(
+            makerbot_driver.Encoder.PacketStreamDecoder.WAIT_FOR_CRC, self.s.state)
+        self.assertEqual([payload], self.s.feed(packet[-1:]))
+
+    def test_feed_byte_at_a_time(self):
+        payload = bytearray('abcde')
+        packet = makerbot_driver.Encoder.encode_payload(payload)
+        payloads = []
+        for byte in packet:
+            payloads.extend(self.s.feed(chr(byte)))
+        self.assertEqual([payload], payloads)
+
+    def test_feed_skips_noise(self):
+        payload = bytearray('abcde')
+        data = bytearray('xyz')
+        data.extend(makerbot_driver.Encoder.encode_payload(payload))
+        self.assertEqual([payload], self.s.feed(data))
+        self.assertEqual(3, self.s.noise_bytes)
+
+    def test_feed_bad_length_field(self):
+        data = bytearray()
+        data.append(makerbot_driver.header)
+        data.append(makerbot_driver.maximum_payload_length + 1)
+        self.assertRaises(
+            makerbot_driver.PacketLengthFieldError, self.s.feed, data)
+
+    def test_feed_bad_crc_keeps_stream(self):
+        good_payload = bytearray('abc')
+        bad_packet = makerbot_driver.Encoder.encode_payload('de')
+        bad_packet[-1] += 1
+        next_payload = bytearray('fgh')
+        data = bytearray()
+        data.extend(makerbot_driver.Encoder.encode_payload(good_payload))
+        data.extend(bad_packet)
+        data.extend(makerbot_driver.Encoder.encode_payload(next_payload))
+        self.assertRaises(makerbot_driver.PacketCRCError, self.s.feed, data)
+        self.assertEqual([good_payload, next_payload], self.s.feed(''))
+
+    def test_reset(self):
+        packet = makerbot_driver.Encoder.encode_payload('abcde')
+        self.s.feed(packet[:4])
+        self.s.reset()
+        self.assertEqual(
+            makerbot_driver.Encoder.PacketStreamDecoder.WAIT_FOR_HEADER, self.s.state)
+        self.assertEqual([], self.s.feed(packet[4:]))
+
 if __name__ == "__main__":
     unittest.main()
@@ -246,6 +246,16 @@ class test_linear_interpolation(unittest.TestCase):
         self.assertEqual(expected_feedrate_mm_sec, actual_params[3])
         self.assertEqual(self.g.state.values['feedrate'], code_feedrate)
 
+    def test_linear_interpolation_tells_estimator(self):
+        self.g.estimator = mock.Mock()
+        self.g.linear_interpolation({'X': 3, 'Y': 4, 'A': 1, 'F': 100}, [], '')
+        self.g.linear_interpolation({'F': 200}, [], '')
+        self.assertEqual(1, self.g.estimator.add_move.call_count)
+        start, end, distance, minutes = self.g.estimator.add_move.call_args[0]
+        self.assertEqual([3, 4, 0, 1, 0], end)
+        self.assertEqual(5, distance)
+        self.assertEqual(self.g.last_move_minutes, minutes)
+
     def test_linear_interpolation_a_code_doesnt_throw_conflicting_codes_error(self):
         codes = {
             'A': 10,
@@ -290,6 +300,19 @@ class test_linear_interpolation(unittest.TestCase):
         self.assertEqual(e_distance, actual_params[2])
         self.assertEqual(expected_feedrate_mm_sec, actual_params[3])
 
+    def test_linear_interpolation_records_move_minutes(self):
+        self.assertEqual(0, self.g.last_move_minutes)
+        codes = {'X': 30, 'Y': 40, 'F': 100}
+        self.g.linear_interpolation(codes, [], '')
+        self.assertAlmostEqual(0.5, self.g.last_move_minutes)
+
+    def test_linear_interpolation_failed_move_keeps_move_minutes(self):
+        self.mock.queue_extended_point.side_effect = makerbot_driver.BufferOverflowError
+        codes = {'X': 30, 'Y': 40, 'F': 100}
+        self.assertRaises(makerbot_driver.BufferOverflowError,
+                          self.g.linear_interpolation, codes, [], '')
+        self.assertEqual(0, self.g.last_move_minutes)
+
 
 class gcodeTests(unittest.TestCase):
     def setUp(self):
@@ -373,6 +396,71 @@ class gcodeTests(unittest.TestCase):
         self.assertRaises(makerbot_driver.Gcode.InvalidCodeError,
                           self.g.execute_line, command)
 
+    def test_g1_extraneous_code_and_flag(self):
+        for command, bad_code in [('G1 X1 Q1', 'Q'), ('G1 X1 Y', 'Y')]:
+            try:
+                self.g.execute_line(command)
+            except makerbot_driver.Gcode.InvalidCodeError as e:
+                self.assertEqual(bad_code, e.values['InvalidCodes'])
+            else:
+                self.fail('ExpectedException not thrown')
+        self.assertFalse(self.mock.queue_extended_point.called)
+
+    def test_variable_substitute_only_with_variables(self):
+        self.g.environment = {'TEMP': 220}
+        with mock.patch('makerbot_driver.Gcode.compile_environment') as compile_environment:
+            compile_environment.return_value.substitute.return_value = 'M104 S220 T0'
+            self.g.execute_line('M104 S200 T0')
+            self.assertFalse(compile_environment.called)
+            self.g.execute_line('M104 S#TEMP T0')
+            compile_environment.assert_called_once_with({'TEMP': 220})
+            compile_environment.return_value.substitute.assert_called_once_with(
+                'M104 S#TEMP T0')
+        self.mock.set_toolhead_temperature.assert_called_with(0, 220)
+
+    def test_environment_changes(self):
+        self.g.environment = {'TEMP': 220}
+        self.g.execute_line('M104 S#TEMP T0')
+        self.mock.set_toolhead_temperature.assert_called_with(0, 220)
+        self.g.environment['TEMP'] = 230
+        self.g.execute_line('M104 S#TEMP T0')
+        self.mock.set_toolhead_temperature.assert_called_with(0, 230)
+        self.g.environment = {'TEMP': 240}
+        self.g.execute_line('M104 S#TEMP T0')
+        self.mock.set_toolhead_temperature.assert_called_with(0, 240)
+        del self.g.environment['TEMP']
+        self.assertRaises(makerbot_driver.Gcode.UndefinedVariableError,
+                          self.g.execute_line, 'M104 S#TEMP T0')
+
+    def test_environment_compiled_once_until_changed(self):
+        self.g.environment = {'TEMP': 220}
+        with mock.patch('makerbot_driver.Gcode.compile_environment') as compile_environment:
+            compile_environment.return_value.substitute.return_value = 'M104 S220 T0'
+            for i in range(3):
+                self.g.execute_line('M104 S#TEMP T0')
+            self.assertEqual(1, compile_environment.call_count)
+            self.g.environment.update({'TEMP': 230})
+            self.g.execute_line('M104 S#TEMP T0')
+            self.g.environment.setdefault('BED', 110)
+            self.g.environment.pop('BED')
+            self.g.execute_line('M104 S#TEMP T0')
+            self.assertEqual(3, compile_environment.call_count)
+
+    def test_environment_assignment_copied(self):
+        environment = {'TEMP': 220}
+        self.g.environment = environment
+        self.assertFalse(self.g.environment is environment)
+        self.assertEqual(environment, self.g.environment)
+
+    def test_compile_instructions(self):
+        dwell = mock.Mock()
+        self.g.GCODE_INSTRUCTIONS[4] = [dwell, 'PQ', '']
+        self.g.execute_line('G4 P10')
+        self.assertFalse(dwell.called)
+        self.g.compile_instructions()
+        self.g.execute_line('G4 P10 Q1')
+        dwell.assert_called_once_with({'G': 4, 'P': 10, 'Q': 1}, [], '')
+
     def test_disable_axes(self):
         flags = ['A', 'B', 'X', 'Y', 'Z']
 
@@ -583,6 +671,56 @@ class gcodeTests(unittest.TestCase):
         self.g.dwell(codes, [], '')
         self.mock.delay.assert_called_once_with(d)
 
+    def test_add_sink(self):
+        sink = mock.Mock()
+        self.g.add_sink(sink)
+        self.assertEqual([self.mock, sink], self.g.s3g.sinks)
+        other = mock.Mock()
+        self.g.add_sink(other)
+        self.assertEqual([self.mock, sink, other], self.g.s3g.sinks)
+        self.g.dwell({'P': 10}, [], '')
+        self.mock.delay.assert_called_once_with(10000)
+        sink.delay.assert_called_once_with(10000)
+        other.delay.assert_called_once_with(10000)
+
+    def test_checkpoint_and_restore(self):
+        self.g.state.position.SetPoint({'X': 0, 'Y': 0, 'Z': 0, 'A': 0, 'B': 0})
+        self.g.state.values['feedrate'] = 100
+        self.g.state.values['tool_index'] = 1
+        self.g.environment['TEMP'] = 220
+        self.g.line_number = 7
+        self.g.state.position.B = None
+        checkpoint = self.g.checkpoint(1234)
+        self.assertEqual(1234, checkpoint.offset)
+        self.assertEqual([0, 0, 0, 0, 0], checkpoint.position)
+
+        self.g.state.set_position({'X': 5, 'A': 1, 'B': 2})
+        self.g.state.values['tool_index'] = 0
+        self.g.environment['TEMP'] = 230
+        self.g.line_number = 8
+        self.assertEqual(100, checkpoint.values['feedrate'])
+        self.assertEqual({'TEMP': 220}, checkpoint.environment)
+
+        self.g.restore(checkpoint)
+        self.assertEqual([0, 0, 0, 0, None], self.g.state.position.ToList())
+        self.assertEqual({'feedrate': 100, 'tool_index': 1}, self.g.state.values)
+        self.assertEqual({'TEMP': 220}, self.g.environment)
+        self.assertEqual(7, self.g.line_number)
+        # The checkpoint isn't changed by carrying on from it
+        self.g.state.values['feedrate'] = 200
+        self.assertEqual(100, checkpoint.values['feedrate'])
+
+    def test_add_sink_without_s3g(self):
+        self.g.s3g = None
+        sink = mock.Mock()
+        self.g.add_sink(sink)
+        self.assertEqual([sink], self.g.s3g.sinks)
+
+    def test_dwell_tells_estimator(self):
+        self.g.estimator = mock.Mock()
+        self.g.dwell({'P': 3000}, [], '')
+        self.g.estimator.add_dwell.assert_called_once_with(0.05)
+
     def test_set_toolhead_temperature_all_codes_accounted_for(self):
         codes = 'ST'
         flags = ''
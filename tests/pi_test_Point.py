@@ -65,6 +65,43 @@ class TestPoint(unittest.TestCase):
         self.assertEqual(point.ToList(), copy_point.ToList())
         copy_point.X = 50
         self.assertNotEqual(point.ToList(), copy_point.ToList())
+    def test_lost_bitmask(self):
+        p = makerbot_driver.Gcode.Point()
+        self.assertEqual(makerbot_driver.Gcode.ALL_AXES_LOST, p.lost)
+        self.assertEqual('X', p.first_lost_axis())
+        p.SetPoint({'X': 1, 'Y': 2, 'Z': 3})
+        self.assertEqual(0x18, p.lost)
+        self.assertEqual('A', p.first_lost_axis())
+        p.A = 4
+        p.B = 5
+        self.assertEqual(0, p.lost)
+        self.assertEqual(None, p.first_lost_axis())
+        p.Y = None
+        self.assertEqual(0x02, p.lost)
+        self.assertEqual([1, None, 3, 4, 5], p.ToList())
+
+    def test_set_point_in_place(self):
+        p = makerbot_driver.Gcode.Point()
+        values = p.values
+        p.SetPoint({'X': 1, 'B': 5})
+        self.assertTrue(values is p.values)
+        self.assertEqual(1, values[0])
+        self.assertEqual(5, values[4])
+
+    def test_copy_from(self):
+        p = makerbot_driver.Gcode.Point()
+        p.SetPoint({'X': 1, 'Y': 2})
+        other = makerbot_driver.Gcode.Point()
+        values = other.values
+        other.copy_from(p)
+        self.assertTrue(values is other.values)
+        self.assertEqual(p.ToList(), other.ToList())
+        other.X = 10
+        self.assertEqual(1, p.X)
+
+    def test_slots(self):
+        p = makerbot_driver.Gcode.Point()
+        self.assertRaises(AttributeError, setattr, p, 'Q', 1)
 
 if __name__ == '__main__':
     unittest.main()
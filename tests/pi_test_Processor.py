@@ -13,6 +13,7 @@ class TestProcessor(unittest.TestCase):
         cases = [
             ['G92 X#X Y#Y Z#Z A#A B#B\n', 'G92 X0 Y0 Z0 A0 B0\n'],
             ['M104 T#TOOL_0 S#TOOL_TEMP\n', 'M104 T0 S0\n'],
+            ['M104 T#T S#TEMP\n', 'M104 T0 S0\n'],
         ]
         for case in cases:
             result = Processor.remove_variables(case[0])
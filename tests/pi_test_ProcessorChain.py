@@ -0,0 +1,62 @@
+import os
+import sys
+lib_path = os.path.abspath('./')
+sys.path.insert(0, lib_path)
+
+import unittest
+
+import makerbot_driver
+
+
+class TestProcessorChain(unittest.TestCase):
+
+    def setUp(self):
+        self.chain = makerbot_driver.GcodeProcessors.ProcessorChain([
+            makerbot_driver.GcodeProcessors.RemoveRepGStartEndGcode(),
+            makerbot_driver.GcodeProcessors.RpmProcessor(),
+        ])
+
+    def tearDown(self):
+        self.chain = None
+
+    def test_process_gcode(self):
+        gcodes = [
+            '(**** start.gcode)\n',
+            'M104 S220\n',
+            '(end of start.gcode)\n',
+            'M101\n',
+            'G1 X0\n',
+            '(**** End.gcode)\n',
+            'M18\n',
+            '(end End.gcode)\n',
+            'G1 X1\n',
+        ]
+        self.assertEqual(['G1 X0\n', 'G1 X1\n'], self.chain.process_gcode(gcodes))
+
+    def test_iter_process_lazy(self):
+        def gcodes():
+            yield 'M101\n'
+            yield 'G1 X0\n'
+            raise AssertionError('read too far')
+        lines = self.chain.iter_process(gcodes())
+        self.assertEqual('G1 X0\n', next(lines))
+
+    def test_append(self):
+        self.chain.append(makerbot_driver.GcodeProcessors.ProgressProcessor())
+        expected = ['G1 X0\n', 'M73 P50 (progress (50%))\n',
+                    'G1 X1\n', 'M73 P100 (progress (100%))\n']
+        self.assertEqual(expected, self.chain.process_gcode(['G1 X0\n', 'G1 X1\n']))
+
+    def test_empty_chain(self):
+        chain = makerbot_driver.GcodeProcessors.ProcessorChain()
+        self.assertEqual(['G1 X0\n'], chain.process_gcode(['G1 X0\n']))
+
+    def test_set_external_stop(self):
+        self.chain.set_external_stop()
+        lines = self.chain.iter_process(['G1 X0\n'])
+        self.assertRaises(makerbot_driver.ExternalStopError, list, lines)
+        for processor in self.chain.processors:
+            self.assertTrue(processor._external_stop)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,7 @@ sys.path.insert(0, lib_path)
 import unittest
 
 import json
+import pickle
 import shutil
 import tempfile
 
@@ -36,6 +37,13 @@ class ProfileInitTests(unittest.TestCase):
             expected_vals = json.load(f)
         self.assertEqual(expected_vals, p.values)
 
+    def test_pickle(self):
+        p = makerbot_driver.Profile('ReplicatorSingle')
+        copy = pickle.loads(pickle.dumps(p))
+        self.assertEqual(p.values, copy.values)
+        self.assertEqual(p.name, copy.name)
+        self.assertEqual(p._log, copy._log)
+
     def test_Profile_profiledir(self):
         profiledir = tempfile.mkdtemp()
         try:
@@ -6,6 +6,7 @@ sys.path.insert(0, lib_path)
 
 import unittest
 import tempfile
+import StringIO
 import makerbot_driver
 
 progress_command = re.compile('^\s*M73 P(\d+)')
@@ -31,5 +32,54 @@ class TestProgressProcessor(unittest.TestCase):
         got_output = self.p.process_gcode(the_input)
         self.assertEqual(expected_output, got_output)
 
+    def test_iter_process(self):
+        the_input = ["G1 X50 Y50\n", "G1 X0 Y0 A50\n", "G1 X0 Y0 B50\n", "G1 X0 Y0 B50\n"]
+        expected_output = self.p.process_gcode(the_input)
+        self.assertEqual(expected_output, list(self.p.iter_process(the_input)))
+        # Input without a length is gathered first
+        self.assertEqual(expected_output, list(self.p.iter_process(iter(the_input))))
+
+    def test_iter_process_is_lazy(self):
+        the_input = ["G1 X50 Y50\n", "G1 X0 Y0 A50\n"]
+        output = self.p.iter_process(the_input)
+        self.assertEqual("G1 X50 Y50\n", output.next())
+        self.assertEqual("M73 P50 (progress (50%))\n", output.next())
+
+    def test_iter_process_file(self):
+        the_input = ["G1 X0 Y0 A50\n", "G1 X0 Y0 B50\n", "G1 X0 Y0 B50\n", "G1 X0 Y0 A50\n"]
+        expected_output = self.p.process_gcode(the_input)
+        with tempfile.TemporaryFile() as f:
+            f.write(''.join(the_input))
+            f.seek(0)
+            self.assertEqual(expected_output, list(self.p.iter_process(f)))
+
+    def test_iter_process_file_by_byte_offset(self):
+        the_input = ["G1 X0 Y0 A50 B50 (long line)\n", "G1 X0\n", "G1 X1\n"]
+        f = StringIO.StringIO(''.join(the_input))
+        output = self.p.iter_process(f)
+        self.assertEqual(the_input[0], output.next())
+        self.assertEqual("M73 P70 (progress (70%))\n", output.next())
+        # Read no further than the line after
+        self.assertEqual(len(the_input[0]) + len(the_input[1]), f.tell())
+        self.assertEqual(
+            [the_input[1], "M73 P85 (progress (85%))\n",
+             the_input[2], "M73 P100 (progress (100%))\n"],
+            list(output))
+
+    def test_iter_process_transform(self):
+        the_input = ["G1 X0\n", "M101\n", "G1 X1\n", "G1 X2\n"]
+        percents = []
+
+        def transform(code):
+            return [] if code.startswith('M') else [code, code]
+        expected_output = [
+            "G1 X0\n", "G1 X0\n", "M73 P50 (progress (50%))\n",
+            "G1 X1\n", "G1 X1\n", "M73 P75 (progress (75%))\n",
+            "G1 X2\n", "G1 X2\n", "M73 P100 (progress (100%))\n",
+        ]
+        self.assertEqual(expected_output, list(
+            self.p.iter_process(iter(the_input), transform, percents.append)))
+        self.assertEqual([50, 75, 100], percents)
+
 if __name__ == '__main__':
     unittest.main()
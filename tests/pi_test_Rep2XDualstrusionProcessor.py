@@ -123,6 +123,55 @@ class TestRep2XDualstrusionProcessor(unittest.TestCase):
             else:
                 self.assertEqual(match.group(), case[2])
 
+    def test_iter_process_MG(self):
+        gcodes = [
+            '(Slice 0, 1 Extruder)\n',
+            'M135 T0\n',
+            'G1 X0 Y0 Z0.3\n',
+            'G1 F1200.000 A14.761 (snort)\n',
+            'G1 X1 Y1 Z0.3\n',
+            'M135 T1\n',
+            'G1 F1200.000 B15.761 (squirt)\n',
+            'G1 X2 Y2 Z0.3\n',
+        ]
+        expected_gcodes = gcodes[:]
+        # Lines are padded to the length of the ones they replace
+        expected_gcodes[3] = 'G1 F600.000 A0.000 (snort)  \n'
+        expected_gcodes[6] = 'G1 F600.000 B10.761 (squirt) \n'
+        self.p.profile = 'Replicator2X'
+        got_gcodes = list(self.p.iter_process(iter(gcodes)))
+        self.assertEqual(expected_gcodes, got_gcodes)
+
+    def test_iter_process_SF(self):
+        gcodes = [
+            '(<layer> 0.3 )\n',
+            'M135 T0\n',
+            'G1 F1200.0\n',
+            'G1 E25.000\n',
+            'G1 X1 Y1\n',
+            'M135 T1\n',
+            'G1 F1200.0\n',
+            'G1 E30.000\n',
+            '(</layer>)\n',
+        ]
+        expected_gcodes = gcodes[:]
+        expected_gcodes[2:4] = ['G1 F600.0\n', 'G1 E5.00   \n']
+        expected_gcodes[6:8] = ['G1 F600.0\n', 'G1 E25.00  \n']
+        self.p.profile = makerbot_driver.profile.Profile('Replicator2X')
+        got_gcodes = list(self.p.iter_process(iter(gcodes)))
+        self.assertEqual(expected_gcodes, got_gcodes)
+
+    def test_iter_process_no_distances(self):
+        gcodes = [
+            'M135 T0\n',
+            'G1 F1200.000 A14.761 (snort)\n',
+            'M135 T1\n',
+            'G1 F1200.000 B15.761 (squirt)\n',
+        ]
+        self.assertEqual(gcodes, list(self.p.iter_process(gcodes)))
+        self.p.profile = 'Replicator2'
+        self.assertEqual(gcodes, list(self.p.iter_process(gcodes)))
+
     def test_process_file(self):
     #TODO update this to work with new changes/formatting
         pass
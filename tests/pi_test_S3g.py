@@ -9,10 +9,15 @@ import io
 import struct
 import mock
 import threading
+import array
+import tempfile
 
 import serial
 from makerbot_driver import Writer, constants, s3g, errors, Encoder
 
+# The s3g module, which the s3g class shadows on the package
+s3g_module = sys.modules[s3g.__module__]
+
 
 class TestS3gPrintToFileType(unittest.TestCase):
     def test_print_to_file_type_s3g(self):
@@ -595,6 +600,37 @@ class S3gTestsFirmwareClassic(unittest.TestCase):
         self.assertEquals(payload[0], constants.host_query_command_dict[
                           'GET_AVAILABLE_BUFFER_SIZE'])
 
+    def test_enable_pipelined_actions(self):
+        buffer_size = 512
+
+        response_payload = bytearray()
+        response_payload.append(constants.response_code_dict['SUCCESS'])
+        response_payload.extend(Encoder.encode_uint32(buffer_size))
+        self.outputstream.write(Encoder.encode_payload(response_payload))
+        response_payload = bytearray()
+        response_payload.append(constants.response_code_dict['SUCCESS'])
+        for i in range(2):
+            self.outputstream.write(Encoder.encode_payload(response_payload))
+        self.outputstream.seek(0)
+
+        self.r.enable_pipelined_actions(4)
+        self.assertTrue(self.r.writer.is_pipelining())
+        self.r.delay(10)
+        self.r.delay(20)
+        self.r.disable_pipelined_actions()
+        self.assertFalse(self.r.writer.is_pipelining())
+
+        self.inputstream.seek(0)
+        payloads = []
+        for i in range(3):
+            packet = bytearray(self.inputstream.read(2))
+            packet.extend(self.inputstream.read(packet[1] + 1))
+            payloads.append(Encoder.decode_packet(packet))
+        self.assertEqual(payloads[0][0], constants.host_query_command_dict[
+            'GET_AVAILABLE_BUFFER_SIZE'])
+        self.assertEqual(payloads[1][0], constants.host_action_command_dict['DELAY'])
+        self.assertEqual(payloads[2][0], constants.host_action_command_dict['DELAY'])
+
     def test_abort_immediately(self):
         response_payload = bytearray()
         response_payload.append(constants.response_code_dict['SUCCESS'])
@@ -2108,5 +2144,128 @@ class S3gTestsFirmwareClassic(unittest.TestCase):
         for i in range(10, 21):
             self.assertEqual(payload[i], extra_byte)
 
+
+class S3gQueueExtendedPointsTests(unittest.TestCase):
+    def setUp(self):
+        self.positions = [[1, 2, 3, 4, 5], [-6, 7, -8, 9, 10], [0, 0, 0, 0, 0]]
+        self.dda_rates = [50, 1000, 12345]
+        self.distances = [123.0, 0.1, 2.5]
+        self.feedrates = [100, 1.5, 33.3]
+        self.relative_axes = ['A', 'B']
+
+    def write_points(self, queue):
+        with tempfile.NamedTemporaryFile(delete=True, suffix='.x3g') as f:
+            path = f.name
+        r = s3g(Writer.FileWriter(open(path, 'wb'), threading.Condition()))
+        queue(r)
+        r.writer.close()
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.remove(path)
+        return data
+
+    def expected(self):
+        def queue(r):
+            for i in range(len(self.positions)):
+                r.queue_extended_point_x3g(
+                    self.positions[i], self.dda_rates[i], self.relative_axes,
+                    self.distances[i], self.feedrates[i])
+        return self.write_points(queue)
+
+    def test_matches_single_points(self):
+        data = self.write_points(lambda r: r.queue_extended_points(
+            self.positions, self.dda_rates, self.distances, self.feedrates,
+            self.relative_axes))
+        self.assertEqual(self.expected(), data)
+
+    def test_array_inputs(self):
+        positions = array.array('i', sum(self.positions, []))
+        data = self.write_points(lambda r: r.queue_extended_points(
+            positions, array.array('I', self.dda_rates),
+            array.array('d', self.distances), array.array('d', self.feedrates),
+            self.relative_axes))
+        self.assertEqual(self.expected(), data)
+
+    def test_file_written_at_once(self):
+        r = s3g(mock.Mock())
+        r.queue_extended_points(
+            self.positions, self.dda_rates, self.distances, self.feedrates)
+        self.assertEqual(1, r.writer.send_action_payloads.call_count)
+        data, payload_length = r.writer.send_action_payloads.call_args[0]
+        self.assertEqual(32, payload_length)
+        self.assertEqual(3 * 32, len(data))
+
+    def test_stream_writer_sends_each_packet(self):
+        outputstream = io.BytesIO()
+        inputstream = io.BytesIO()
+        for i in range(len(self.positions)):
+            outputstream.write(Encoder.encode_payload(
+                bytearray([constants.response_code_dict['SUCCESS']])))
+        outputstream.seek(0)
+        r = s3g(Writer.StreamWriter(
+            io.BufferedRWPair(outputstream, inputstream), threading.Condition()))
+        r.queue_extended_points(
+            self.positions, self.dda_rates, self.distances, self.feedrates,
+            self.relative_axes)
+        decoder = Encoder.PacketStreamDecoder()
+        payloads = decoder.feed(inputstream.getvalue())
+        self.assertEqual(self.expected(), ''.join(str(p) for p in payloads))
+
+    def test_empty(self):
+        r = s3g(mock.Mock())
+        r.queue_extended_points([], [], [], [])
+        self.assertFalse(r.writer.send_action_payloads.called)
+
+    def test_mismatched_lengths(self):
+        r = s3g(mock.Mock())
+        self.assertRaises(errors.ParameterError, r.queue_extended_points,
+                          self.positions, self.dda_rates, self.distances[:2],
+                          self.feedrates)
+        self.assertRaises(errors.ParameterError, r.queue_extended_points,
+                          self.positions[:2], self.dda_rates, self.distances,
+                          self.feedrates)
+
+    def test_bad_point_length(self):
+        r = s3g(mock.Mock())
+        positions = [[1, 2, 3, 4, 5], [1, 2, 3, 4], [1, 2, 3, 4, 5]]
+        self.assertRaises(errors.PointLengthError, r.queue_extended_points,
+                          positions, self.dda_rates, self.distances,
+                          self.feedrates)
+        self.assertRaises(errors.PointLengthError, r.queue_extended_points,
+                          array.array('i', range(14)), self.dda_rates,
+                          self.distances, self.feedrates)
+
+    def test_out_of_range_values(self):
+        cases = [
+            ([[2 ** 31, 0, 0, 0, 0]], [1], [1], [1]),
+            ([[0, 0, 0, 0, -2 ** 31 - 1]], [1], [1], [1]),
+            ([[0, 0, 0, 0, 0]], [2 ** 32], [1], [1]),
+            ([[0, 0, 0, 0, 0]], [-1], [1], [1]),
+            ([[0, 0, 0, 0, 0]], [1], [1], [512]),
+            ([[0, 0, 0, 0, 0]], [1], [1], [-513]),
+        ]
+        for numpy in (None, s3g_module.numpy):
+            with mock.patch.object(s3g_module, 'numpy', numpy):
+                for positions, dda_rates, distances, feedrates in cases:
+                    r = s3g(mock.Mock())
+                    self.assertRaises(
+                        struct.error, r.queue_extended_points, positions,
+                        dda_rates, distances, feedrates)
+                    self.assertFalse(r.writer.send_action_payloads.called)
+
+    @unittest.skipIf(s3g_module.numpy is None, 'numpy is not installed')
+    def test_numpy_matches_single_points(self):
+        numpy = s3g_module.numpy
+        data = self.write_points(lambda r: r.queue_extended_points(
+            numpy.array(self.positions), numpy.array(self.dda_rates),
+            numpy.array(self.distances), numpy.array(self.feedrates),
+            self.relative_axes))
+        self.assertEqual(self.expected(), data)
+        positions = array.array('i', sum(self.positions, []))
+        data = self.write_points(lambda r: r.queue_extended_points(
+            positions, self.dda_rates, self.distances, self.feedrates,
+            self.relative_axes))
+        self.assertEqual(self.expected(), data)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,284 @@
+import os
+import sys
+lib_path = os.path.abspath('./')
+sys.path.insert(0, lib_path)
+
+import struct
+import threading
+import time
+import unittest
+
+import makerbot_driver
+
+
+class LoopbackStream(object):
+    """ A file stand in that hands everything written to it straight to a
+    Simulator, and reads back its responses """
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.pending = ''
+
+    def write(self, data):
+        self.pending += self.simulator.handle_bytes(str(data))
+
+    def flush(self):
+        pass
+
+    def read(self, count):
+        data, self.pending = self.pending[:count], self.pending[count:]
+        return data
+
+    def isOpen(self):
+        return True
+
+
+class SimulatorTests(unittest.TestCase):
+
+    def setUp(self):
+        # With no speedup the clock only moves when a test advances it
+        self.sim = makerbot_driver.Simulator(speedup=0, seed=0)
+        self.writer = makerbot_driver.Writer.StreamWriter(
+            LoopbackStream(self.sim), threading.Condition())
+        self.r = makerbot_driver.s3g(self.writer)
+
+    def tearDown(self):
+        self.sim = None
+        self.writer = None
+        self.r = None
+
+    def test_version(self):
+        self.assertEqual(600, self.r.get_version())
+        self.assertEqual(0, self.r.get_advanced_version()['SoftwareVariant'])
+        self.assertEqual(600, self.r.get_toolhead_version(0))
+
+    def test_unsupported_command(self):
+        self.assertRaises(makerbot_driver.CommandNotSupportedError,
+                          self.writer.send_query_payload, bytearray([99]))
+
+    def test_buffer_accounting(self):
+        self.assertEqual(512, self.r.get_available_buffer_size())
+        self.r.queue_extended_point_classic([1000, 0, 0, 0, 0], 1000)
+        self.r.queue_extended_point_classic([2000, 0, 0, 0, 0], 1000)
+        # The first move is executing, the second is waiting in the buffer
+        self.assertEqual(512 - 25, self.r.get_available_buffer_size())
+        self.assertFalse(self.r.is_finished())
+        self.sim.advance(0.5)
+        self.assertEqual(512 - 25, self.r.get_available_buffer_size())
+        self.sim.advance(0.5)
+        self.assertEqual(512, self.r.get_available_buffer_size())
+        self.assertFalse(self.r.is_finished())
+        self.sim.advance(1)
+        self.assertTrue(self.r.is_finished())
+        self.assertEqual(
+            [2000, 0, 0, 0, 0], self.r.get_extended_position()[0])
+
+    def test_buffer_overflow(self):
+        self.sim.buffer_size = 60
+        self.r.delay(1000000)
+        self.r.queue_extended_point_classic([1000, 0, 0, 0, 0], 1000)
+        self.r.queue_extended_point_classic([2000, 0, 0, 0, 0], 1000)
+        self.assertRaises(makerbot_driver.BufferOverflowError,
+                          self.r.queue_extended_point_classic,
+                          [3000, 0, 0, 0, 0], 1000)
+        self.assertEqual(1, self.sim.total_overflows)
+        self.sim.advance(1)
+        self.r.queue_extended_point_classic([3000, 0, 0, 0, 0], 1000)
+
+    def test_accelerated_and_relative_moves(self):
+        self.r.set_extended_position([10, 10, 10, 0, 0])
+        self.r.queue_extended_point_x3g([100, 0, 0, 0, 0], 100, ['x'], 1, 10)
+        self.assertEqual([110, 0, 0, 0, 0], self.sim.position)
+        self.assertFalse(self.r.is_finished())
+        self.sim.advance(1)
+        self.assertTrue(self.r.is_finished())
+
+    def test_temperature_ramp(self):
+        self.r.set_toolhead_temperature(0, 100)
+        self.assertEqual(100, self.r.get_toolhead_target_temperature(0))
+        self.assertEqual(25, self.r.get_toolhead_temperature(0))
+        self.assertFalse(self.r.is_tool_ready(0))
+        self.sim.advance(10)
+        self.assertEqual(75, self.r.get_toolhead_temperature(0))
+        self.sim.advance(10)
+        self.assertEqual(100, self.r.get_toolhead_temperature(0))
+        self.assertTrue(self.r.is_tool_ready(0))
+        self.r.set_toolhead_temperature(0, 0)
+        self.sim.advance(10)
+        self.assertEqual(80, self.r.get_toolhead_temperature(0))
+
+    def test_platform_temperature(self):
+        self.r.set_platform_temperature(0, 45)
+        self.sim.advance(2)
+        self.assertEqual(35, self.r.get_platform_temperature(0))
+        self.assertFalse(self.r.is_platform_ready(0))
+        self.sim.advance(2)
+        self.assertTrue(self.r.is_platform_ready(0))
+
+    def test_wait_for_tool_ready(self):
+        self.r.set_toolhead_temperature(0, 50)
+        self.r.wait_for_tool_ready(0, 100, 0)
+        self.r.queue_extended_point_classic([1000, 0, 0, 0, 0], 1000)
+        self.sim.advance(4)
+        self.assertEqual([0, 0, 0, 0, 0], self.sim.position)
+        self.sim.advance(1)
+        self.assertEqual([1000, 0, 0, 0, 0], self.sim.position)
+
+    def test_wait_times_out(self):
+        self.r.set_toolhead_temperature(0, 250)
+        self.r.wait_for_tool_ready(0, 100, 3)
+        self.r.queue_extended_point_classic([1000, 0, 0, 0, 0], 1000)
+        self.sim.advance(2)
+        self.assertEqual([0, 0, 0, 0, 0], self.sim.position)
+        self.sim.advance(2)
+        self.assertEqual([1000, 0, 0, 0, 0], self.sim.position)
+
+    def test_abort_clears_buffer(self):
+        self.r.set_toolhead_temperature(0, 100)
+        self.r.delay(1000000)
+        self.r.queue_extended_point_classic([1000, 0, 0, 0, 0], 1000)
+        self.r.abort_immediately()
+        self.assertEqual(512, self.r.get_available_buffer_size())
+        self.assertTrue(self.r.is_finished())
+        self.assertEqual(0, self.r.get_toolhead_target_temperature(0))
+
+    def test_eeprom(self):
+        self.r.write_to_EEPROM(0x10, 'abc')
+        self.assertEqual(bytearray('abc'), self.r.read_from_EEPROM(0x10, 3))
+        self.r.write_to_toolhead_EEPROM(1, 0x20, 'de')
+        self.assertEqual(
+            bytearray('de'), self.r.read_from_toolhead_EEPROM(1, 0x20, 2))
+        self.assertEqual(
+            bytearray('\xff\xff'), self.r.read_from_toolhead_EEPROM(0, 0x20, 2))
+
+    def test_eeprom_values_from_map(self):
+        values = {'eeprom_map': {
+            'MACHINE_NAME': {'value': ['Simulated']},
+            'TOOL_COUNT': {'value': [2]},
+        }}
+        self.sim = makerbot_driver.Simulator(eeprom_values=values)
+        self.r.writer = makerbot_driver.Writer.StreamWriter(
+            LoopbackStream(self.sim), threading.Condition())
+        self.r.init_eeprom_reader('6.0')
+        self.assertEqual('Simulated', self.r.get_name())
+        self.assertEqual(2, self.r.get_toolhead_count())
+
+    def test_sd_capture_and_playback(self):
+        self.r.capture_to_file('cube.s3g')
+        self.r.queue_extended_point_classic([1000, 0, 0, 0, 0], 1000)
+        self.r.queue_extended_point_classic([2000, 0, 0, 0, 0], 1000)
+        self.assertEqual(50, self.r.end_capture_to_file())
+        # Captured commands aren't executed or buffered
+        self.assertEqual([0, 0, 0, 0, 0], self.sim.position)
+        self.assertEqual(512, self.r.get_available_buffer_size())
+        self.assertEqual('cube.s3g\x00', self.r.get_next_filename(True))
+        self.assertEqual('\x00', self.r.get_next_filename(False))
+        self.r.playback_capture('cube.s3g')
+        self.assertEqual('cube.s3g\x00', self.r.get_build_name())
+        self.sim.advance(2)
+        self.assertEqual([2000, 0, 0, 0, 0], self.sim.position)
+        self.assertRaises(makerbot_driver.SDCardError,
+                          self.r.playback_capture, 'missing.s3g')
+
+    def test_build_stats(self):
+        self.r.build_start_notification('cube')
+        self.r.delay(120 * 1000000)
+        self.sim.advance(120)
+        stats = self.r.get_build_stats()
+        self.assertEqual(1, stats['BuildState'])
+        self.assertEqual(2, stats['BuildMinutes'])
+        self.assertEqual('cube\x00', self.r.get_build_name())
+        self.r.build_end_notification()
+        self.assertEqual(2, self.r.get_build_stats()['BuildState'])
+
+    def test_host_crc_error_answered(self):
+        packet = makerbot_driver.Encoder.encode_payload(bytearray([0, 100, 0]))
+        packet[-1] ^= 0xFF
+        response = self.sim.handle_bytes(str(packet))
+        self.assertEqual(
+            [bytearray([makerbot_driver.response_code_dict['CRC_MISMATCH']])],
+            makerbot_driver.Encoder.PacketStreamDecoder().feed(response))
+
+    def test_packets_answered_in_order(self):
+        good = makerbot_driver.Encoder.encode_payload(
+            bytearray(struct.pack('<BH', 0, 100)))
+        bad = bytearray(good)
+        bad[-1] ^= 0xFF
+        response = self.sim.handle_bytes(str(good + bad + good))
+        codes = [payload[0] for payload in
+                 makerbot_driver.Encoder.PacketStreamDecoder().feed(response)]
+        self.assertEqual([makerbot_driver.response_code_dict['SUCCESS'],
+                          makerbot_driver.response_code_dict['CRC_MISMATCH'],
+                          makerbot_driver.response_code_dict['SUCCESS']], codes)
+
+    def test_injected_crc_errors_retried(self):
+        self.sim.crc_error_rate = 0.3
+        for i in range(20):
+            self.assertEqual(600, self.r.get_version())
+        self.assertTrue(self.sim.injected_crc_errors > 0)
+        self.assertEqual(self.sim.injected_crc_errors, self.writer.total_retries)
+
+    def test_injected_noise(self):
+        self.sim.noise_rate = 1
+        payload = bytearray(struct.pack('<BH', 0, 100))
+        response = self.sim.handle_bytes(
+            str(makerbot_driver.Encoder.encode_payload(payload)))
+        decoder = makerbot_driver.Encoder.PacketStreamDecoder()
+        self.assertEqual(1, len(decoder.feed(response)))
+        self.assertEqual(4, decoder.noise_bytes)
+        self.assertEqual(4, self.sim.injected_noise_bytes)
+
+
+class SimulatorTransportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = makerbot_driver.Simulator(speedup=1000)
+
+    def tearDown(self):
+        self.sim.stop()
+
+    def open_port(self):
+        port = self.sim.open_pty()
+        self.sim.start()
+        self.port_file = open(port, 'r+b', 0)
+        return makerbot_driver.s3g(makerbot_driver.Writer.StreamWriter(
+            self.port_file, threading.Condition()))
+
+    def test_pty(self):
+        r = self.open_port()
+        try:
+            self.assertEqual(600, r.get_version())
+            r.queue_extended_point_classic([1000, 0, 0, 0, 0], 1000)
+            start = time.time()
+            while not r.is_finished():
+                self.assertTrue(time.time() - start < 5)
+            self.assertEqual([1000, 0, 0, 0, 0], r.get_extended_position()[0])
+        finally:
+            self.port_file.close()
+
+    def test_latency(self):
+        self.sim.latency = 0.05
+        r = self.open_port()
+        try:
+            start = time.time()
+            r.get_version()
+            self.assertTrue(time.time() - start >= 0.05)
+        finally:
+            self.port_file.close()
+
+    def test_socketpair(self):
+        host_end = self.sim.open_socketpair()
+        self.sim.start()
+        bot = makerbot_driver.AsyncS3g(
+            makerbot_driver.Writer.AsyncStreamWriter(host_end))
+        loop = makerbot_driver.Writer.SelectLoop()
+        loop.add(bot.writer)
+        try:
+            self.assertEqual(
+                [600, 25],
+                loop.run_until_complete(
+                    [bot.get_version(), bot.get_toolhead_temperature(0)], 5))
+        finally:
+            bot.writer.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import sys
+lib_path = os.path.abspath('./')
+sys.path.insert(0, lib_path)
+
+import inspect
+import re
+import unittest
+import mock
+
+import makerbot_driver
+
+
+class GcodeSinkTests(unittest.TestCase):
+
+    def test_commands_match_parser(self):
+        with open(inspect.getsourcefile(makerbot_driver.Gcode.GcodeParser)) as f:
+            source = f.read()
+        used = set(re.findall('self\.s3g\.([a-z_]+)\(', source)) - set(['add_sink'])
+        self.assertEqual(used, set(makerbot_driver.Gcode.SINK_COMMANDS))
+
+    def test_commands_match_s3g(self):
+        sink = makerbot_driver.Gcode.GcodeSink()
+        for command in makerbot_driver.Gcode.SINK_COMMANDS:
+            self.assertEqual(
+                inspect.getargspec(getattr(makerbot_driver.s3g, command)),
+                inspect.getargspec(getattr(sink, command)))
+
+
+class FanOutSinkTests(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = mock.Mock()
+        self.first = self.calls.first
+        self.second = self.calls.second
+        self.sink = makerbot_driver.Gcode.FanOutSink([self.first, self.second])
+
+    def test_commands_go_to_each_sink_in_order(self):
+        self.sink.change_tool(1)
+        self.sink.delay(100)
+        self.assertEqual([
+            mock.call.first.change_tool(1),
+            mock.call.second.change_tool(1),
+            mock.call.first.delay(100),
+            mock.call.second.delay(100),
+        ], self.calls.mock_calls)
+
+    def test_add_sink(self):
+        third = self.calls.third
+        self.sink.add_sink(third)
+        self.sink.queue_song(2)
+        third.queue_song.assert_called_once_with(2)
+        self.assertEqual([self.first, self.second, third], self.sink.sinks)
+
+    def test_error_stops_fan_out(self):
+        self.first.delay.side_effect = makerbot_driver.ParameterError('delay')
+        self.assertRaises(makerbot_driver.ParameterError, self.sink.delay, 100)
+        self.assertFalse(self.second.delay.called)
+
+    def test_other_attributes_from_first_sink(self):
+        self.sink.set_print_to_file_type('x3g')
+        self.first.set_print_to_file_type.assert_called_once_with('x3g')
+        self.assertFalse(self.second.set_print_to_file_type.called)
+        self.assertRaises(AttributeError, getattr,
+                          makerbot_driver.Gcode.FanOutSink(), 'writer')
+
+    def test_empty(self):
+        makerbot_driver.Gcode.FanOutSink().build_end_notification()
+
+
+class ToolpathSinkTests(unittest.TestCase):
+
+    def test_paths(self):
+        sink = makerbot_driver.Gcode.ToolpathSink((0.5, 0.5, 0.25, -0.1, -0.1))
+        sink.set_extended_position([0, 0, 0, 0, 0])
+        sink.change_tool(0)
+        sink.queue_extended_point([10, 0, 4, 0, 0], 1, 1, 1)
+        sink.queue_extended_point([10, 10, 4, -10, 0], 1, 1, 1)
+        sink.queue_extended_point([10, 10, 4, 0, 0], 1, 1, 1)
+        sink.change_tool(1)
+        sink.queue_extended_point([20, 10, 4, 0, -10], 1, 1, 1)
+        sink.set_extended_position([0, 0, 0, 0, 0])
+        sink.queue_extended_point([2, 0, 0, 0, 0], 1, 1, 1)
+        self.assertEqual([
+            (None, [[0, 0, 0, False]]),
+            (0, [[0, 0, 0, False], [5, 0, 1, False], [5, 5, 1, True],
+                 [5, 5, 1, False]]),
+            (1, [[5, 5, 1, False], [10, 5, 1, True]]),
+            (1, [[0, 0, 0, False], [1, 0, 0, False]]),
+        ], sink.paths)
+
+if __name__ == '__main__':
+    unittest.main()
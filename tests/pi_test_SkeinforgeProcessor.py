@@ -50,7 +50,7 @@ class Skeinforge50ProcessorTests(unittest.TestCase):
         ]
         expected_output = [
             '(<version> 12.03.14 </version)\n',
-            'M73 P50 (progress (50%))\n',
+            'M73 P75 (progress (75%))\n',
             'G92 X0 Y0 Z0 A0 B0\n',
             'M73 P100 (progress (100%))\n',
         ]
@@ -71,11 +71,11 @@ class Skeinforge50ProcessorTests(unittest.TestCase):
         ]
         expected_output = [
             "G92 A0\n",
-            "M73 P25 (progress (25%))\n",
+            "M73 P22 (progress (22%))\n",
             "G92 B0\n",
-            "M73 P50 (progress (50%))\n",
+            "M73 P55 (progress (55%))\n",
             "G92 A0\n",
-            "M73 P75 (progress (75%))\n",
+            "M73 P77 (progress (77%))\n",
             "G92 B0\n",
             "M73 P100 (progress (100%))\n",
         ]
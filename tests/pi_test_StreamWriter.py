@@ -269,6 +269,248 @@ class StreamWriterTests(unittest.TestCase):
             makerbot_driver.ExternalStopError, self.w.send_command, 'asdf')
 
 
+class ChunkedStream(object):
+    """ A stream that returns at most chunk_size bytes per read and
+    counts how many reads were made """
+    def __init__(self, response, chunk_size=None):
+        self.response = io.BytesIO(response)
+        self.written = io.BytesIO()
+        self.chunk_size = chunk_size
+        self.reads = 0
+
+    def write(self, data):
+        self.written.write(data)
+
+    def flush(self):
+        pass
+
+    def read(self, size):
+        self.reads += 1
+        if self.chunk_size is not None:
+            size = min(size, self.chunk_size)
+        return self.response.read(size)
+
+
+class StreamWriterBatchedReadTests(unittest.TestCase):
+
+    def make_response(self, data):
+        response_payload = bytearray()
+        response_payload.append(makerbot_driver.response_code_dict['SUCCESS'])
+        response_payload.extend(data)
+        return response_payload
+
+    def test_reads_whole_response_in_three_reads(self):
+        response_payload = self.make_response('x' * 30)
+        stream = ChunkedStream(
+            makerbot_driver.Encoder.encode_payload(response_payload))
+        w = makerbot_driver.Writer.StreamWriter(stream, threading.Condition())
+        self.assertEqual(response_payload, w.send_command('abcde'))
+        self.assertEqual(3, stream.reads)
+
+    def test_accumulates_partial_reads(self):
+        response_payload = self.make_response('12345')
+        stream = ChunkedStream(
+            makerbot_driver.Encoder.encode_payload(response_payload), 2)
+        w = makerbot_driver.Writer.StreamWriter(stream, threading.Condition())
+        self.assertEqual(response_payload, w.send_command('abcde'))
+
+    def test_zero_length_response_is_retried(self):
+        bad_packet = bytearray([makerbot_driver.header, 0, 0])
+        response_payload = self.make_response('12345')
+        data = bad_packet + makerbot_driver.Encoder.encode_payload(response_payload)
+        stream = ChunkedStream(data)
+        w = makerbot_driver.Writer.StreamWriter(stream, threading.Condition())
+        self.assertEqual(response_payload, w.send_command('abcde'))
+        self.assertEqual(1, w.total_retries)
+
+    def test_partial_response_times_out(self):
+        response_payload = self.make_response('12345')
+        packet = makerbot_driver.Encoder.encode_payload(response_payload)
+        stream = ChunkedStream(packet[:4])
+        w = makerbot_driver.Writer.StreamWriter(stream, threading.Condition())
+        timeout_length = makerbot_driver.timeout_length
+        makerbot_driver.timeout_length = 0.01
+        try:
+            with self.assertRaises(makerbot_driver.TransmissionError) as cm:
+                w.send_command('abcde')
+        finally:
+            makerbot_driver.timeout_length = timeout_length
+        self.assertEqual('TimeoutError', cm.exception.value[0])
+
+
+class ScriptedMachine(object):
+    """ A stream that answers every packet written to it with the next
+    response code from a script (SUCCESS once the script runs out), and
+    logs the order of writes and reads """
+    def __init__(self, codes=None):
+        self.codes = list(codes or [])
+        self.responses = bytearray()
+        self.payloads = []
+        self.events = []
+
+    def write(self, packet):
+        self.events.append('w')
+        self.payloads.append(
+            makerbot_driver.Encoder.decode_packet(bytearray(packet)))
+        code = 'SUCCESS'
+        if self.codes:
+            code = self.codes.pop(0)
+        response = bytearray([makerbot_driver.response_code_dict[code]])
+        self.responses.extend(makerbot_driver.Encoder.encode_payload(response))
+
+    def flush(self):
+        pass
+
+    def read(self, size):
+        self.events.append('r')
+        data = str(self.responses[:size])
+        del self.responses[:size]
+        return data
+
+
+class StreamWriterPipeliningTests(unittest.TestCase):
+
+    def setUp(self):
+        self.machine = ScriptedMachine()
+        self.w = makerbot_driver.Writer.StreamWriter(
+            self.machine, threading.Condition())
+        self.w.credit_poll_interval = 0
+        self.refreshes = []
+
+    def refresh(self):
+        self.refreshes.append(True)
+        return 1000
+
+    def test_not_pipelining_by_default(self):
+        self.assertFalse(self.w.is_pipelining())
+
+    def test_packets_sent_before_responses_read(self):
+        self.w.start_pipelining(1000, self.refresh, 4)
+        self.assertTrue(self.w.is_pipelining())
+        for i in range(4):
+            self.w.send_action_payload('abc%i' % i)
+        self.assertEqual(['w'] * 4, self.machine.events)
+        self.w.send_action_payload('abc4')
+        self.assertEqual(['w'] * 4 + ['r'] * 3 + ['w'], self.machine.events)
+        self.w.stop_pipelining()
+        self.assertFalse(self.w.is_pipelining())
+        self.assertEqual(0, len(self.machine.responses))
+        self.assertEqual(
+            [bytearray('abc%i' % i) for i in range(5)], self.machine.payloads)
+
+    def test_credit_runs_out(self):
+        self.w.start_pipelining(8, self.refresh, 16)
+        self.w.send_action_payload('abcd')
+        self.w.send_action_payload('abcd')
+        self.assertEqual([], self.refreshes)
+        self.w.send_action_payload('abcd')
+        self.assertEqual([True], self.refreshes)
+        # The outstanding packets are answered before asking for more room
+        self.assertEqual(['w', 'w', 'r', 'r', 'r', 'r', 'r', 'r', 'w'], self.machine.events)
+
+    def test_waits_for_credit(self):
+        sizes = [0, 2, 10]
+
+        def refresh():
+            return sizes.pop(0)
+        self.w.start_pipelining(0, refresh, 16)
+        self.w.send_action_payload('abcd')
+        self.assertEqual([], sizes)
+        self.assertEqual(2, self.w.total_credit_waits)
+
+    def test_waits_for_credit_below_capacity(self):
+        sizes = [0, 2, 10]
+
+        def refresh():
+            return sizes.pop(0)
+        self.w.start_pipelining(0, refresh, 16, buffer_capacity=512)
+        self.w.send_action_payload('abcd')
+        self.assertEqual([], sizes)
+        self.assertEqual(2, self.w.total_credit_waits)
+
+    def test_packet_larger_than_buffer(self):
+        sizes = [0, 4, 8]
+
+        def refresh():
+            return sizes.pop(0)
+        self.w.start_pipelining(0, refresh, 16, buffer_capacity=8)
+        # Waits for the whole buffer, not for room it can never have
+        self.w.send_action_payload('a' * 20)
+        self.assertEqual([], sizes)
+        self.assertEqual(2, self.w.total_credit_waits)
+        self.assertEqual([bytearray('a' * 20)], self.machine.payloads[-1:])
+
+    def test_query_flushes_pipeline(self):
+        self.w.start_pipelining(1000, self.refresh, 16)
+        self.w.send_action_payload('abcd')
+        self.w.send_action_payload('abcd')
+        response = self.w.send_query_payload('q')
+        self.assertEqual(
+            bytearray([makerbot_driver.response_code_dict['SUCCESS']]), response)
+        self.assertEqual(['w', 'w'] + ['r'] * 6 + ['w'] + ['r'] * 3, self.machine.events)
+
+    def test_rejected_packets_resent_in_order(self):
+        self.machine.codes = ['SUCCESS', 'ACTION_BUFFER_OVERFLOW', 'CRC_MISMATCH', 'ACTION_BUFFER_OVERFLOW']
+        self.w.start_pipelining(1000, self.refresh, 16)
+        for i in range(4):
+            self.w.send_action_payload('abc%i' % i)
+        self.w.flush_pipeline()
+        expected = ['abc0', 'abc1', 'abc2', 'abc3', 'abc1', 'abc2', 'abc3']
+        self.assertEqual(
+            [bytearray(p) for p in expected], self.machine.payloads)
+        self.assertEqual(2, self.w.total_overflows)
+
+    def test_accepted_after_rejected_raises(self):
+        self.machine.codes = ['ACTION_BUFFER_OVERFLOW', 'SUCCESS']
+        self.w.start_pipelining(1000, self.refresh, 16)
+        self.w.send_action_payload('abc0')
+        self.w.send_action_payload('abc1')
+        with self.assertRaises(makerbot_driver.TransmissionError) as cm:
+            self.w.flush_pipeline()
+        self.assertEqual(['BufferOverflowError'], cm.exception.value)
+
+    def test_other_errors_passed_on(self):
+        self.machine.codes = ['CANCEL_BUILD']
+        self.w.start_pipelining(1000, self.refresh, 16)
+        self.w.send_action_payload('abc0')
+        self.w.send_action_payload('abc1')
+        self.assertRaises(
+            makerbot_driver.BuildCancelledError, self.w.flush_pipeline)
+        self.assertEqual(0, len(self.machine.responses))
+
+    def test_external_stop(self):
+        self.w.start_pipelining(1000, self.refresh, 16)
+        self.w.set_external_stop(True)
+        self.assertRaises(
+            makerbot_driver.ExternalStopError, self.w.send_action_payload, 'abc')
+
+    def test_builder_packets_kept_until_answered(self):
+        self.machine.codes = ['ACTION_BUFFER_OVERFLOW', 'ACTION_BUFFER_OVERFLOW']
+        builder = makerbot_driver.Encoder.PacketBuilder('<BI', 200)
+        self.w.start_pipelining(1000, self.refresh, 16)
+        builder.pack(1)
+        self.w.send_action_from_builder(builder)
+        builder.pack(2)
+        self.w.send_action_from_builder(builder)
+        self.w.flush_pipeline()
+        expected = [(200, 1), (200, 2), (200, 1), (200, 2)]
+        self.assertEqual(
+            [bytearray(struct.pack('<BI', *p)) for p in expected],
+            self.machine.payloads)
+
+
+class StreamWriterBuilderTests(unittest.TestCase):
+
+    def test_send_action_from_builder(self):
+        machine = ScriptedMachine()
+        w = makerbot_driver.Writer.StreamWriter(machine, threading.Condition())
+        builder = makerbot_driver.Encoder.PacketBuilder('<BI', 200)
+        builder.pack(7)
+        w.send_action_from_builder(builder)
+        self.assertEqual(
+            [bytearray(struct.pack('<BI', 200, 7))], machine.payloads)
+
+
 class TestUnderlyingFile(unittest.TestCase):
     """ test StreamWriter calls underlying file open/close """
 
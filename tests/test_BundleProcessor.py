@@ -7,6 +7,7 @@ import unittest
 import threading
 import time
 import mock
+import StringIO
 import makerbot_driver
 
 
@@ -16,6 +17,7 @@ class TestBundleProcessorCallbackAssignment(unittest.TestCase):
         self.bp = makerbot_driver.GcodeProcessors.BundleProcessor()
         self.bp._super_process_gcode = mock.Mock(return_value=[])
         self.bp.progress_processor.process_gcode = mock.Mock()
+        self.bp.progress_processor.iter_process = mock.Mock(return_value=iter([]))
 
     def tearDown(self):
         self.bp = None
@@ -45,9 +47,9 @@ class TestBundleProcessorCallbackAssignment(unittest.TestCase):
         callback = None
         gcodes = []
         self.bp.process_gcode(gcodes, callback)
-        self.bp._super_process_gcode.assert_called_once_with([], callback)
-        self.bp.progress_processor.process_gcode.assert_called_once_with(
-            [], None)
+        self.assertEqual(len(self.bp._super_process_gcode.mock_calls), 0)
+        self.bp.progress_processor.iter_process.assert_called_once_with(
+            [], self.bp._transform_line, None)
 
     def test_do_progress_callback(self):
         self.bp.do_progress = True
@@ -56,10 +58,57 @@ class TestBundleProcessorCallbackAssignment(unittest.TestCase):
             pass
         gcodes = []
         self.bp.process_gcode(gcodes, callback)
-        self.bp._super_process_gcode.assert_called_once_with(
-            [], self.bp.new_callback)
-        self.bp.progress_processor.process_gcode.assert_called_once_with(
-            [], self.bp.progress_callback)
+        self.assertEqual(len(self.bp._super_process_gcode.mock_calls), 0)
+        self.bp.progress_processor.iter_process.assert_called_once_with(
+            [], self.bp._transform_line, callback)
+
+
+class TestBundleProcessorIterProcess(unittest.TestCase):
+
+    def setUp(self):
+        self.bp = makerbot_driver.GcodeProcessors.BundleProcessor()
+        self.bp.processors = [
+            makerbot_driver.GcodeProcessors.RpmProcessor(),
+            makerbot_driver.GcodeProcessors.AbpProcessor(),
+        ]
+        self.gcodes = ['M101\n', 'G1 X0\n', 'M103\n', 'G1 X1\n', 'M102\n']
+
+    def test_matches_process_gcode(self):
+        expected = self.bp.process_gcode(self.gcodes)
+        self.assertEqual(expected, list(self.bp.iter_process(self.gcodes)))
+
+    def test_matches_process_gcode_no_progress(self):
+        self.bp.do_progress = False
+        expected = self.bp.process_gcode(self.gcodes)
+        self.assertEqual(expected, list(self.bp.iter_process(self.gcodes)))
+
+    def test_progress_in_one_pass(self):
+        expected = [
+            'G1 X0\n', 'M73 P60 (progress (60%))\n',
+            'G1 X1\n', 'M73 P100 (progress (100%))\n',
+        ]
+        self.assertEqual(expected, list(self.bp.iter_process(self.gcodes)))
+
+    def test_progress_from_file(self):
+        f = StringIO.StringIO(''.join(self.gcodes))
+        lines = list(self.bp.iter_process(f))
+        self.assertEqual(
+            [code for code in lines if not code.startswith('M73')],
+            ['G1 X0\n', 'G1 X1\n'])
+        self.assertEqual('M73 P100 (progress (100%))\n', lines[-1])
+
+    def test_command_words(self):
+        self.bp.processors.append(
+            makerbot_driver.GcodeProcessors.SingletonTProcessor())
+        self.bp.collate_codemaps()
+        for processor in self.bp.processors:
+            for key in processor.code_map:
+                self.assertEqual(processor.command_words,
+                                 self.bp._code_map_command_words[key])
+        gcodes = ['M101\n', 'T1\n', 'G1 X0 M106\n', 'G1 X0 (M103)\n']
+        expected = ['M135 T1\n', 'G1 X0 (M103)\n']
+        self.bp.do_progress = False
+        self.assertEqual(expected, list(self.bp.iter_process(gcodes)))
 
 
 class TestBundleProcessorCallbacks(unittest.TestCase):
@@ -109,10 +158,11 @@ class TestBundleProcessorCallbacks(unittest.TestCase):
         self.bp.process_gcode(lines, callback=test_callback)
         self.done_process = True
         t.join()
-        discrete_percents = set(self.percents)
+        # Percents in the order they were seen; iterating a set of them
+        # isn't ordered when only a few were seen
         cur_percent = -1
-        for percent in discrete_percents:
-            self.assertTrue(percent > cur_percent)
+        for percent in self.percents:
+            self.assertTrue(percent >= cur_percent)
             cur_percent = percent
 
     def test_callbacks_dont_do_progress(self):
@@ -139,10 +189,11 @@ class TestBundleProcessorCallbacks(unittest.TestCase):
         self.bp.process_gcode(lines, callback=test_callback)
         self.done_process = True
         t.join()
-        discrete_percents = set(self.percents)
+        # Percents in the order they were seen; iterating a set of them
+        # isn't ordered when only a few were seen
         cur_percent = -1
-        for percent in discrete_percents:
-            self.assertTrue(percent > cur_percent)
+        for percent in self.percents:
+            self.assertTrue(percent >= cur_percent)
             cur_percent = percent
 
     def set_external_stop(self):